@@ -0,0 +1,273 @@
+import logging
+import threading
+import time
+
+from consts import *
+from rules import SetTaxMask, SetFarmCounts, EndActionPhase, Move, CastSkill, EndTurn
+import planner
+from zobrist import TranspositionTable, EXACT, LOWER, UPPER
+
+
+# 电脑玩家：迭代加深的 alpha-beta 搜索
+# 一回合由多个原子决策组成（行动阶段的征税/屯田计划、若干次走子和技能、结束回合），
+# 搜索的每一层是一个决策，同一玩家连续决策时不换边，结束回合后才轮到对方。
+# 评分始终从搜索方的角度计算：轮到搜索方时取最大，轮到对方时取最小。
+logger = logging.getLogger(__name__)
+
+PIECE_VALUES = {'pawn': 100, 'knight': 300, 'bishop': 300, 'rook': 500, 'queen': 900, 'king': 400}
+FOOD_WEIGHT = 4  # 每单位粮草
+TERRITORY_WEIGHT = 10  # 每格领土
+FERTILITY_WEIGHT = 2  # 领土上每 10 点丰饶度（每回合可征税的粮草）
+OBSTACLE_WEIGHT = 20  # 每个己方鹿角/堡垒
+WIN_SCORE = 1_000_000
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+def plan_candidates(state):
+    """行动阶段的候选计划，每个计划是一组依次执行的动作"""
+    color = state.get_current_player().color
+    greedy = planner.plan(state.resource_system, color, horizon=0)  # 能征的全部征税
+    plans = [greedy.actions(), (SetTaxMask(0), SetFarmCounts(()), EndActionPhase())]
+    # 往后看几回合的最优计划（可能留着不征或者屯田）
+    best = planner.plan(state.resource_system, color)
+    if best[:2] != greedy[:2]:
+        plans.append(best.actions())
+    return plans
+
+
+def legal_actions(state):
+    """当前玩家所有可选的决策（动作元组）"""
+    if state.game_over:
+        return []
+    if state.phase == GamePhase.ACTION:
+        return plan_candidates(state)
+
+    player = state.get_current_player()
+    actions = []
+    if player.moves_this_turn < PIECE_MOVE_MAX_PER_TURN:
+        for piece in player.pieces:
+            if piece.type == 'king' and piece.moved_this_turn >= PIECE_KING_MOVE_MAX_PER_TURN:
+                continue
+            for row, col in state.get_valid_moves(piece.row, piece.col):
+                actions.append((Move(piece.row, piece.col, row, col),))
+    if player.skills_used_this_turn < SKILL_MAX_PER_TURN:
+        for piece in player.pieces:
+            pos = (piece.row, piece.col)
+            if (piece.type in state.skill_system.SKILL_COSTS and pos not in state.antlers
+                    and pos not in state.fortresses and state.skill_system.can_cast_skill(piece.type, player.color)):
+                actions.append((CastSkill(piece.row, piece.col),))
+    actions.append((EndTurn(),))
+    return actions
+
+
+def order_actions(state, actions, best=None):
+    """走法排序：上次的最佳决策、吃子（MVV-LVA：先吃价值高的，再用价值低的去吃）、吃鹿角、技能、占领新格子"""
+    color = state.get_current_player().color
+
+    def score(decision):
+        if decision == best:
+            return 1 << 30
+        action = decision[0]
+        if isinstance(action, Move):
+            attacker = state.board[action.from_row][action.from_col]
+            victim = state.board[action.to_row][action.to_col]
+            if victim is not None:
+                return 100_000 + PIECE_VALUES[victim.type] * 16 - PIECE_VALUES[attacker.type] // 100
+            if state.antlers.get((action.to_row, action.to_col), color) != color:
+                return 50_000
+            if state.resource_system.owner(action.to_row, action.to_col) != color:
+                return 100
+            return 0
+        if isinstance(action, CastSkill):
+            return 1_000
+        if isinstance(action, EndTurn):
+            return -1
+        return 0  # 行动阶段的计划保持生成顺序
+
+    return sorted(actions, key=score, reverse=True)
+
+
+def make_decision(state, decision):
+    """用 make 执行决策，成功返回 True；任一动作不合法时撤销已执行的部分并返回 False"""
+    for count, action in enumerate(decision):
+        if not state.make(action):
+            for _ in range(count):
+                state.unmake()
+            return False
+    return True
+
+
+def unmake_decision(state, decision):
+    for _ in decision:
+        state.unmake()
+
+
+def evaluate(state, color):
+    """从 color 一方看的局面评分"""
+    if state.game_over:
+        return WIN_SCORE if state.winner == color else -WIN_SCORE
+    rs = state.resource_system
+    score = 0
+    for player in state.players:
+        sign = 1 if player.color == color else -1
+        material = sum(PIECE_VALUES[piece.type] for piece in player.pieces)
+        score += sign * (material + FOOD_WEIGHT * int(rs.food[player.color]))
+    for owner, cells in rs.territory_cells.items():
+        sign = 1 if owner == color else -1
+        for row, col in cells:
+            score += sign * (TERRITORY_WEIGHT + FERTILITY_WEIGHT * (int(rs.fertility[row][col]) // 10))
+    for obstacles in (state.antlers, state.fortresses):
+        for owner in obstacles.values():
+            score += OBSTACLE_WEIGHT if owner == color else -OBSTACLE_WEIGHT
+    return score
+
+
+class Searcher:
+    """迭代加深 alpha-beta 搜索，置换表在多次搜索之间共用
+
+    搜索在传入的局面上 make/unmake，返回时局面恢复原样。
+    """
+
+    def __init__(self, time_limit=AI_TIME_LIMIT, max_depth=AI_MAX_DEPTH, table=None):
+        self.time_limit = time_limit
+        self.max_depth = max_depth
+        self.table = table or TranspositionTable(AI_TABLE_BITS)
+        self.color = None
+        self.deadline = 0
+        self.nodes = 0
+        self.depth_reached = 0
+
+    def search(self, state):
+        """返回当前玩家的最佳决策（动作元组），在 time_limit 秒内返回"""
+        start = time.perf_counter()
+        self.deadline = start + self.time_limit
+        self.color = state.get_current_player().color
+        self.nodes = 0
+        self.depth_reached = 0
+        self.table.new_search()
+
+        actions = legal_actions(state)
+        if not actions:
+            return None
+        best = actions[0]
+        base = len(state.undo_stack)
+        if len(actions) > 1:
+            for depth in range(1, self.max_depth + 1):
+                try:
+                    best = self._search_root(state, actions, depth, best)
+                except SearchTimeout:
+                    # 超时时搜索停在半路，把还没撤销的动作撤销掉
+                    while len(state.undo_stack) > base:
+                        state.unmake()
+                    break
+                self.depth_reached = depth
+        logger.debug(f"AI {self.color}: {best} depth {self.depth_reached}, {self.nodes} nodes, "
+                     f"{time.perf_counter() - start:.2f}s")
+        return best
+
+    def _search_root(self, state, actions, depth, previous_best):
+        alpha, beta = -WIN_SCORE - 1, WIN_SCORE + 1
+        best, best_value = None, None
+        for decision in order_actions(state, actions, previous_best):
+            if not make_decision(state, decision):
+                continue
+            value = self._alphabeta(state, depth - 1, alpha, beta, 1)
+            unmake_decision(state, decision)
+            if best_value is None or value > best_value:
+                best, best_value = decision, value
+                alpha = max(alpha, value)
+        return best or previous_best
+
+    def _alphabeta(self, state, depth, alpha, beta, ply):
+        self.nodes += 1
+        if self.nodes % 64 == 0 and time.perf_counter() > self.deadline:
+            raise SearchTimeout
+        if state.game_over:
+            # 越早获胜越好，越晚失败越好
+            return WIN_SCORE - ply if state.winner == self.color else -WIN_SCORE + ply
+        if depth == 0:
+            return evaluate(state, self.color)
+
+        key = state.zobrist_key()
+        entry = self.table.probe(key)
+        tt_move = None
+        if entry is not None:
+            entry_depth, value, flag, tt_move = entry
+            if entry_depth >= depth and (flag == EXACT or (flag == LOWER and value >= beta)
+                                         or (flag == UPPER and value <= alpha)):
+                return value
+
+        maximizing = state.get_current_player().color == self.color
+        original_alpha, original_beta = alpha, beta
+        best_value, best_move = None, None
+        for decision in order_actions(state, legal_actions(state), tt_move):
+            if not make_decision(state, decision):
+                continue
+            value = self._alphabeta(state, depth - 1, alpha, beta, ply + 1)
+            unmake_decision(state, decision)
+            if best_value is None or (value > best_value if maximizing else value < best_value):
+                best_value, best_move = value, decision
+            if maximizing:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                break
+
+        if best_move is None:
+            return evaluate(state, self.color)
+        if best_value <= original_alpha:
+            flag = UPPER
+        elif best_value >= original_beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table.store(key, depth, best_value, flag, best_move)
+        return best_value
+
+
+class AIPlayer:
+    """在后台线程中搜索，界面主循环轮询结果，不会卡住绘制"""
+
+    def __init__(self, color, time_limit=AI_TIME_LIMIT, on_done=None, searcher=None):
+        self.color = color
+        self.searcher = searcher or Searcher(time_limit)  # 任何有 search(state) 方法的引擎，例如 mcts.MCTSEngine
+        self.on_done = on_done  # 搜索完成时在后台线程中调用（例如唤醒界面的事件循环）
+        self.thread = None
+        self.result = None
+        self.state_key = None  # 开始思考时的局面哈希
+
+    def is_turn(self, state):
+        return not state.game_over and state.get_current_player().color == self.color
+
+    def start(self, state):
+        # 开始为当前局面思考（已在思考则忽略）
+        if self.thread is not None:
+            return
+        self.state_key = state.zobrist_key()
+        self.thread = threading.Thread(target=self._run, args=(state.clone(),), daemon=True)
+        self.thread.start()
+
+    def _run(self, state):
+        self.result = self.searcher.search(state)
+        if self.on_done:
+            self.on_done()
+
+    def close(self):
+        # 释放搜索引擎占用的资源（例如 MCTS 的进程池），退出程序前调用
+        close = getattr(self.searcher, 'close', None)
+        if close is not None:
+            close()
+
+    def poll(self, state):
+        """思考完成时返回决策；还在思考或局面已经变了（例如重开）返回 None"""
+        if self.thread is None or self.thread.is_alive():
+            return None
+        self.thread = None
+        decision, self.result = self.result, None
+        if self.state_key != state.zobrist_key():
+            return None
+        return decision
@@ -0,0 +1,140 @@
+import json
+import logging
+import os
+import sys
+
+import pygame
+
+from consts import *
+
+
+# 贴图缓存：按当前 SCREEN_SCALE 缩放好的所有贴图打包成一张图集，另存一个索引文件
+# 启动时只解码这一张图；图集不存在或已过期时，退回逐张加载
+# 构建：python assets.py
+logger = logging.getLogger(__name__)
+
+ATLAS_DIR = "images/cache"
+ATLAS_IMAGE = os.path.join(ATLAS_DIR, "atlas.png")
+ATLAS_INDEX = os.path.join(ATLAS_DIR, "atlas.json")
+ATLAS_PADDING = 1  # 贴图之间留的空隙，避免缩放时边缘互相渗色
+
+PIECE_COLORS = ('black', 'white')
+PIECE_TYPES = ('pawn', 'rook', 'knight', 'bishop', 'queen', 'king')
+
+
+def sprite_specs():
+    """所有贴图的 (名字, 候选文件, 缩放尺寸)，候选文件按顺序尝试"""
+    piece = (PIECE_SIZE, PIECE_SIZE)
+    specs = [('board', ("images/board.png", "images/beach.png"), (SCREEN_WIDTH, SCREEN_HEIGHT))]
+    for color in PIECE_COLORS:
+        specs.append((f'piece_{color}', (f"images/piece_{color}.png",), piece))
+        for ptype in PIECE_TYPES:
+            specs.append((f'piece_{color}_{ptype}', (f"images/piece_{color}_{ptype}.png",), piece))
+    for color in PIECE_COLORS:
+        specs.append((f'obstacle_{color}_lujiao', (f"images/obstacle_{color}_lujiao.png",), piece))
+        specs.append((f'obstacle_{color}_fortress', (f"images/obstacle_{color}_fortress.png",), piece))
+    specs.append(('highlight', ("images/highlight.png",), (PIECE_SIZE + 20, PIECE_SIZE + 20)))
+    specs.append(('valid_move', ("images/valid_move.png",), (PIECE_SIZE // 2, PIECE_SIZE // 2)))
+    return specs
+
+
+def load_sprite(files, size, convert=True):
+    # 依次尝试候选文件，返回缩放后的 surface，都加载不了则返回 None
+    for path in files:
+        if not os.path.exists(path):
+            continue
+        try:
+            surface = pygame.image.load(path)
+        except pygame.error:
+            continue
+        if convert:
+            surface = surface.convert_alpha()
+        return pygame.transform.scale(surface, size)
+    return None
+
+
+def _source_stamps():
+    # 所有候选文件当前的修改时间，图集过期检查用（不存在的文件记为 None）
+    stamps = {}
+    for _, files, _ in sprite_specs():
+        for path in files:
+            stamps[path] = os.path.getmtime(path) if os.path.exists(path) else None
+    return stamps
+
+
+def _pack(sizes, width):
+    # 简单的货架装箱：按高度从高到低排成若干行，返回 {名字: (x, y)} 和总高度
+    positions = {}
+    x = y = shelf_height = 0
+    for name, (w, h) in sorted(sizes.items(), key=lambda item: -item[1][1]):
+        if x + w > width:
+            x, y = 0, y + shelf_height + ATLAS_PADDING
+            shelf_height = 0
+        positions[name] = (x, y)
+        x += w + ATLAS_PADDING
+        shelf_height = max(shelf_height, h)
+    return positions, y + shelf_height
+
+
+def build_atlas(image_path=ATLAS_IMAGE, index_path=ATLAS_INDEX):
+    """加载并缩放所有贴图，写出图集和索引，返回 (打包的贴图数, 缺失的贴图名)"""
+    sprites, missing = {}, []
+    for name, files, size in sprite_specs():
+        surface = load_sprite(files, size, convert=False)
+        if surface is None:
+            missing.append(name)
+        else:
+            sprites[name] = surface
+
+    sizes = {name: surface.get_size() for name, surface in sprites.items()}
+    width = max([w for w, _ in sizes.values()] + [1])
+    positions, height = _pack(sizes, width)
+    atlas = pygame.Surface((width, max(height, 1)), pygame.SRCALPHA)
+    for name, surface in sprites.items():
+        atlas.blit(surface, positions[name])
+
+    os.makedirs(os.path.dirname(image_path), exist_ok=True)
+    pygame.image.save(atlas, image_path)
+    index = {
+        'scale': SCREEN_SCALE,
+        'sources': _source_stamps(),
+        'sprites': {name: [*positions[name], *sizes[name]] for name in sprites},
+        'missing': missing,
+    }
+    with open(index_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=1)
+    return len(sprites), missing
+
+
+def load_atlas(image_path=ATLAS_IMAGE, index_path=ATLAS_INDEX):
+    """读取图集，返回 ({名字: surface}, 缺失的贴图名集合)；图集不存在或已过期返回 None"""
+    if not (os.path.exists(image_path) and os.path.exists(index_path)):
+        return None
+    try:
+        with open(index_path, encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        logger.warning(f"Cannot read {index_path}, ignoring sprite atlas")
+        return None
+    # 缩放比例变了、贴图列表变了或者源文件改过，都需要重新构建
+    names = {name for name, _, _ in sprite_specs()}
+    if (index.get('scale') != SCREEN_SCALE or index.get('sources') != _source_stamps()
+            or set(index['sprites']) | set(index['missing']) != names):
+        return None
+
+    try:
+        atlas = pygame.image.load(image_path).convert_alpha()
+    except pygame.error:
+        logger.warning(f"Cannot load {image_path}, ignoring sprite atlas")
+        return None
+    sprites = {name: atlas.subsurface(pygame.Rect(rect)) for name, rect in index['sprites'].items()}
+    return sprites, set(index['missing'])
+
+
+if __name__ == "__main__":
+    pygame.init()
+    count, missing = build_atlas()
+    print(f"Packed {count} sprites into {ATLAS_IMAGE} (scale {SCREEN_SCALE})")
+    if missing:
+        print(f"Missing sprites (defaults will be used): {', '.join(missing)}")
+    sys.exit()
@@ -1,4 +1,6 @@
-from enum import Enum
+from enum import Enum, IntEnum
+
+import zobrist
 
 # 游戏参数
 INIT_FOOD = 20
@@ -23,6 +25,26 @@ def PIECE_MOVE_COST(typ, moved_times):
     return PIECE_BASIC_MOVE_COST[typ] + 2 * moved_times
 
 
+# 兵种和颜色的小整数编码（紧凑存储和序列化用）
+# 棋子对象上仍然是字符串：驻留字符串的 == 和小整数差不多快，而 IntEnum 成员的属性查找反而慢好几倍
+class PieceType(IntEnum):
+    PAWN = 0
+    KNIGHT = 1
+    BISHOP = 2
+    ROOK = 3
+    QUEEN = 4
+    KING = 5
+
+class PieceColor(IntEnum):
+    WHITE = 0
+    BLACK = 1
+
+PIECE_TYPE_NAMES = tuple(piece_type.name.lower() for piece_type in PieceType)  # 编码 -> 字符串
+PIECE_COLOR_NAMES = tuple(color.name.lower() for color in PieceColor)
+PIECE_TYPE_CODES = {name: code for code, name in enumerate(PIECE_TYPE_NAMES)}  # 字符串 -> 编码
+PIECE_COLOR_CODES = {name: code for code, name in enumerate(PIECE_COLOR_NAMES)}
+
+
 # 游戏阶段枚举
 class GamePhase(Enum):
     ACTION = "action"  # 行动阶段
@@ -49,23 +71,97 @@ class ResourceSystem:
         self.territory = [[None  for _ in range(GRID_SIZE)] for _ in range(GRID_SIZE)]  # 领土控制
         self.tax_grid =  [[False for _ in range(GRID_SIZE)] for _ in range(GRID_SIZE)]  # 税收标记
         self.farm_grid = [[0     for _ in range(GRID_SIZE)] for _ in range(GRID_SIZE)]  # 屯田次数
-
-    def update_fertility(self, board):
-        # 行动阶段开始前，任何格子上如果有棋子，则丰饶度-5
+        self.territory_cells = {'black': set(), 'white': set()}  # 各方领土的格子，随 update_territory 维护
+        self.marked_cells = set()  # 有征税或屯田标记的格子
+        self.fertility_version = 0  # 丰饶度每次变化 +1，供渲染缓存判断是否需要重画
+        self.plan_version = 0  # 征税/屯田计划每次变化 +1
+        self.journal = None  # 不为 None 时，每次修改格子都记下 (类别, row, col, 旧值)，供撤销使用
+        self.reset_plan_cache()
+        self.zobrist = self.compute_zobrist()  # 丰饶度、领土和计划的 Zobrist 哈希，随每次修改增量更新
+
+    def copy(self):
+        # 独立副本（搜索时复制局面用），比 deepcopy 快得多
+        other = ResourceSystem.__new__(ResourceSystem)
+        other.__dict__.update(self.__dict__)
+        for name in ('fertility', 'territory', 'tax_grid', 'farm_grid',
+                     'fertility_changes', 'plan_cell_food', 'plan_cell_owner'):
+            setattr(other, name, [line[:] for line in getattr(self, name)])
+        other.food = dict(self.food)
+        other.territory_cells = {color: set(cells) for color, cells in self.territory_cells.items()}
+        other.marked_cells = set(self.marked_cells)
+        other.plan_food_delta = dict(self.plan_food_delta)
+        other.negative_cells = {color: set(cells) for color, cells in self.negative_cells.items()}
+        return other
+
+    def compute_zobrist(self):
+        # 从头计算哈希（初始化和校验用）
+        keys = zobrist.tables()
+        h = 0
         for row in range(GRID_SIZE):
             for col in range(GRID_SIZE):
-                if board[row][col]:
-                    self.fertility[row][col] = max(0, self.fertility[row][col] - 5)
+                h ^= keys.fertility(row, col, self.fertility[row][col])
+                if self.territory[row][col] is not None:
+                    h ^= keys.territory[self.territory[row][col]][row * GRID_SIZE + col]
+                if self.tax_grid[row][col]:
+                    h ^= keys.tax[row * GRID_SIZE + col]
+                if self.farm_grid[row][col]:
+                    h ^= keys.farm(row, col, self.farm_grid[row][col])
+        return h
+
+    def reset_plan_cache(self):
+        # 征税/屯田计划的预览缓存：每次修改只更新被改动的格子
+        self.fertility_changes = [[0 for _ in range(GRID_SIZE)] for _ in range(GRID_SIZE)]  # 每格丰饶度变化
+        self.plan_cell_food = [[0 for _ in range(GRID_SIZE)] for _ in range(GRID_SIZE)]  # 每格粮草变化
+        self.plan_cell_owner = [[None for _ in range(GRID_SIZE)] for _ in range(GRID_SIZE)]  # 计入了哪一方
+        self.plan_food_delta = {'black': 0, 'white': 0}  # 各方计划的粮草净变化
+        self.negative_cells = {'black': set(), 'white': set()}  # 各方操作后丰饶度为负的格子
+        self.plan_version += 1
+
+    def refresh_plan_cell(self, row, col):
+        # 重新计算一个格子在预览中的贡献
+        old_owner = self.plan_cell_owner[row][col]
+        if old_owner is not None:
+            self.plan_food_delta[old_owner] -= self.plan_cell_food[row][col]
+            self.negative_cells[old_owner].discard((row, col))
+
+        taxed = self.tax_grid[row][col]
+        farm_times = self.farm_grid[row][col]
+        change = farm_times * 5 - (10 if taxed else 0)  # 税收减少丰饶度，屯田增加丰饶度
+        food = (self.fertility[row][col] // 10 if taxed else 0) - farm_times * 10
+        owner = self.territory[row][col]
+
+        self.fertility_changes[row][col] = change
+        self.plan_cell_food[row][col] = food
+        self.plan_cell_owner[row][col] = owner
+        self.plan_version += 1
+        if owner is not None:
+            self.plan_food_delta[owner] += food
+            if self.fertility[row][col] + change < 0:
+                self.negative_cells[owner].add((row, col))
+
+    def set_fertility(self, row, col, value):
+        if self.journal is not None:
+            self.journal.append(('fertility', row, col, self.fertility[row][col]))
+        keys = zobrist.tables()
+        self.zobrist ^= keys.fertility(row, col, self.fertility[row][col]) ^ keys.fertility(row, col, value)
+        self.fertility[row][col] = value
+        self.fertility_version += 1
+        if self.tax_grid[row][col] or self.farm_grid[row][col]:
+            self.refresh_plan_cell(row, col)
+
+    def update_fertility(self, occupied):
+        # 行动阶段开始前，任何格子上如果有棋子，则丰饶度-5（occupied 是有棋子的格子集合）
+        for row, col in occupied:
+            self.set_fertility(row, col, max(0, self.fertility[row][col] - 5))
 
     def collect_tax(self, player_color):
         # 征税逻辑：根据标记的税收格子获得粮草
         total_tax = 0
-        for row in range(GRID_SIZE):
-            for col in range(GRID_SIZE):
-                if self.tax_grid[row][col] and self.territory[row][col] == player_color:
-                    tax_amount = self.fertility[row][col] // 10
-                    total_tax += tax_amount
-                    self.fertility[row][col] = max(0, self.fertility[row][col] - 10)
+        for row, col in self.marked_cells:
+            if self.tax_grid[row][col] and self.territory[row][col] == player_color:
+                tax_amount = self.fertility[row][col] // 10
+                total_tax += tax_amount
+                self.set_fertility(row, col, max(0, self.fertility[row][col] - 10))
 
         self.food[player_color] += total_tax
         return total_tax
@@ -73,35 +169,131 @@ class ResourceSystem:
     def implement_farming(self, player_color):
         # 实施屯田计划
         total_farm_cost = 0
-        for row in range(GRID_SIZE):
-            for col in range(GRID_SIZE):
-                farm_times = self.farm_grid[row][col]
-                if farm_times > 0 and self.territory[row][col] == player_color:
-                    farm_cost = farm_times * 10
-                    if self.food[player_color] >= farm_cost:
-                        self.food[player_color] -= farm_cost
-                        self.fertility[row][col] += farm_times * 5
-                        total_farm_cost += farm_cost
-                    else:
-                        # 粮草不足，调整屯田次数
-                        max_affordable = self.food[player_color] // 10
-                        actual_times = min(farm_times, max_affordable)
-                        actual_cost = actual_times * 10
-                        self.food[player_color] -= actual_cost
-                        self.fertility[row][col] += actual_times * 5
-                        total_farm_cost += actual_cost
-                        self.farm_grid[row][col] = actual_times
+        for row, col in sorted(self.marked_cells):  # 粮草不够时按格子顺序先到先得
+            farm_times = self.farm_grid[row][col]
+            if farm_times > 0 and self.territory[row][col] == player_color:
+                farm_cost = farm_times * 10
+                if self.food[player_color] >= farm_cost:
+                    self.food[player_color] -= farm_cost
+                    self.set_fertility(row, col, self.fertility[row][col] + farm_times * 5)
+                    total_farm_cost += farm_cost
+                else:
+                    # 粮草不足，调整屯田次数
+                    max_affordable = self.food[player_color] // 10
+                    actual_times = min(farm_times, max_affordable)
+                    actual_cost = actual_times * 10
+                    self.food[player_color] -= actual_cost
+                    self.set_farm(row, col, actual_times)
+                    self.set_fertility(row, col, self.fertility[row][col] + actual_times * 5)
+                    total_farm_cost += actual_cost
 
         return total_farm_cost
 
     def update_territory(self, row, col, color):
         # 更新领土控制
+        old = self.territory[row][col]
+        if old != color:
+            if self.journal is not None:
+                self.journal.append(('territory', row, col, old))
+            if old is not None:
+                self.zobrist ^= zobrist.tables().territory[old][row * GRID_SIZE + col]
+            if color is not None:
+                self.zobrist ^= zobrist.tables().territory[color][row * GRID_SIZE + col]
+                self.territory_cells[color].add((row, col))
+            if old is not None:
+                self.territory_cells[old].discard((row, col))
         self.territory[row][col] = color
+        if self.tax_grid[row][col] or self.farm_grid[row][col]:
+            self.refresh_plan_cell(row, col)
+
+    def owner(self, row, col):
+        # 格子的领土归属（颜色或 None）
+        return self.territory[row][col]
+
+    def set_tax(self, row, col, taxed):
+        # 标记/取消一个征税格子
+        if self.tax_grid[row][col] != taxed:
+            if self.journal is not None:
+                self.journal.append(('tax', row, col, self.tax_grid[row][col]))
+            self.zobrist ^= zobrist.tables().tax[row * GRID_SIZE + col]
+            self.tax_grid[row][col] = taxed
+            self.refresh_marked(row, col)
+            self.refresh_plan_cell(row, col)
+
+    def set_farm(self, row, col, times):
+        # 设置一个格子的屯田次数
+        if self.farm_grid[row][col] != times:
+            old = self.farm_grid[row][col]
+            if self.journal is not None:
+                self.journal.append(('farm', row, col, old))
+            keys = zobrist.tables()
+            if old:
+                self.zobrist ^= keys.farm(row, col, old)
+            if times:
+                self.zobrist ^= keys.farm(row, col, times)
+            self.farm_grid[row][col] = times
+            self.refresh_marked(row, col)
+            self.refresh_plan_cell(row, col)
+
+    def refresh_marked(self, row, col):
+        if self.tax_grid[row][col] or self.farm_grid[row][col]:
+            self.marked_cells.add((row, col))
+        else:
+            self.marked_cells.discard((row, col))
+
+    def set_tax_mask(self, player_color, mask):
+        # 按位设置征税标记（第 row * GRID_SIZE + col 位），只对该玩家的领土生效
+        for row, col in self.territory_cells[player_color]:
+            self.set_tax(row, col, bool(mask >> (row * GRID_SIZE + col) & 1))
+
+    def set_farm_counts(self, counts):
+        # 整体替换屯田计划 ((row, col, times), ...)
+        for row, col in tuple(self.marked_cells):
+            self.set_farm(row, col, 0)
+        for row, col, times in counts:
+            self.set_farm(row, col, times)
+
+    def undo_changes(self, changes):
+        # 按相反顺序恢复 journal 中记下的旧值（经过各 setter，预览缓存和哈希同步恢复）
+        for kind, row, col, old in reversed(changes):
+            if kind == 'fertility':
+                self.set_fertility(row, col, old)
+            elif kind == 'territory':
+                self.update_territory(row, col, old)
+            elif kind == 'tax':
+                self.set_tax(row, col, old)
+            else:
+                self.set_farm(row, col, old)
+
+    def preview_operations(self, player_color):
+        # 征税和屯田后的粮草，以及每格丰饶度的变化（读缓存，调用方不要修改返回的网格）
+        return self.food[player_color] + self.plan_food_delta[player_color], self.fertility_changes
+
+    def first_negative_cell(self, player_color):
+        # 操作后丰饶度会变为负数的第一个己方格子，没有则返回 None
+        cells = self.negative_cells[player_color]
+        return min(cells) if cells else None
 
     def reset_management_grids(self):
-        # 重置管理网格
-        self.tax_grid = [[False for _ in range(GRID_SIZE)] for _ in range(GRID_SIZE)]
-        self.farm_grid = [[0 for _ in range(GRID_SIZE)] for _ in range(GRID_SIZE)]
+        # 重置管理网格（只有带标记的格子需要清除，同时从哈希中去掉计划部分）
+        keys = zobrist.tables()
+        for row, col in self.marked_cells:
+            if self.tax_grid[row][col]:
+                self.zobrist ^= keys.tax[row * GRID_SIZE + col]
+                if self.journal is not None:
+                    self.journal.append(('tax', row, col, True))
+                self.tax_grid[row][col] = False
+            if self.farm_grid[row][col]:
+                self.zobrist ^= keys.farm(row, col, self.farm_grid[row][col])
+                if self.journal is not None:
+                    self.journal.append(('farm', row, col, self.farm_grid[row][col]))
+                self.farm_grid[row][col] = 0
+            self.fertility_changes[row][col] = 0
+            self.plan_cell_food[row][col] = 0
+        self.marked_cells.clear()
+        self.plan_food_delta = {'black': 0, 'white': 0}
+        self.negative_cells = {'black': set(), 'white': set()}
+        self.plan_version += 1
 
 # 技能系统
 class SkillSystem:
@@ -127,12 +319,35 @@ class SkillSystem:
         return False
 
 
+# 电脑玩家
+AI_COLOR = None  # 电脑执哪一方：'white'、'black' 或 None（双人对战）
+AI_TIME_LIMIT = 1.0  # 每次决策的思考时间（秒）
+AI_MAX_DEPTH = 8  # 迭代加深的最大层数（每层是一个决策）
+AI_TABLE_BITS = 18  # 置换表大小（2 的幂次）
+AI_ENGINE = 'alphabeta'  # 'alphabeta' 或 'mcts'
+MCTS_WORKERS = None  # 根并行的进程数，None 为 CPU 核数
+MCTS_PLAYOUT_DEPTH = 24  # 每次模拟最多走的决策数，之后按评分折算胜率
+MCTS_EXPLORATION = 1.4  # UCT 探索系数
+MCTS_EVAL_SCALE = 400  # 评分折算胜率的尺度：评分领先这么多约等于 73% 胜率
+PLAN_HORIZON = 3  # 规划征税/屯田时往后看的回合数（“规划”按钮和电脑玩家用）
+
+# 自对弈（selfplay.py）
+SELFPLAY_OUT_FILE = "log/selfplay.jsonl"  # 每局结果一行 JSON
+
+# 批量训练环境（vecenv.py）
+VECENV_MAX_STEPS = 2000  # 每局最多执行的动作数，到了算未分胜负并重开
+
+
 # 显示参数
 SCREEN_SCALE = 0.75
 scl = lambda x: round(x * SCREEN_SCALE)
 SCREEN_WIDTH = scl(1600)
 SCREEN_HEIGHT = scl(900)
-GRID_SIZE = 8  # 8x8棋盘
+GRID_SIZE = 8  # 棋盘边长（5~64），双方的初始布局按边长生成
+BOARD_VIEW_SIZE = 8  # 界面一屏显示的格数（棋盘贴图画的是 8x8），棋盘更大时可以滚动
+if not 5 <= GRID_SIZE <= 64:
+    raise ValueError(f"GRID_SIZE must be between 5 and 64, got {GRID_SIZE}")
+VIEW_SIZE = min(GRID_SIZE, BOARD_VIEW_SIZE)
 
 # 字体
 GAME_FONT        = "fonts/Minecraftia-Regular-1.ttf"
@@ -140,11 +355,20 @@ GAME_FONT_CHN    = "fonts/simsun.ttc"
 FONT_SIZE_SMALL  = scl(16)
 FONT_SIZE_NORMAL = scl(24)
 FONT_SIZE_TITLE  = scl(36)
+TEXT_CACHE_SIZE  = 512  # 文字 surface 缓存的最大条目数
+
+# 主循环
+FPS = 60  # 帧率上限
+EVENT_DRIVEN_LOOP = True  # True：没有输入时阻塞等待事件，只在有变化时重画；False：固定帧率循环
+IDLE_WAIT_MS = 1000  # 事件驱动模式下最长等待时间（毫秒），超时也会检查一次状态
+PROFILER_WINDOW = 300  # 性能面板统计最近多少帧
+PROFILER_TRACE_EVENTS = 20000  # 保留最近多少个计时事件供导出
+PROFILER_TRACE_FILE = "log/trace.json"  # F4 导出的 trace 文件
 
 # 透明度常量
 BEHIND_OBST_TRANS = 0.6  # 棋子在障碍物下的透明度
 
-# 网格中心点坐标
+# 网格中心点坐标（屏幕上显示的 VIEW_SIZE x VIEW_SIZE 格）
 POS_GRID_NW_CENTRE = (scl(543), scl(193))  # 左上第一格的中心点
 POS_GRID_SE_CENTRE = (scl(1062), scl(708))  # 右下最后一格的中心点
 
@@ -153,8 +377,8 @@ POS_INFO_NW = (scl(1200), scl(100))  # 文本起始点
 POS_INFO_SE = (scl(1540), scl(810))  # （没用）
 
 # 计算网格间距
-GRID_SPACING_X = (POS_GRID_SE_CENTRE[0] - POS_GRID_NW_CENTRE[0]) / (GRID_SIZE - 1)
-GRID_SPACING_Y = (POS_GRID_SE_CENTRE[1] - POS_GRID_NW_CENTRE[1]) / (GRID_SIZE - 1)
+GRID_SPACING_X = (POS_GRID_SE_CENTRE[0] - POS_GRID_NW_CENTRE[0]) / (VIEW_SIZE - 1)
+GRID_SPACING_Y = (POS_GRID_SE_CENTRE[1] - POS_GRID_NW_CENTRE[1]) / (VIEW_SIZE - 1)
 
 # 棋子大小
 PIECE_SIZE = scl(60)
@@ -197,6 +421,13 @@ BUTTONS = {
         'anchor': 'NW',
         'invisible': False,
     },
+    'white_plan': {
+        'name': '白规划',
+        'pos':  [scl(116), scl(354)],
+        'size': [scl(244), scl(60)],
+        'anchor': 'NW',
+        'invisible': False,
+    },
 
     # 黑方
     'black_tax': {
@@ -219,6 +450,13 @@ BUTTONS = {
         'size': [scl(72),  scl(88)],
         'anchor': 'NW',
         'invisible': False,
+    },
+    'black_plan': {
+        'name': '黑规划',
+        'pos':  [scl(116), scl(491)],
+        'size': [scl(244), scl(60)],
+        'anchor': 'NW',
+        'invisible': False,
     }
 }
 
@@ -236,3 +474,4 @@ def to_times(times: int) -> str:
 # 日志
 CONSOLE_LOGGING = True
 FILE_LOGGING_NAME = "log/game.log"
+RECORD_FILE = "log/games.lrec"  # 界面对局的二进制记录（重开或退出时追加一局），None 为不记录
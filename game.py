@@ -1,47 +1,69 @@
 import pygame
 import sys
 import os
-import math
 import logging
 from logging.handlers import RotatingFileHandler
-from collections import defaultdict
 
 from consts import *
+import rules
+from render import LayerCompositor, TextCache
+import assets
+import record
+import planner
+from profiler import FrameProfiler
+from hitmap import HitMap
+from ai import AIPlayer
 
 
-# 配置日志
+# 配置日志（规则核心 rules 的日志也写到同样的位置）
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
+for _logger in (logger, rules.logger):
+    _logger.setLevel(logging.DEBUG)
 if FILE_LOGGING_NAME:
     if os.path.dirname(FILE_LOGGING_NAME) and not os.path.exists(os.path.dirname(FILE_LOGGING_NAME)):
         os.makedirs(os.path.dirname(FILE_LOGGING_NAME))
     file_handler = RotatingFileHandler(FILE_LOGGING_NAME, encoding='utf-8', maxBytes=256*1024, backupCount=2)
     file_handler.setLevel(logging.DEBUG)
     file_handler.setFormatter(logging.Formatter("%(asctime)s: %(levelname)s:\t%(filename)s:%(lineno)d\t%(message)s"))
-    logger.addHandler(file_handler)
+    for _logger in (logger, rules.logger):
+        _logger.addHandler(file_handler)
 if CONSOLE_LOGGING:
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(logging.Formatter("%(asctime)s: %(levelname)s:\t%(filename)s:%(lineno)d\t%(message)s"))
-    logger.addHandler(console_handler)
+    for _logger in (logger, rules.logger):
+        _logger.addHandler(console_handler)
 
 # 初始化pygame
 pygame.init()
 pygame.font.init()
 
-# 事件处理器
-class EventHandler:
-    def __init__(self):
-        self.listeners = defaultdict(list)
-
-    def add_listener(self, event_type, callback):
-        self.listeners[event_type].append(callback)
-
-    def dispatch(self, event_type, data=None):
-        for callback in self.listeners[event_type]:
-            callback(data)
+# 加载不到贴图时使用的默认图形，没有默认图形的返回 None
+def default_sprite(name, size):
+    if name == 'board':
+        surface = pygame.Surface(size)
+        surface.fill(LIGHT_BROWN)
+        return surface
+    surface = pygame.Surface(size, pygame.SRCALPHA)
+    center = (size[0] // 2, size[1] // 2)
+    color = BLACK if 'black' in name else WHITE
+    if name in ('piece_black', 'piece_white'):
+        pygame.draw.circle(surface, color, center, PIECE_SIZE // 2)
+    elif name.endswith('_lujiao'):
+        # 使用颜色圆圈作为默认显示
+        pygame.draw.circle(surface, color, center, PIECE_SIZE // 3)
+    elif name.endswith('_fortress'):
+        pygame.draw.rect(surface, color, (0, 0, PIECE_SIZE, PIECE_SIZE))
+    elif name == 'highlight':
+        pygame.draw.circle(surface, (255, 255, 0, 128), center, PIECE_SIZE // 2 + 5, 5)
+    elif name == 'valid_move':
+        pygame.draw.circle(surface, (0, 255, 0, 128), center, PIECE_SIZE // 4)
+    else:
+        # 如果没有专用贴图，将使用通用颜色贴图
+        return None
+    return surface
 
-# 加载图片
+# 加载图片：优先读取预先缩放好的图集（python assets.py 生成），没有或过期时逐张加载
 def load_images():
     images = {}
     # 确保有images文件夹
@@ -49,145 +71,137 @@ def load_images():
         os.makedirs("images")
         logger.error("Please put image resources in the images folder")
 
-    # 尝试加载图片，如果失败则使用彩色方块代替
-    try:
-        images['board'] = pygame.image.load("images/board.png").convert_alpha()
-        images['board'] = pygame.transform.scale(images['board'], (SCREEN_WIDTH, SCREEN_HEIGHT))
-    except:
-        try:
-            images['board'] = pygame.image.load("images/beach.png").convert_alpha()
-            images['board'] = pygame.transform.scale(images['board'], (SCREEN_WIDTH, SCREEN_HEIGHT))
-        except:
-            logger.warning("Cannot load board.png, using default background")
-            images['board'] = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-            images['board'].fill(LIGHT_BROWN)
-
-    # 加载棋子图片
-    piece_colors = ['black', 'white']
-    piece_types = ['pawn', 'rook', 'knight', 'bishop', 'queen', 'king']
+    atlas = assets.load_atlas()
+    if atlas is None:
+        logger.info("Sprite atlas missing or outdated, loading images one by one (run `python assets.py` to build it)")
+        atlas = {}, set()
+    sprites, missing = atlas
+
+    # 尝试加载图片，如果失败则使用默认图形代替
+    for name, files, size in assets.sprite_specs():
+        if name in sprites:
+            images[name] = sprites[name]
+            continue
+        # 图集索引里记录为缺失的贴图不再尝试读取，也不再重复警告
+        surface = None if name in missing else assets.load_sprite(files, size)
+        if surface is None:
+            if name not in missing:
+                logger.warning(f"Cannot load {os.path.basename(files[0])}, using default")
+            surface = default_sprite(name, size)
+        if surface is not None:
+            images[name] = surface
+
+    build_sprite_variants(images, assets.PIECE_COLORS, assets.PIECE_TYPES)
+    return images
+
+# 生成带透明度的贴图副本（透明度直接乘进每个像素的 alpha）
+def translucent(surface, transparency):
+    faded = surface.copy()
+    faded.fill((255, 255, 255, int(255 * transparency)), special_flags=pygame.BLEND_RGBA_MULT)
+    return faded
+
+# 预先生成棋子的各种绘制状态，绘制时直接取用，不必每帧新建 surface
+#   piece_{color}_{type}_behind：障碍物下的半透明贴图
+#   piece_{color}_{type}_selected / _selected_behind：叠好选中高亮的贴图（尺寸同高亮图）
+def build_sprite_variants(images, piece_colors, piece_types):
+    highlight = images['highlight']
     for color in piece_colors:
-        # 加载通用颜色棋子
-        try:
-            images[f'piece_{color}'] = pygame.image.load(f"images/piece_{color}.png").convert_alpha()
-            images[f'piece_{color}'] = pygame.transform.scale(images[f'piece_{color}'], (PIECE_SIZE, PIECE_SIZE))
-        except:
-            logger.warning(f"Cannot load piece_{color}.png, using default piece")
-            images[f'piece_{color}'] = pygame.Surface((PIECE_SIZE, PIECE_SIZE), pygame.SRCALPHA)
-            if color == 'black':
-                pygame.draw.circle(images[f'piece_{color}'], BLACK, (PIECE_SIZE // 2, PIECE_SIZE // 2), PIECE_SIZE // 2)
-            elif color == 'white':
-                pygame.draw.circle(images[f'piece_{color}'], WHITE, (PIECE_SIZE // 2, PIECE_SIZE // 2), PIECE_SIZE // 2)
-
-        # 加载特定类型棋子
         for ptype in piece_types:
-            try:
-                images[f'piece_{color}_{ptype}'] = pygame.image.load(
-                    f"images/piece_{color}_{ptype}.png").convert_alpha()
-                images[f'piece_{color}_{ptype}'] = pygame.transform.scale(images[f'piece_{color}_{ptype}'],
-                                                                          (PIECE_SIZE, PIECE_SIZE))
-            except:
-                logger.warning(f"Cannot load piece_{color}_{ptype}.png, using default piece")
-                # 如果没有专用贴图，将使用通用颜色贴图
-
-    # 加载障碍物贴图
-    for color in piece_colors:
-        try:
-            images[f'obstacle_{color}_lujiao'] = pygame.image.load(
-                f"images/obstacle_{color}_lujiao.png").convert_alpha()
-            images[f'obstacle_{color}_lujiao'] = pygame.transform.scale(images[f'obstacle_{color}_lujiao'],
-                                                                        (PIECE_SIZE, PIECE_SIZE))
-        except:
-            logger.warning(f"Cannot load obstacle_{color}_lujiao.png, using default indicator")
-            images[f'obstacle_{color}_lujiao'] = pygame.Surface((PIECE_SIZE, PIECE_SIZE), pygame.SRCALPHA)
-            # 使用颜色圆圈作为默认显示
-            circle_color = BLACK if color == 'black' else WHITE
-            pygame.draw.circle(images[f'obstacle_{color}_lujiao'], circle_color, (PIECE_SIZE // 2, PIECE_SIZE // 2),
-                               PIECE_SIZE // 3)
-
-        # 新增：加载堡垒贴图
-        try:
-            images[f'obstacle_{color}_fortress'] = pygame.image.load(
-                f"images/obstacle_{color}_fortress.png").convert_alpha()
-            images[f'obstacle_{color}_fortress'] = pygame.transform.scale(images[f'obstacle_{color}_fortress'],
-                                                                          (PIECE_SIZE, PIECE_SIZE))
-        except:
-            logger.warning(f"Cannot load obstacle_{color}_fortress.png, using default indicator")
-            images[f'obstacle_{color}_fortress'] = pygame.Surface((PIECE_SIZE, PIECE_SIZE), pygame.SRCALPHA)
-            circle_color = BLACK if color == 'black' else WHITE
-            pygame.draw.rect(images[f'obstacle_{color}_fortress'], circle_color, (0, 0, PIECE_SIZE, PIECE_SIZE))
-
-    # 加载高亮和有效移动提示
-    try:
-        images['highlight'] = pygame.image.load("images/highlight.png").convert_alpha()
-        images['highlight'] = pygame.transform.scale(images['highlight'], (PIECE_SIZE + 20, PIECE_SIZE + 20))
-    except:
-        logger.warning("Cannot load highlight.png, using default highlight effect")
-        images['highlight'] = pygame.Surface((PIECE_SIZE + 20, PIECE_SIZE + 20), pygame.SRCALPHA)
-        pygame.draw.circle(images['highlight'], (255, 255, 0, 128), (PIECE_SIZE // 2 + 10, PIECE_SIZE // 2 + 10),
-                           PIECE_SIZE // 2 + 5, 5)
-
-    try:
-        images['valid_move'] = pygame.image.load("images/valid_move.png").convert_alpha()
-        images['valid_move'] = pygame.transform.scale(images['valid_move'], (PIECE_SIZE // 2, PIECE_SIZE // 2))
-    except:
-        logger.warning("Cannot load valid_move.png, using default indicator")
-        images['valid_move'] = pygame.Surface((PIECE_SIZE // 2, PIECE_SIZE // 2), pygame.SRCALPHA)
-        pygame.draw.circle(images['valid_move'], (0, 255, 0, 128), (PIECE_SIZE // 4, PIECE_SIZE // 4), PIECE_SIZE // 4)
+            key = f'piece_{color}_{ptype}'
+            sprite = images.get(key, images[f'piece_{color}'])
+            images[key] = sprite
+            images[f'{key}_behind'] = translucent(sprite, BEHIND_OBST_TRANS)
+            for suffix in ('', '_behind'):
+                selected = highlight.copy()
+                piece_img = images[key + suffix]
+                selected.blit(piece_img, piece_img.get_rect(center=selected.get_rect().center))
+                images[f'{key}_selected{suffix}'] = selected
+
+# 棋盘区域（含棋子高亮和丰饶度文字的边距），棋盘上的各层只刷新这一块
+_BOARD_MARGIN = max(GRID_SPACING_X, PIECE_SIZE + 20)
+BOARD_RECT = (
+    round(POS_GRID_NW_CENTRE[0] - _BOARD_MARGIN), round(POS_GRID_NW_CENTRE[1] - _BOARD_MARGIN),
+    round(POS_GRID_SE_CENTRE[0] - POS_GRID_NW_CENTRE[0] + 2 * _BOARD_MARGIN),
+    round(POS_GRID_SE_CENTRE[1] - POS_GRID_NW_CENTRE[1] + 2 * _BOARD_MARGIN),
+)
+
+# 性能面板中单独计时的绘制阶段（Game 的方法名）；主循环另外记录 events、draw（合成）和 flip
+PROFILED_STAGES = ('draw_board', 'draw_fertility_values', 'draw_management_marks', 'draw_pieces',
+                   'draw_obstacles', 'draw_buttons', 'draw_game_info')
+
+# 棋盘视口：棋盘比一屏大时只显示 VIEW_SIZE x VIEW_SIZE 格，(row, col) 是屏幕左上角那一格
+# 棋盘上的绘制都只画视口内的格子
+class BoardView:
+    def __init__(self):
+        # 初始显示先手（白方）底线的中间
+        self.row = GRID_SIZE - VIEW_SIZE
+        self.col = (GRID_SIZE - VIEW_SIZE) // 2
 
-    return images
+    def scroll(self, d_row, d_col):
+        """移动视口（不超出棋盘），位置变了返回 True"""
+        limit = GRID_SIZE - VIEW_SIZE
+        row = min(max(self.row + d_row, 0), limit)
+        col = min(max(self.col + d_col, 0), limit)
+        moved = (row, col) != (self.row, self.col)
+        self.row, self.col = row, col
+        return moved
+
+    def contains(self, row, col):
+        return 0 <= row - self.row < VIEW_SIZE and 0 <= col - self.col < VIEW_SIZE
+
+    def cells(self):
+        # 视口内的所有格子
+        return [(row, col) for row in range(self.row, self.row + VIEW_SIZE)
+                for col in range(self.col, self.col + VIEW_SIZE)]
+
+VIEW = BoardView()
 
 # 将网格坐标转换为屏幕坐标
 def grid_to_screen(row, col):
-    x = POS_GRID_NW_CENTRE[0] + col * GRID_SPACING_X
-    y = POS_GRID_NW_CENTRE[1] + row * GRID_SPACING_Y
+    x = POS_GRID_NW_CENTRE[0] + (col - VIEW.col) * GRID_SPACING_X
+    y = POS_GRID_NW_CENTRE[1] + (row - VIEW.row) * GRID_SPACING_Y
     return x, y
 
-# 将屏幕坐标转换为网格坐标
+# 将屏幕坐标（像素）转换为网格坐标，不在棋盘上返回 None
 def screen_to_grid(x, y):
-    # 计算相对于左上角第一个格子的偏移量
-    dx = x - POS_GRID_NW_CENTRE[0]
-    dy = y - POS_GRID_NW_CENTRE[1]
-    # 计算网格坐标
-    col = round(dx / GRID_SPACING_X)
-    row = round(dy / GRID_SPACING_Y)
-    # 确保坐标在有效范围内
-    if row < 0 or row >= GRID_SIZE or col < 0 or col >= GRID_SIZE:
+    cell = HIT_MAP.cell(x, y)
+    if cell is None:
         return None
-    return row, col
+    return cell[0] + VIEW.row, cell[1] + VIEW.col
+
+# 点击检测表：每个像素对应的格子（相对视口）/按钮，布局固定，启动时建一次
+def build_hit_map(buttons):
+    hit_map = HitMap(SCREEN_WIDTH, SCREEN_HEIGHT)
+    hit_map.add_grid(POS_GRID_NW_CENTRE, (GRID_SPACING_X, GRID_SPACING_Y), VIEW_SIZE, PIECE_SIZE // 2)
+    # 逆序画按钮，重叠时定义在前的按钮优先
+    for button_id, info in reversed(buttons.items()):
+        hit_map.add_button(button_id, (*info['pos'], *info['size']))
+    return hit_map
 
+HIT_MAP = build_hit_map(BUTTONS)
 
-# 棋子类
-class Piece:
-    def __init__(self, piece_id, piece_type, color, row, col):
-        self.id = piece_id  # 棋子唯一标识
-        self.type = piece_type  # 棋子类型
-        self.color = color  # 棋子颜色
-        self.row = row  # 行位置
-        self.col = col  # 列位置
-        self.selected = False  # 是否被选中
-        self.moved_this_turn = 0  # 本回合移动次数
+
+# 棋子类（在规则核心的棋子上添加绘制方法）
+class Piece(rules.Piece):
+    __slots__ = ()
 
     def draw(self, screen, images, font, transparency=1.0):
         # 计算棋子在屏幕上的位置
         x, y = grid_to_screen(self.row, self.col)
 
-        # 如果被选中，绘制高亮效果（不受透明度影响）
+        # 选中高亮（不受透明度影响）和障碍物下的半透明效果都已在 load_images 中预先叠好
+        key = f'piece_{self.color}_{self.type}'
         if self.selected:
-            highlight_rect = images['highlight'].get_rect(center=(x, y))
-            screen.blit(images['highlight'], highlight_rect)
-
-        # 绘制棋子（优先使用专用贴图）
-        piece_img = images.get(f'piece_{self.color}_{self.type}', images[f'piece_{self.color}'])
-
-        # 应用透明度
-        if transparency < 1.0:
-            # 创建带有透明度的surface
-            transparent_surface = pygame.Surface(piece_img.get_size(), pygame.SRCALPHA)
-            # 将原图像绘制到临时surface上
-            transparent_surface.blit(piece_img, (0, 0))
-            # 设置整体透明度
-            transparent_surface.set_alpha(int(255 * transparency))
-            piece_img = transparent_surface
+            key += '_selected'
+        if transparency == BEHIND_OBST_TRANS:
+            piece_img = images[f'{key}_behind']
+        elif transparency < 1.0:
+            # 其他透明度没有预生成，临时生成
+            if self.selected:
+                screen.blit(images['highlight'], images['highlight'].get_rect(center=(x, y)))
+            piece_img = translucent(images[f'piece_{self.color}_{self.type}'], transparency)
+        else:
+            piece_img = images[key]
 
         piece_rect = piece_img.get_rect(center=(x, y))
         screen.blit(piece_img, piece_rect)
@@ -200,65 +214,14 @@ class Piece:
         # screen.blit(text_surface, text_rect)
 
     def is_clicked(self, pos):
-        # 检查点击位置是否在棋子上
-        piece_x, piece_y = grid_to_screen(self.row, self.col)
-        distance = math.sqrt((pos[0] - piece_x) ** 2 + (pos[1] - piece_y) ** 2)
-        return distance < PIECE_SIZE // 2
-
-    def reset_turn_state(self):
-        # 重置回合状态
-        self.moved_this_turn = 0
-
-
-# 玩家类
-class Player:
-    def __init__(self, color, piece_count):
-        self.color = color
-        self.pieces = []  # 玩家的棋子列表
-        self.piece_count = piece_count
-        self.moves_this_turn = 0  # 本回合移动次数
-        self.skills_used_this_turn = 0  # 本回合技能使用次数
-        self.initialize_pieces()
-
-    def initialize_pieces(self):
-        # 根据玩家颜色初始化棋子位置
-        if self.color == 'black':
-            # 黑方初始布局（棋盘下方）
-            self.pieces = [
-                Piece(1, 'rook', 'black', 0, 0),
-                Piece(2, 'knight', 'black', 0, 1),
-                Piece(3, 'bishop', 'black', 0, 2),
-                Piece(4, 'queen', 'black', 0, 3),
-                Piece(5, 'king', 'black', 0, 4),
-                Piece(6, 'bishop', 'black', 0, 5),
-                Piece(7, 'knight', 'black', 0, 6),
-                Piece(8, 'rook', 'black', 0, 7),
-                *[Piece(9 + i, 'pawn', 'black', 1, i) for i in range(8)]
-            ]
-        elif self.color == 'white':
-            # 白方初始布局（棋盘上方）
-            self.pieces = [
-                Piece(1, 'rook', 'white', 7, 0),
-                Piece(2, 'knight', 'white', 7, 1),
-                Piece(3, 'bishop', 'white', 7, 2),
-                Piece(4, 'queen', 'white', 7, 3),
-                Piece(5, 'king', 'white', 7, 4),
-                Piece(6, 'bishop', 'white', 7, 5),
-                Piece(7, 'knight', 'white', 7, 6),
-                Piece(8, 'rook', 'white', 7, 7),
-                *[Piece(9 + i, 'pawn', 'white', 6, i) for i in range(8)]
-            ]
+        # 检查点击位置是否在棋子上（在本格棋子的圆内）
+        return HIT_MAP.piece_cell(*pos) == (self.row - VIEW.row, self.col - VIEW.col)
 
-    def reset_turn_state(self):
-        # 重置回合状态
-        self.moves_this_turn = 0
-        self.skills_used_this_turn = 0  # 重置技能使用次数
-        for piece in self.pieces:
-            piece.reset_turn_state()
 
+# 游戏类（规则核心 + 绘制与鼠标输入）
+class Game(rules.GameState):
+    piece_class = Piece
 
-# 游戏类
-class Game:
     def __init__(self):
         # 尝试加载字体，如果失败则使用系统默认字体
         try:
@@ -277,27 +240,36 @@ class Game:
             self.chn_font   = pygame.font.Font(None, FONT_SIZE_NORMAL)
 
         self.images = load_images()
+        self.text_cache = TextCache()  # 大部分文字每帧都一样，渲染结果缓存起来
 
-        # 添加资源系统、技能系统和事件处理器
-        self.resource_system = ResourceSystem()
-        self.skill_system = SkillSystem(self.resource_system)
-        self.event_handler = EventHandler()
-        self.event_handler.add_listener(GameEvent.TURN_END, self.on_turn_end)
-        self.event_handler.add_listener(GameEvent.PHASE_CHANGE, self.on_phase_change)
-
-        self.players = [
-            Player('white', 8),
-            Player('black', 8),
-        ]  # 顺序影响走子顺序
-        self.board: list[list[Piece|None]] = [[None for _ in range(GRID_SIZE)] for _ in range(GRID_SIZE)]
+        # 界面状态（reset 中也会重置）
         self.selected_piece:  Piece|None = None
         self.valid_moves = []
-        self.current_player_idx = 0  # 当前玩家索引
-        self.game_over = False
-        self.winner = None
-        self.phase = GamePhase.ACTION  # 初始阶段为行动阶段
         self.management_view = ManagementView.NONE  # 管理视图
-        self.initialize_board()
+
+        # 分层渲染缓存（reset 时全部重画）
+        self.compositor = LayerCompositor((SCREEN_WIDTH, SCREEN_HEIGHT))
+
+        # 初始化规则核心：资源系统、技能系统、事件处理器、棋盘和障碍物
+        super().__init__()
+
+        # 性能面板（F3）：给各绘制阶段套上计时（关闭时几乎没有开销），要在注册图层之前
+        self.profiler = FrameProfiler()
+        for stage in PROFILED_STAGES:
+            setattr(self, stage, self.profiler.wrap(stage, getattr(self, stage)))
+
+        # 从下到上：棋盘背景+按钮、丰饶度、管理标记+可走位置、棋子+障碍物、信息栏+说明
+        self.compositor.add_layer('static', self.draw_static_layer,
+                                  lambda: (self.current_player_idx, self.phase), opaque=True)
+        self.compositor.add_layer('fertility', self.draw_fertility_values,
+                                  lambda: self.resource_system.fertility_version, BOARD_RECT)
+        self.compositor.add_layer('marks', self.draw_board_marks,
+                                  lambda: (self.management_view, self.phase, self.current_player_idx,
+                                           self.resource_system.plan_version, self.resource_system.fertility_version,
+                                           self.selected_piece, tuple(self.valid_moves)), BOARD_RECT)
+        self.compositor.add_layer('pieces', self.draw_piece_layer,
+                                  lambda: (self.board_version, self.selected_piece), BOARD_RECT)
+        self.compositor.add_layer('overlay', self.draw_overlay, self.overlay_signature)
 
         self.buttons = BUTTONS.copy()
 
@@ -305,34 +277,37 @@ class Game:
         self.mouse_dragging = False  # 跟踪鼠标是否正在拖动
         self.last_drag_pos = None    # 记录上一次拖动的格子位置
 
-        # 添加技能相关属性
-        self.pawn_abilities = {}  # 存储兵的鹿角技能效果
-        self.rook_fortresses = {}  # 存储车的堡垒技能效果
-        self.king_cores = {}  # 存储王的核心化领土效果
-
-        # 添加障碍物系统
-        self.antlers = {}  # 鹿角位置 {(row,col): owner_color}
-        self.fortresses = {}  # 堡垒位置 {(row,col): owner_color}
-        self.core_territories = {}  # 核心领土 {(row,col): owner_color}
-
-    def initialize_board(self):
-        # 初始化棋盘，将玩家的棋子放置到棋盘上
-        for player in self.players:
-            for piece in player.pieces:
-                self.board[piece.row][piece.col] = piece
-                # 初始化领土控制
-                self.resource_system.update_territory(piece.row, piece.col, player.color)
+    def reset(self):
+        # 重置游戏（上一局有动作时先写入对局记录）
+        self.save_record()
+        self.history = []  # 每个成功的 make 对应一组动作，撤销时弹出
+        super().reset()
+        self.selected_piece = None
+        self.valid_moves = []
+        self.management_view = ManagementView.NONE
+        self.compositor.invalidate()
 
-    def get_current_player(self):
-        return self.players[self.current_player_idx]
+    def scroll_view(self, d_row, d_col):
+        # 滚动棋盘视口；视口变了各层都要重画
+        if VIEW.scroll(d_row, d_col):
+            self.compositor.invalidate()
 
     def draw(self, screen):
+        """合成画面，返回需要刷新的屏幕区域（没有变化时为空列表）"""
+        return self.compositor.compose(screen)
+
+    def draw_static_layer(self, screen):
         # 绘制棋盘背景
-        screen.blit(self.images['board'], (0, 0))
+        self.draw_board(screen)
 
-        # 绘制每个格子的丰饶度
-        self.draw_fertility_values(screen)
+        # 绘制按钮
+        self.draw_buttons(screen)
 
+    def draw_board(self, screen):
+        screen.fill(BACKGROUND_COLOUR)
+        screen.blit(self.images['board'], (0, 0))
+
+    def draw_board_marks(self, screen):
         # 绘制管理视图的标记（如果有）
         if self.management_view != ManagementView.NONE:
             self.draw_management_marks(screen)
@@ -340,25 +315,34 @@ class Game:
         # 绘制有效移动位置（只在走子阶段且选中棋子时）
         if self.phase == GamePhase.MOVE and self.selected_piece:
             for row, col in self.valid_moves:
+                if not VIEW.contains(row, col):
+                    continue
                 x, y = grid_to_screen(row, col)
                 move_rect = self.images['valid_move'].get_rect(center=(x, y))
                 screen.blit(self.images['valid_move'], move_rect)
 
-        # 首先绘制所有棋子（可能有透明度）
-        for row in range(GRID_SIZE):
-            for col in range(GRID_SIZE):
-                if self.board[row][col]:
-                    piece = self.board[row][col]
-                    # 检查棋子是否在障碍物下
-                    transparency = 1.0  # 默认不透明
-                    if (piece.row, piece.col) in self.antlers or (piece.row, piece.col) in self.fortresses:
-                        transparency = BEHIND_OBST_TRANS
+    def draw_piece_layer(self, screen):
+        # 先画棋子，障碍物画在棋子之上
+        self.draw_pieces(screen)
+        self.draw_obstacles(screen)
 
-                    piece.draw(screen, self.images, self.font, transparency)
+    def draw_pieces(self, screen):
+        # 绘制视口内的棋子（在障碍物下的半透明）
+        for row, col in VIEW.cells():
+            if self.board[row][col]:
+                piece = self.board[row][col]
+                # 检查棋子是否在障碍物下
+                transparency = 1.0  # 默认不透明
+                if (piece.row, piece.col) in self.antlers or (piece.row, piece.col) in self.fortresses:
+                    transparency = BEHIND_OBST_TRANS
 
-        # 然后绘制障碍物（在棋子之上绘制）
+                piece.draw(screen, self.images, self.font, transparency)
+
+    def draw_obstacles(self, screen):
         # 绘制鹿角障碍物
         for (row, col), color in self.antlers.items():
+            if not VIEW.contains(row, col):
+                continue
             x, y = grid_to_screen(row, col)
             antler_img = self.images.get(f'obstacle_{color}_lujiao')
             antler_rect = antler_img.get_rect(center=(x, y))
@@ -366,14 +350,14 @@ class Game:
 
         # 绘制堡垒障碍物
         for (row, col), color in self.fortresses.items():
+            if not VIEW.contains(row, col):
+                continue
             x, y = grid_to_screen(row, col)
             fortress_img = self.images.get(f'obstacle_{color}_fortress')
             fortress_rect = fortress_img.get_rect(center=(x, y))
             screen.blit(fortress_img, fortress_rect)
 
-        # 绘制按钮
-        self.draw_buttons(screen)
-
+    def draw_overlay(self, screen):
         # 绘制游戏信息
         self.draw_game_info(screen)
 
@@ -381,20 +365,51 @@ class Game:
         if self.management_view != ManagementView.NONE:
             self.draw_management_instructions(screen)
 
+    def draw_profiler(self, screen):
+        """把性能面板直接画在屏幕上（每帧都变，不进图层缓存），返回占用的区域"""
+        rows = self.profiler.summary()
+        line_height = self.small_font.get_linesize()
+        rect = pygame.Rect(scl(10), scl(10), scl(560), line_height * (len(rows) + 1) + scl(10))
+        self.compositor.restore(screen, rect)  # 先擦掉上一帧的面板
+        background = pygame.Surface(rect.size, pygame.SRCALPHA)
+        background.fill((0, 0, 0, 200))
+        screen.blit(background, rect)
+
+        # 每帧的文字都不同，不走文字缓存；字体不等宽，各列按固定位置右对齐
+        columns = (scl(340), scl(410), scl(480), scl(550))
+        lines = [('stage (ms)', 'frames', 'p50', 'p95', 'p99')]
+        lines += [(name, str(count), f"{p50:.2f}", f"{p95:.2f}", f"{p99:.2f}") for name, count, p50, p95, p99 in rows]
+        for i, (name, *values) in enumerate(lines):
+            y = rect.y + scl(5) + i * line_height
+            color = YELLOW if i == 1 else WHITE
+            screen.blit(self.small_font.render(name, True, color), (rect.x + scl(8), y))
+            for right, value in zip(columns, values):
+                text = self.small_font.render(value, True, color)
+                screen.blit(text, text.get_rect(topright=(rect.x + right, y)))
+        return rect
+
+    def overlay_signature(self):
+        # 信息栏显示的所有状态
+        current_player = self.get_current_player()
+        selected_cost = self.selected_piece and (self.selected_piece.type, self.selected_piece.moved_this_turn)
+        return (self.current_player_idx, self.phase, self.management_view, tuple(self.resource_system.food.items()),
+                self.resource_system.plan_version, self.resource_system.fertility_version,
+                current_player.moves_this_turn, current_player.skills_used_this_turn, selected_cost,
+                self.game_over, self.winner)
+
     def draw_fertility_values(self, screen):
-        for row in range(GRID_SIZE):
-            for col in range(GRID_SIZE):
-                fertility = self.resource_system.fertility[row][col]
-                x, y = grid_to_screen(row, col)
-                
-                # 调整文本位置，使其位于格子右下角
-                text_x = x + GRID_SPACING_X * 0.3
-                text_y = y + GRID_SPACING_Y * 0.3
-                
-                # 绘制丰饶度文本（蓝色）
-                text_surface = self.small_font.render(str(fertility), True, BLUE)
-                text_rect = text_surface.get_rect(center=(text_x, text_y))
-                screen.blit(text_surface, text_rect)
+        for row, col in VIEW.cells():
+            fertility = self.resource_system.fertility[row][col]
+            x, y = grid_to_screen(row, col)
+            
+            # 调整文本位置，使其位于格子右下角
+            text_x = x + GRID_SPACING_X * 0.3
+            text_y = y + GRID_SPACING_Y * 0.3
+            
+            # 绘制丰饶度文本（蓝色）
+            text_surface = self.text_cache.render(self.small_font, str(fertility), BLUE)
+            text_rect = text_surface.get_rect(center=(text_x, text_y))
+            screen.blit(text_surface, text_rect)
 
     def draw_management_marks(self, screen):
         # 统一方框/圆圈的边长（像素）
@@ -402,55 +417,61 @@ class Game:
         
         current_player = self.get_current_player()
         
-        # 计算操作后的资源状态
+        # 读取操作后的资源状态（资源系统中增量维护的缓存）
         final_food, fertility_changes = self.calculate_post_operation_resources(current_player.color)
         
-        for row in range(GRID_SIZE):
-            for col in range(GRID_SIZE):
-                x, y = grid_to_screen(row, col)
+        # 征税视图只画当前玩家自己的领土，屯田视图只画有标记的格子（都只看视口内）
+        if self.management_view == ManagementView.TAX:
+            cells = self.resource_system.territory_cells[current_player.color]
+        elif self.management_view == ManagementView.FARM:
+            cells = self.resource_system.marked_cells
+        else:
+            return
+
+        for row, col in VIEW.cells():
+            if (row, col) not in cells:
+                continue
+            x, y = grid_to_screen(row, col)
 
-                # ================= 征税模式 =================
-                if self.management_view == ManagementView.TAX:
-                    # 只给当前玩家自己的领土画绿色框
-                    if (self.resource_system.territory[row][col] ==
-                            current_player.color):
-                        if self.resource_system.tax_grid[row][col]:
-                            # 计算矩形框的尺寸和位置
-                            rect_size = int(GRID_SPACING_X * 0.8)  # 矩形框大小为格子间距的80%
-                            rect_x = x - rect_size // 2
-                            rect_y = y - rect_size // 2
-                            # 绘制红色矩形框
-                            pygame.draw.rect(screen, RED, (rect_x, rect_y, rect_size, rect_size), 2)
-                            
-                            # 在右上角显示操作后的丰饶度（红色）
-                            post_fertility = self.resource_system.fertility[row][col] + fertility_changes[row][col]
-                            text_surface = self.small_font.render(str(post_fertility), True, RED)
-                            text_rect = text_surface.get_rect(center=(x + rect_size//3, y - rect_size//3))
-                            screen.blit(text_surface, text_rect)
-                        else:
-                            rect_x = x - mark_size // 2
-                            rect_y = y - mark_size // 2
-                            # 绿色方框
-                            pygame.draw.rect(screen, GREEN, (rect_x, rect_y, mark_size, mark_size), 3)
-
-
-                # ================= 屯田模式 =================
-                elif self.management_view == ManagementView.FARM:
-                    farm_times = self.resource_system.farm_grid[row][col]
-                    if farm_times > 0:
-                        # 放大后的红色圆圈
-                        pygame.draw.circle(screen, HIGHLIGHT_RED,
-                                           (x, y), mark_size // 2, 3)
-                        # 圈中央写数字
-                        text_surface = self.font.render(str(farm_times), True, WHITE)
-                        text_rect = text_surface.get_rect(center=(x, y))
-                        screen.blit(text_surface, text_rect)
-                        
-                        # 在右上角显示操作后的丰饶度（红色）
-                        post_fertility = self.resource_system.fertility[row][col] + fertility_changes[row][col]
-                        text_surface = self.font.render(str(post_fertility), True, RED)
-                        text_rect = text_surface.get_rect(center=(x + mark_size//3, y - mark_size//3))
-                        screen.blit(text_surface, text_rect)
+            # ================= 征税模式 =================
+            if self.management_view == ManagementView.TAX:
+                if self.resource_system.tax_grid[row][col]:
+                    # 计算矩形框的尺寸和位置
+                    rect_size = int(GRID_SPACING_X * 0.8)  # 矩形框大小为格子间距的80%
+                    rect_x = x - rect_size // 2
+                    rect_y = y - rect_size // 2
+                    # 绘制红色矩形框
+                    pygame.draw.rect(screen, RED, (rect_x, rect_y, rect_size, rect_size), 2)
+                    
+                    # 在右上角显示操作后的丰饶度（红色）
+                    post_fertility = self.resource_system.fertility[row][col] + fertility_changes[row][col]
+                    text_surface = self.text_cache.render(self.small_font, str(post_fertility), RED)
+                    text_rect = text_surface.get_rect(center=(x + rect_size//3, y - rect_size//3))
+                    screen.blit(text_surface, text_rect)
+                else:
+                    rect_x = x - mark_size // 2
+                    rect_y = y - mark_size // 2
+                    # 绿色方框
+                    pygame.draw.rect(screen, GREEN, (rect_x, rect_y, mark_size, mark_size), 3)
+
+
+            # ================= 屯田模式 =================
+            elif self.management_view == ManagementView.FARM:
+                farm_times = self.resource_system.farm_grid[row][col]
+                if farm_times > 0:
+                    # 放大后的红色圆圈
+                    pygame.draw.circle(screen, HIGHLIGHT_RED,
+                                       (x, y), mark_size // 2, 3)
+                    # 圈中央写数字
+                    text_surface = self.text_cache.render(self.font, str(farm_times), WHITE)
+                    text_rect = text_surface.get_rect(center=(x, y))
+                    screen.blit(text_surface, text_rect)
+                    
+                    # 在右上角显示操作后的丰饶度（红色）
+                    post_fertility = self.resource_system.fertility[row][col] + fertility_changes[row][col]
+                    text_surface = self.text_cache.render(self.font, str(post_fertility), RED)
+                    text_rect = text_surface.get_rect(center=(x + mark_size//3, y - mark_size//3))
+                    screen.blit(text_surface, text_rect)
 
     def draw_management_instructions(self, screen):
         # 绘制管理视图的操作说明
@@ -478,7 +499,7 @@ class Game:
 
         # 绘制说明文字
         for i, instruction in enumerate(instructions):
-            text = self.small_font.render(instruction, True, WHITE)
+            text = self.text_cache.render(self.small_font, instruction, WHITE)
             screen.blit(text, (scl(60), scl(210) + i * scl(30)))
 
     def draw_game_info(self, screen):
@@ -493,13 +514,13 @@ class Game:
 
         # 绘制当前玩家信息
         current_player = self.get_current_player()
-        text = self.title_font.render(f"Player: {current_player.color}", True, WHITE)
+        text = self.text_cache.render(self.title_font, f"Player: {current_player.color}", WHITE)
         screen.blit(text, (x, y))
         y += scl(70)
 
         # 绘制玩家资源信息
         for player in self.players:
-            food_text = self.font.render(f"{player.color}: Food: {self.resource_system.food[player.color]}", True, WHITE)
+            food_text = self.text_cache.render(self.font, f"{player.color}: Food: {self.resource_system.food[player.color]}", WHITE)
             screen.blit(food_text, (x, y))
             y += scl(40)
             
@@ -507,38 +528,40 @@ class Game:
             if self.phase == GamePhase.ACTION and player.color == current_player.color:
                 final_food, _ = self.calculate_post_operation_resources(player.color)
                 if final_food != self.resource_system.food[player.color]:
-                    post_food_text = self.font.render(f"After: Food: {final_food}", True,
-                                                       GREEN if final_food >= 0 else RED)  # 颜色提示
+                    post_food_text = self.text_cache.render(self.font, f"After: Food: {final_food}",
+                                                            GREEN if final_food >= 0 else RED)  # 颜色提示
                     screen.blit(post_food_text, (x, y))
                     y += scl(40)
 
         y += scl(30)  # 增加一些间距
 
         # 绘制当前阶段信息
-        phase_text = self.font.render(f"Phase: {self.phase.value}", True,
+        phase_text = self.text_cache.render(self.font, f"Phase: {self.phase.value}",
             {GamePhase.MOVE: LIGHT_BROWN, GamePhase.ACTION: YELLOW}.get(self.phase, WHITE))
         screen.blit(phase_text, (x, y))
         y += scl(40)
 
         # 绘制管理视图信息
         if self.management_view != ManagementView.NONE:
-            view_text = self.font.render(f"View: {self.management_view.value}", True, WHITE)
+            view_text = self.text_cache.render(self.font, f"View: {self.management_view.value}", WHITE)
             screen.blit(view_text, (x, y))
             y += scl(40)
 
         # 绘制移动次数信息
         if self.phase == GamePhase.MOVE:
-            moves_text = self.font.render(
+            moves_text = self.text_cache.render(
+                self.font,
                 f"Moves: {current_player.moves_this_turn}/{PIECE_MOVE_MAX_PER_TURN}",
-                True, WHITE
+                WHITE
             )
             screen.blit(moves_text, (x, y))
             y += scl(40)
 
             # 添加技能使用次数显示
-            skills_text = self.font.render(
+            skills_text = self.text_cache.render(
+                self.font,
                 f"Skills: {current_player.skills_used_this_turn}/{SKILL_MAX_PER_TURN}",
-                True, WHITE
+                WHITE
             )
             screen.blit(skills_text, (x, y))
             y += scl(40)
@@ -546,9 +569,10 @@ class Game:
             # 添加移动消耗信息（如果选中了棋子）
             if self.selected_piece:
                 move_cost = PIECE_MOVE_COST(self.selected_piece.type, self.selected_piece.moved_this_turn)
-                cost_text = self.font.render(
+                cost_text = self.text_cache.render(
+                    self.font,
                     f"Move cost: {move_cost} food",
-                    True, WHITE
+                    WHITE
                 )
                 screen.blit(cost_text, (x, y))
                 y += scl(40)
@@ -560,6 +584,7 @@ class Game:
         if self.phase == GamePhase.ACTION:
             instructions = [
                 "Click Tax/Farming buttons for planning",
+                "Click Plan to auto-plan",
                 "Click End Turn to implement plan",
             ]
         elif self.phase == GamePhase.MOVE:
@@ -567,20 +592,23 @@ class Game:
                 "Click piece to select",
                 "Click target position to move",
                 "Right-click piece to use skill",
+                "Ctrl+Z to undo",
             ]
+        if GRID_SIZE > VIEW_SIZE:
+            instructions.append("Arrows/wheel: scroll board")
 
         for instruction in instructions:
-            text = self.font.render(instruction, True, WHITE)
+            text = self.text_cache.render(self.font, instruction, WHITE)
             screen.blit(text, (x, y))
             y += scl(40)
 
         # 如果游戏结束，显示获胜者
         if self.game_over:
             y += scl(20)  # 增加一些间距
-            winner_text = self.title_font.render(f"Game Over!", True, WHITE)
+            winner_text = self.text_cache.render(self.title_font, f"Game Over!", WHITE)
             screen.blit(winner_text, (x, y))
             y += scl(70)
-            winner_text = self.title_font.render(f"Winner: {self.winner}", True, WHITE)
+            winner_text = self.text_cache.render(self.title_font, f"Winner: {self.winner}", WHITE)
             screen.blit(winner_text, (x, y))
 
     def draw_buttons(self, screen):
@@ -600,30 +628,19 @@ class Game:
                 is_usable = False
             if btn_id.startswith('black') and current.color != 'black':
                 is_usable = False
-            if any(k in btn_id for k in ['tax', 'farm']) and self.phase != GamePhase.ACTION:
+            if any(k in btn_id for k in ['tax', 'farm', 'plan']) and self.phase != GamePhase.ACTION:
                 is_usable = False
 
             color = (100, 100, 200) if is_usable else (100, 100, 100)
             pygame.draw.rect(screen, color, rect)
             pygame.draw.rect(screen, BLACK, rect, 2)
-            text = self.chn_font.render(info['name'], True, WHITE)
+            text = self.text_cache.render(self.chn_font, info['name'], WHITE)
             text_rect = text.get_rect(center=rect.center)
             screen.blit(text, text_rect)
 
     def check_button_click(self, pos):
-        """检查是否点击了按钮"""
-        x, y = pos
-        for button_id, button_info in self.buttons.items():
-            btn_x, btn_y = button_info['pos']
-            btn_width, btn_height = button_info['size']
-
-            # 检查点击位置是否在按钮范围内
-            if (btn_x <= x <= btn_x + btn_width and
-                    btn_y <= y <= btn_y + btn_height):
-                logger.debug(f"按钮被点击: {button_id}")
-                return button_id
-
-        return None
+        """检查是否点击了按钮（只查表，不写日志：悬停、拖动和测试扫描也会调用）"""
+        return HIT_MAP.button(*pos)
 
     def handle_button_action(self, button_id):
         current = self.get_current_player()  # 当前回合玩家
@@ -632,9 +649,11 @@ class Game:
             'white_tax': current.color == 'white' and self.phase == GamePhase.ACTION,
             'white_farm': current.color == 'white' and self.phase == GamePhase.ACTION,
             'white_end': current.color == 'white',
+            'white_plan': current.color == 'white' and self.phase == GamePhase.ACTION,
             'black_tax': current.color == 'black' and self.phase == GamePhase.ACTION,
             'black_farm': current.color == 'black' and self.phase == GamePhase.ACTION,
-            'black_end': current.color == 'black'
+            'black_end': current.color == 'black',
+            'black_plan': current.color == 'black' and self.phase == GamePhase.ACTION,
         }
         if not usable.get(button_id, False):
             return  # 不是对应回合，直接忽略
@@ -653,261 +672,82 @@ class Game:
             else:
                 self.management_view = ManagementView.FARM
 
+        # --------- 规划 ---------
+        elif button_id.endswith('_plan'):
+            # 填入最优的征税/屯田标记（之后还可以手动修改）
+            best = planner.plan(self.resource_system, current.color)
+            self.resource_system.set_tax_mask(current.color, best.tax_mask)
+            self.resource_system.set_farm_counts(best.farm_counts)
+            self.management_view = ManagementView.FARM if best.farm_counts else ManagementView.TAX
+            logger.info(f"Suggested plan for {current.color}: food {best.food} after this turn")
+
         # --------- 结束回合 ---------
         elif button_id.endswith('_end'):
             if self.phase == GamePhase.ACTION:
-                # 检查操作是否会导致负资源
-                final_food, fertility_changes = self.calculate_post_operation_resources(current.color)
-                
-                # 检查粮草是否为负
-                if final_food < 0:
-                    logger.info("Cannot end turn: Not enough food for farming operations")
-                    return
-                    
-                # 检查是否有格子的丰饶度为负
-                for row in range(GRID_SIZE):
-                    for col in range(GRID_SIZE):
-                        if self.resource_system.territory[row][col] == current.color:
-                            post_fertility = self.resource_system.fertility[row][col] + fertility_changes[row][col]
-                            if post_fertility < 0:
-                                logger.info(f"Cannot end turn: Fertility at ({row}, {col}) would become negative")
-                                return
-                
-                # 执行税收 + 屯田
-                tax = self.resource_system.collect_tax(current.color)
-                farm_cost = self.resource_system.implement_farming(current.color)
-                logger.debug(f"{current.color} 征税 {tax}，屯田花费 {farm_cost}")
-                self.phase = GamePhase.MOVE
-                self.management_view = ManagementView.NONE
-                self.event_handler.dispatch(GameEvent.PHASE_CHANGE)
+                # 校验并执行税收 + 屯田，成功后进入走子阶段
+                if self.make(rules.EndActionPhase()):
+                    self.management_view = ManagementView.NONE
 
             elif self.phase == GamePhase.MOVE:
                 # 轮到下一位玩家
-                self.current_player_idx = (self.current_player_idx + 1) % len(self.players)
-                self.phase = GamePhase.ACTION
-                self.event_handler.dispatch(GameEvent.PHASE_CHANGE)
-                self.event_handler.dispatch(GameEvent.TURN_END)
-
-    def is_blocked(self, from_pos, to_pos, attacker_color):
-        """检查移动路径是否被障碍物阻挡"""
-        from_row, from_col = from_pos
-        to_row, to_col = to_pos
-
-        # 如果是马，可以跳过鹿角（但不能跳过堡垒）
-        piece = self.board[from_row][from_col]
-        if piece and piece.type == 'knight':
-            # 马可以跳过鹿角，但不能进入敌方堡垒
-            if (to_row, to_col) in self.fortresses and self.fortresses[(to_row, to_col)] != attacker_color:
-                return True
+                self.make(rules.EndTurn())
+
+    def make(self, action):
+        # 界面上点选的征税/屯田标记不是动作，提交时补记到对局记录里
+        plan = ()
+        if isinstance(action, rules.EndActionPhase):
+            plan = record.plan_actions(self.resource_system, self.get_current_player().color)
+        if not super().make(action):
             return False
+        self.history.append((*plan, action))
+        return True
 
-        # 直线移动检测
-        if from_row == to_row or from_col == to_col:
-            if from_row == to_row:  # 水平移动
-                step = 1 if to_col > from_col else -1
-                for col in range(from_col + step, to_col, step):
-                    pos = (from_row, col)
-                    # 敌方鹿角阻挡
-                    if pos in self.antlers and self.antlers[pos] != attacker_color:
-                        return True
-                    # 敌方堡垒阻挡
-                    if pos in self.fortresses and self.fortresses[pos] != attacker_color:
-                        return True
-            else:  # 垂直移动
-                step = 1 if to_row > from_row else -1
-                for row in range(from_row + step, to_row, step):
-                    pos = (row, from_col)
-                    if pos in self.antlers and self.antlers[pos] != attacker_color:
-                        return True
-                    if pos in self.fortresses and self.fortresses[pos] != attacker_color:
-                        return True
-
-        # 斜线移动检测
-        else:
-            row_step = 1 if to_row > from_row else -1
-            col_step = 1 if to_col > from_col else -1
-            steps = abs(to_row - from_row)
-            for i in range(1, steps):
-                r = from_row + i * row_step
-                c = from_col + i * col_step
-                pos = (r, c)
-                if pos in self.antlers and self.antlers[pos] != attacker_color:
-                    return True
-                if pos in self.fortresses and self.fortresses[pos] != attacker_color:
-                    return True
-
-        # 目标位置堡垒检测
-        if to_pos in self.fortresses and self.fortresses[to_pos] != attacker_color:
+    def unmake(self):
+        if super().unmake():
+            self.history.pop()
             return True
-
         return False
 
-    def move_piece(self, from_row, from_col, to_row, to_col):
-        # 移动棋子
-        piece = self.board[from_row][from_col]
-        current_player = self.get_current_player()
-
-        # 检查是否已超过移动次数限制
-        if current_player.moves_this_turn >= PIECE_MOVE_MAX_PER_TURN:
-            logger.info("Maximum moves per turn reached")
-            return False
-
-        # 检查王是否已超过移动次数限制
-        if piece.type == 'king' and piece.moved_this_turn >= PIECE_KING_MOVE_MAX_PER_TURN:
-            logger.info("King can only move %s per turn" % to_times(PIECE_KING_MOVE_MAX_PER_TURN))
-            return False
+    def save_record(self):
+        # 把当前这局追加到 RECORD_FILE
+        if not RECORD_FILE or not getattr(self, 'history', None):
+            return
+        actions = [action for group in self.history for action in group]
+        try:
+            os.makedirs(os.path.dirname(RECORD_FILE) or '.', exist_ok=True)
+            with record.RecordWriter(RECORD_FILE) as writer:
+                writer.write_game(actions, self.winner)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Cannot save game record: {e}")
+
+    def apply_decision(self, decision):
+        # 执行电脑玩家的决策（一组动作），先清掉界面上的选中状态和管理视图
+        if self.selected_piece:
+            self.selected_piece.selected = False
+        self.selected_piece = None
+        self.valid_moves = []
+        self.management_view = ManagementView.NONE
+        for action in decision:
+            if not self.make(action):
+                logger.warning(f"AI action rejected: {action!r}")
+                return False
+        return True
 
-        # 检查移动消耗
-        move_cost = PIECE_MOVE_COST(piece.type, piece.moved_this_turn)
-        if self.resource_system.food[current_player.color] < move_cost:
-            logger.info(f"Not enough food to move {piece.type} (cost: {move_cost})")
+    def undo(self):
+        # 撤销上一个动作（Ctrl+Z）
+        if not self.undo_stack:
             return False
-
-        # 检查目标位置是否有敌方鹿角
-        target_pos = (to_row, to_col)
-        if target_pos in self.antlers and self.antlers[target_pos] != piece.color:
-            # 吃掉鹿角（不移位，只移除鹿角）
-            del self.antlers[target_pos]
-            logger.debug(f"{piece.color} ate enemy antlers")
-            
-            # 扣除移动消耗
-            self.resource_system.food[current_player.color] -= move_cost
-            current_player.moves_this_turn += 1
-            return True  # 不移位，但消耗移动次数和粮草
-
-        # 检查目标位置是否有敌方堡垒
-        if target_pos in self.fortresses and self.fortresses[target_pos] != piece.color:
-            logger.info(f"{piece.color} cannot move to enemy fortress")
-            return False  # 无法移动到敌方堡垒
-
-        # 处理目标位置的棋子（吃子）
-        target_piece = self.board[to_row][to_col]
-        if target_piece:
-            # 从玩家的棋子列表中移除被吃的棋子
-            for player in self.players:
-                if target_piece in player.pieces:
-                    player.pieces.remove(target_piece)
-                    break
-
-        # 更新领土控制
-        self.resource_system.update_territory(to_row, to_col, piece.color)
-
-        # 扣除移动消耗
-        self.resource_system.food[current_player.color] -= move_cost
-
-        # 执行移动
-        self.board[to_row][to_col] = piece
-        self.board[from_row][from_col] = None
-        piece.row = to_row
-        piece.col = to_col
-        piece.moved_this_turn = True
-        current_player.moves_this_turn += 1
-
+        # 新回合里还没提交的征税/屯田标记不在撤销记录中，先清掉，撤销结束回合时会恢复上一回合的计划
+        if self.phase == GamePhase.ACTION and isinstance(self.undo_stack[-1].action, rules.EndTurn):
+            self.resource_system.reset_management_grids()
+        self.unmake()
+        if self.selected_piece:
+            self.selected_piece.selected = False
+        self.selected_piece = None
+        self.valid_moves = []
+        self.management_view = ManagementView.NONE
         return True
 
-    def get_valid_moves(self, row, col):
-        piece = self.board[row][col]
-        moves = []
-        current_player = self.get_current_player()
-        move_cost = PIECE_MOVE_COST(piece.type, piece.moved_this_turn)
-
-        # 检查是否有足够的粮草移动这个棋子
-        has_enough_food = self.resource_system.food[current_player.color] >= move_cost
-
-        if not has_enough_food:
-            return []  # 粮草不足，无法移动
-
-        if piece.type == 'pawn':
-            # 兵的特殊移动规则
-            direction = 1 if piece.color == 'black' else -1
-            # 基本前进
-            if 0 <= row + direction < GRID_SIZE and self.board[row + direction][col] is None:
-                moves.append((row + direction, col))
-                # 如果是初始位置，可以前进两格
-                if (piece.color == 'black' and row == 1) or (piece.color == 'white' and row == 6):
-                    if self.board[row + 2 * direction][col] is None:
-                        moves.append((row + 2 * direction, col))
-            # 吃子斜进
-            for dc in [-1, 1]:
-                if 0 <= col + dc < GRID_SIZE and 0 <= row + direction < GRID_SIZE:
-                    target = self.board[row + direction][col + dc]
-                    if target and target.color != piece.color:
-                        moves.append((row + direction, col + dc))
-
-        elif piece.type == 'rook':
-            # 车的移动规则（直线无限距离）
-            for dr, dc in [(1, 0), (-1, 0), (0, 1), (0, -1)]:
-                for i in range(1, GRID_SIZE):
-                    r, c = row + dr * i, col + dc * i
-                    if not (0 <= r < GRID_SIZE and 0 <= c < GRID_SIZE):
-                        break
-                    if self.board[r][c] is None:
-                        moves.append((r, c))
-                    else:
-                        if self.board[r][c].color != piece.color:
-                            moves.append((r, c))
-                        break
-
-        elif piece.type == 'knight':
-            # 马的移动规则（L形）
-            for dr, dc in [(2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)]:
-                r, c = row + dr, col + dc
-                if 0 <= r < GRID_SIZE and 0 <= c < GRID_SIZE:
-                    if self.board[r][c] is None or self.board[r][c].color != piece.color:
-                        moves.append((r, c))
-
-        elif piece.type == 'bishop':
-            # 象的移动规则（斜线无限距离）
-            for dr, dc in [(1, 1), (1, -1), (-1, 1), (-1, -1)]:
-                for i in range(1, GRID_SIZE):
-                    r, c = row + dr * i, col + dc * i
-                    if not (0 <= r < GRID_SIZE and 0 <= c < GRID_SIZE):
-                        break
-                    if self.board[r][c] is None:
-                        moves.append((r, c))
-                    else:
-                        if self.board[r][c].color != piece.color:
-                            moves.append((r, c))
-                        break
-
-        elif piece.type == 'queen':
-            # 后的移动规则（直线+斜线无限距离）
-            for dr, dc in [(1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1)]:
-                for i in range(1, GRID_SIZE):
-                    r, c = row + dr * i, col + dc * i
-                    if not (0 <= r < GRID_SIZE and 0 <= c < GRID_SIZE):
-                        break
-                    if self.board[r][c] is None:
-                        moves.append((r, c))
-                    else:
-                        if self.board[r][c].color != piece.color:
-                            moves.append((r, c))
-                        break
-
-        elif piece.type == 'king':
-            # 王的移动规则（单格任意方向）
-            for dr in [-1, 0, 1]:
-                for dc in [-1, 0, 1]:
-                    if dr == 0 and dc == 0:
-                        continue
-                    r, c = row + dr, col + dc
-                    if 0 <= r < GRID_SIZE and 0 <= c < GRID_SIZE:
-                        if self.board[r][c] is None or self.board[r][c].color != piece.color:
-                            moves.append((r, c))
-
-        # 过滤被阻挡的移动
-        valid_moves = []
-        for move in moves:
-            # 检查目标位置是否有敌方堡垒
-            if move in self.fortresses and self.fortresses[move] != piece.color:
-                continue  # 跳过敌方堡垒
-
-            # 检查移动路径是否被阻挡
-            if not self.is_blocked((row, col), move, piece.color):
-                valid_moves.append(move)
-
-        return valid_moves
-
     def handle_management_view_click(self, pos, button, is_drag=False):
         # 处理管理视图的点击
         grid_pos = screen_to_grid(pos[0], pos[1])
@@ -928,21 +768,23 @@ class Game:
         # 更新最后拖动位置
         self.last_drag_pos = (row, col)
 
+        # 通过 set_tax / set_farm 修改，预览缓存只更新这一格
         if self.management_view == ManagementView.TAX:
             # 税收视图
             if button == 1:  # 左键
-                self.resource_system.tax_grid[row][col] = True
+                self.resource_system.set_tax(row, col, True)
             elif button == 3:  # 右键
-                self.resource_system.tax_grid[row][col] = False
+                self.resource_system.set_tax(row, col, False)
 
         elif self.management_view == ManagementView.FARM:
             # 屯田视图
+            farm_times = self.resource_system.farm_grid[row][col]
             if button == 1:  # 左键
-                if self.resource_system.farm_grid[row][col] < FARM_MAX_PER_GRID_PER_TURN:
-                    self.resource_system.farm_grid[row][col] += 1
+                if farm_times < FARM_MAX_PER_GRID_PER_TURN:
+                    self.resource_system.set_farm(row, col, farm_times + 1)
             elif button == 3:  # 右键
-                if self.resource_system.farm_grid[row][col] > 0:
-                    self.resource_system.farm_grid[row][col] -= 1
+                if farm_times > 0:
+                    self.resource_system.set_farm(row, col, farm_times - 1)
 
     def handle_click(self, pos, button=1):
         if self.game_over:
@@ -980,16 +822,7 @@ class Game:
 
         # 右键点击 - 尝试使用技能
         if button == 3:  # 右键
-            if self.board[row][col] and self.board[row][col].color == current_player.color:
-                # 检查技能使用次数限制
-                if current_player.skills_used_this_turn >= SKILL_MAX_PER_TURN:
-                    logger.info("Maximum skills per turn reached")
-                    return
-
-                piece = self.board[row][col]
-                # 尝试使用技能
-                if self.cast_skill(piece):
-                    current_player.skills_used_this_turn += 1
+            self.make(rules.CastSkill(row, col))
             return
 
         # 左键点击 - 原有的移动逻辑
@@ -1003,149 +836,88 @@ class Game:
         else:
             # 如果已经选中了棋子，尝试移动它
             if (row, col) in self.valid_moves:
-                success = self.move_piece(self.selected_piece.row, self.selected_piece.col, row, col)
+                # 走子（含游戏结束检查），记入撤销栈
+                success = self.make(rules.Move(self.selected_piece.row, self.selected_piece.col, row, col))
                 if success:
                     self.selected_piece.selected = False
                     self.selected_piece = None
                     self.valid_moves = []
-
-                    # 检查游戏是否结束
-                    self.check_game_over()
             else:
                 # 如果点击了其他棋子，取消选择当前棋子
                 self.selected_piece.selected = False
                 self.selected_piece = None
                 self.valid_moves = []
 
-    def cast_skill(self, piece):
-        current_player = self.get_current_player()
-
-        # 检查粮草是否足够
-        if not self.skill_system.can_cast_skill(piece.type, current_player.color):
-            logger.info(f"Not enough food to cast {piece.type} skill")
-            return False
-
-        # 兵技能 - 放置鹿角
-        if piece.type == 'pawn':
-            pos = (piece.row, piece.col)
-            # 检查位置是否已经有障碍物
-            if pos in self.antlers or pos in self.fortresses:
-                logger.info("Cannot place antlers on existing obstacle")
-                return False
-
-            # 扣除粮草并放置鹿角
-            if self.skill_system.cast_skill(piece.type, current_player.color):
-                self.antlers[pos] = current_player.color
-                logger.debug(f"{current_player.color} placed antlers at {pos}")
-                return True
-
-        # 车技能 - 放置堡垒
-        elif piece.type == 'rook':
-            pos = (piece.row, piece.col)
-            # 检查位置是否已经有障碍物
-            if pos in self.antlers or pos in self.fortresses:
-                logger.info("Cannot place fortress on existing obstacle")
-                return False
-
-            # 扣除粮草并放置堡垒
-            if self.skill_system.cast_skill(piece.type, current_player.color):
-                self.fortresses[pos] = current_player.color
-                logger.debug(f"{current_player.color} placed fortress at {pos}")
-                return True
 
-        # 其他棋子无技能
+# 主游戏循环
+def coalesce_motion(events):
+    # 连续的鼠标移动事件中，落在同一格子上的只保留最后一个（拖动时经过的每个格子仍会处理到）
+    merged = []
+    for event in events:
+        if (event.type == pygame.MOUSEMOTION and merged and merged[-1].type == pygame.MOUSEMOTION
+                and screen_to_grid(*merged[-1].pos) == screen_to_grid(*event.pos)):
+            merged[-1] = event
         else:
-            logger.info(f"{piece.type} has no skill")
-            return False
+            merged.append(event)
+    return merged
 
-    def on_turn_end(self, data=None):
-        # 回合结束时的处理逻辑
-        # 更新丰饶度
-        self.resource_system.update_fertility(self.board)
 
-        # 重置玩家和棋子的回合状态
-        for player in self.players:
-            player.reset_turn_state()
+# 电脑思考完成时由后台线程发出，唤醒阻塞等待中的主循环
+AI_DONE_EVENT = pygame.USEREVENT + 1
 
-        # 重置管理网格
-        self.resource_system.reset_management_grids()
+# 方向键滚动视口：(行, 列) 的变化
+SCROLL_KEYS = {pygame.K_UP: (-1, 0), pygame.K_DOWN: (1, 0), pygame.K_LEFT: (0, -1), pygame.K_RIGHT: (0, 1)}
 
-    def on_phase_change(self, data=None):
-        # 阶段变化时的处理逻辑
-        if self.phase == GamePhase.ACTION:
-            logger.info("进入行动阶段")
-        elif self.phase == GamePhase.MOVE:
-            logger.info("进入走子阶段")
-
-    def check_game_over(self):
-        # 检查游戏是否结束
-        # 如果一方没有棋子，游戏结束
-        for player in self.players:
-            if len(player.pieces) == 0:
-                self.game_over = True
-                # 找到另一方作为获胜者
-                for p in self.players:
-                    if p != player:
-                        self.winner = p.color
-                break
 
-    def reset(self):
-        # 重置游戏
-        self.players = [
-            Player('white', 8),
-            Player('black', 8),
-        ]
-        self.board = [[None for _ in range(GRID_SIZE)] for _ in range(GRID_SIZE)]
-        self.selected_piece = None
-        self.valid_moves = []
-        self.current_player_idx = 0
-        self.game_over = False
-        self.winner = None
-        self.phase = GamePhase.ACTION
-        self.management_view = ManagementView.NONE
-        self.initialize_board()
-
-        # 重置资源系统
-        self.resource_system = ResourceSystem()
-        self.skill_system = SkillSystem(self.resource_system)
-
-        # 重置障碍物
-        self.antlers = {}
-        self.fortresses = {}
-        self.core_territories = {}
-
-    def calculate_post_operation_resources(self, player_color):
-        """计算操作后的粮草和丰饶度状态"""
-        food = self.resource_system.food[player_color]
-        fertility_changes = [[0 for _ in range(GRID_SIZE)] for _ in range(GRID_SIZE)]
-        
-        # 计算税收收入
-        tax_income = 0
-        for row in range(GRID_SIZE):
-            for col in range(GRID_SIZE):
-                if (self.resource_system.tax_grid[row][col] and 
-                    self.resource_system.territory[row][col] == player_color):
-                    tax_amount = self.resource_system.fertility[row][col] // 10
-                    tax_income += tax_amount
-                    fertility_changes[row][col] -= 10  # 税收减少丰饶度
-        
-        # 计算屯田花费和收益
-        farm_cost = 0
-        for row in range(GRID_SIZE):
-            for col in range(GRID_SIZE):
-                farm_times = self.resource_system.farm_grid[row][col]
-                if farm_times > 0 and self.resource_system.territory[row][col] == player_color:
-                    farm_cost += farm_times * 10
-                    fertility_changes[row][col] += farm_times * 5  # 屯田增加丰饶度
-        
-        # 计算最终粮草
-        final_food = food + tax_income - farm_cost
-        
-        return final_food, fertility_changes
-
-
-# 主游戏循环
-def main():
+def handle_event(game, event, ai=None):
+    """处理一个事件，返回 False 表示退出游戏"""
+    # 电脑的回合只响应退出、重开、滚动和窗口事件
+    if ai is not None and ai.is_turn(game):
+        if event.type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEMOTION):
+            return True
+        if event.type == pygame.KEYDOWN and event.key not in (pygame.K_r, pygame.K_F3, pygame.K_F4, *SCROLL_KEYS):
+            return True
+    match event.type:
+        case pygame.QUIT:
+            return False
+        case pygame.MOUSEBUTTONDOWN:
+            if event.button in [1, 3]:  # 左键或右键点击
+                game.mouse_dragging = True  # 开始拖动
+                game.last_drag_pos = None  # 重置最后拖动位置
+                game.handle_click(event.pos, event.button)
+        case pygame.WINDOWEXPOSED:
+            game.compositor.invalidate()  # 窗口被遮挡后重新显示，整体重画
+        case pygame.MOUSEBUTTONUP:
+            game.mouse_dragging = False  # 结束拖动
+        case pygame.MOUSEWHEEL:
+            game.scroll_view(-event.y, event.x)  # 滚轮上下滚动行，横向滚动列
+        case pygame.MOUSEMOTION:
+            # 如果鼠标按下且在管理视图中，处理拖动
+            if game.mouse_dragging and game.management_view != ManagementView.NONE:
+                game.handle_management_view_click(event.pos, pygame.mouse.get_pressed()[0] and 1 or 3, is_drag=True)
+        case pygame.KEYDOWN:
+            if event.key == pygame.K_r:  # 按R键重置游戏
+                game.reset()
+            elif event.key in SCROLL_KEYS:  # 方向键滚动棋盘
+                game.scroll_view(*SCROLL_KEYS[event.key])
+            elif event.key == pygame.K_F3:  # F3 开关性能面板
+                if not game.profiler.toggle():
+                    game.compositor.invalidate()  # 擦掉面板
+            elif event.key == pygame.K_F4:  # F4 导出最近的计时事件
+                count = game.profiler.dump_trace()
+                logger.info(f"Wrote {count} trace events to {PROFILER_TRACE_FILE}")
+            elif event.key == pygame.K_z and pygame.key.get_mods() & pygame.KMOD_CTRL:
+                game.undo()  # Ctrl+Z 撤销上一个动作
+            elif event.key == pygame.K_a and pygame.key.get_mods() & pygame.KMOD_CTRL:
+                # Ctrl+A 标记所有可收税格子
+                if game.management_view == ManagementView.TAX:
+                    current_player = game.get_current_player()
+                    for row, col in game.resource_system.territory_cells[current_player.color]:
+                        game.resource_system.set_tax(row, col, True)
+    return True
+
+
+def main(event_driven=EVENT_DRIVEN_LOOP, ai_color=AI_COLOR):
     # 创建游戏窗口
     screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
     pygame.display.set_caption("Custom Chess Game")
@@ -1153,49 +925,74 @@ def main():
     clock = pygame.time.Clock()
     game = Game()
 
+    # 电脑玩家在后台线程思考，主循环继续绘制
+    ai = None
+    if ai_color:
+        searcher = None
+        if AI_ENGINE == 'mcts':
+            from mcts import MCTSEngine
+            searcher = MCTSEngine()
+        ai = AIPlayer(ai_color, on_done=lambda: pygame.event.post(pygame.event.Event(AI_DONE_EVENT)),
+                      searcher=searcher)
+
+    start_ticks = pygame.time.get_ticks()
+    rendered_frames = 0
+
     running = True
     while running:
-        for event in pygame.event.get():
-            match event.type:
-                case pygame.QUIT:
-                    running = False
-                case pygame.MOUSEBUTTONDOWN:
-                    if event.button in [1, 3]:  # 左键或右键点击
-                        game.mouse_dragging = True  # 开始拖动
-                        game.last_drag_pos = None  # 重置最后拖动位置
-                        game.handle_click(event.pos, event.button)
-                case pygame.MOUSEBUTTONUP:
-                    game.mouse_dragging = False  # 结束拖动
-                case pygame.MOUSEMOTION:
-                    # 如果鼠标按下且在管理视图中，处理拖动
-                    if game.mouse_dragging and game.management_view != ManagementView.NONE:
-                        game.handle_management_view_click(event.pos, pygame.mouse.get_pressed()[0] and 1 or 3, is_drag=True)
-                case pygame.KEYDOWN:
-                    if event.key == pygame.K_r:  # 按R键重置游戏
-                        game.reset()
-                    elif event.key == pygame.K_a and pygame.key.get_mods() & pygame.KMOD_CTRL:
-                        # Ctrl+A 标记所有可收税格子
-                        if game.management_view == ManagementView.TAX:
-                            current_player = game.get_current_player()
-                            for row in range(GRID_SIZE):
-                                for col in range(GRID_SIZE):
-                                    if game.resource_system.territory[row][col] == current_player.color:
-                                        game.resource_system.tax_grid[row][col] = True
-
-        # 绘制背景
-        screen.fill(BACKGROUND_COLOUR)
-
-        # 绘制游戏
-        game.draw(screen)
+        if event_driven:
+            # 没有事件时阻塞等待（有超时），不占用 CPU
+            first = pygame.event.wait(IDLE_WAIT_MS)
+            events = [first] if first.type != pygame.NOEVENT else []
+            events += pygame.event.get()
+        else:
+            events = pygame.event.get()
 
-        # 更新屏幕
-        pygame.display.flip()
-        clock.tick(60)
+        game.profiler.begin_frame()
+        with game.profiler.stage('events'):
+            for event in coalesce_motion(events):
+                if not handle_event(game, event, ai):
+                    running = False
 
+        # 轮到电脑：取回思考结果并执行，然后为下一个决策继续思考
+        if ai is not None and ai.is_turn(game):
+            decision = ai.poll(game)
+            if decision:
+                game.apply_decision(decision)
+            if ai.is_turn(game):
+                ai.start(game)
+
+        # 绘制游戏（只重画状态变化的层）
+        with game.profiler.stage('draw'):
+            dirty_rects = game.draw(screen)
+        rendered = bool(dirty_rects)
+        if game.profiler.enabled:
+            dirty_rects.append(game.draw_profiler(screen))
+
+        # 只刷新变化的区域
+        if dirty_rects:
+            with game.profiler.stage('flip'):
+                pygame.display.update(dirty_rects)
+        if rendered:
+            rendered_frames += 1
+        # 只统计处理了事件或者重画了的帧（空闲等待超时的循环不算）
+        game.profiler.end_frame(keep=bool(events) or rendered)
+        # 限制帧率：一帧内到达的多个事件合并成一次重画
+        clock.tick(FPS)
+
+    # 按固定帧率应该画的帧数与实际画的帧数之差
+    elapsed_ms = pygame.time.get_ticks() - start_ticks
+    skipped_frames = max(elapsed_ms * FPS // 1000 - rendered_frames, 0)
+    logger.info(f"Rendered {rendered_frames} frames, skipped {skipped_frames} frames in {elapsed_ms / 1000:.1f}s")
+
+    game.save_record()
+    if ai is not None:
+        ai.close()  # 结束 MCTS 的工作进程，不让它们比窗口活得久
     pygame.quit()
     logger.info("Game ended")
     sys.exit()
 
 
 if __name__ == "__main__":
-    main()
+    # python game.py [white|black]：让电脑执这一方
+    main(ai_color=sys.argv[1] if len(sys.argv) > 1 else AI_COLOR)
@@ -0,0 +1,95 @@
+from array import array
+
+
+# 点击检测表：屏幕上每个像素一项（array('H')，每项 2 字节），记录这个像素落在哪个格子或按钮上，
+# 以及是否在该格棋子的圆内。布局由 SCREEN_SCALE 决定，启动时建一次，之后每个鼠标事件只是一次数组下标。
+#   0：什么都没有
+#   HIT_CELL + row * grid_size + col：格子（与按四舍五入换算格子的结果相同）
+#   HIT_BUTTON + 序号：按钮（按钮覆盖在格子之上）
+#   HIT_PIECE：标志位，像素到格子中心的距离小于棋子半径
+HIT_NONE = 0
+HIT_CELL = 1
+HIT_BUTTON = 0x4000
+HIT_PIECE = 0x8000
+
+
+class HitMap:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.codes = array('H', [HIT_NONE]) * (width * height)
+        # 编码 -> 查询结果，查询时一次字典查找
+        self.cells = {}  # 格子编码（带不带 HIT_PIECE 都有）-> (row, col)
+        self.piece_cells = {}  # 带 HIT_PIECE 的格子编码 -> (row, col)
+        self.buttons = {}  # 按钮编码 -> 按钮 id
+
+    def add_grid(self, origin, spacing, grid_size, radius):
+        """画上棋盘：origin 是左上格中心，spacing 是 (横向, 纵向) 格距，radius 是棋子半径"""
+        x0, y0 = origin
+        spacing_x, spacing_y = spacing
+        width = self.width
+        for row in range(grid_size):
+            for col in range(grid_size):
+                code = HIT_CELL + row * grid_size + col
+                self.cells[code] = self.cells[code | HIT_PIECE] = self.piece_cells[code | HIT_PIECE] = (row, col)
+        cols = [round((x - x0) / spacing_x) for x in range(width)]
+        rows = [round((y - y0) / spacing_y) for y in range(self.height)]
+
+        # 同一行格子的所有像素行先共用一条模板，再逐格加上棋子圆内的标志位
+        templates = {}
+        for y, row in enumerate(rows):
+            if not 0 <= row < grid_size:
+                continue
+            if row not in templates:
+                base = HIT_CELL + row * grid_size
+                templates[row] = array('H', (base + col if 0 <= col < grid_size else HIT_NONE for col in cols))
+            self.codes[y * width:(y + 1) * width] = templates[row]
+
+        for row in range(grid_size):
+            center_y = y0 + row * spacing_y
+            for col in range(grid_size):
+                center_x = x0 + col * spacing_x
+                code = HIT_CELL + row * grid_size + col
+                for y in range(max(0, int(center_y - radius)), min(self.height, int(center_y + radius) + 2)):
+                    dy2 = (y - center_y) ** 2
+                    for x in range(max(0, int(center_x - radius)), min(width, int(center_x + radius) + 2)):
+                        index = y * width + x
+                        if self.codes[index] == code and (x - center_x) ** 2 + dy2 < radius * radius:
+                            self.codes[index] = code | HIT_PIECE
+
+    def add_button(self, button_id, rect):
+        """画上一个按钮（rect 为 (x, y, 宽, 高)，边界包含在内），后画的覆盖先画的"""
+        x, y, w, h = rect
+        code = HIT_BUTTON + len(self.buttons)
+        self.buttons[code] = button_id
+        left, right = max(0, x), min(self.width - 1, x + w)
+        if left > right:
+            return
+        line = array('H', [code]) * (right - left + 1)
+        for row in range(max(0, y), min(self.height - 1, y + h) + 1):
+            start = row * self.width + left
+            self.codes[start:start + len(line)] = line
+
+    def at(self, x, y):
+        # 像素的原始编码，窗口外为 HIT_NONE（坐标可以是小数，取所在的像素）
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.codes[int(y) * self.width + int(x)]
+        return HIT_NONE
+
+    def cell(self, x, y):
+        """像素所在的格子 (row, col)，不在棋盘上返回 None"""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.cells.get(self.codes[int(y) * self.width + int(x)])
+        return None
+
+    def piece_cell(self, x, y):
+        """像素在哪一格的棋子圆内，不在任何棋子圆内返回 None"""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.piece_cells.get(self.codes[int(y) * self.width + int(x)])
+        return None
+
+    def button(self, x, y):
+        """像素所在的按钮 id，没有则返回 None"""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.buttons.get(self.codes[int(y) * self.width + int(x)])
+        return None
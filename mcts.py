@@ -0,0 +1,159 @@
+import logging
+import math
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from consts import *
+from rules import Move
+from ai import legal_actions, evaluate, make_decision
+
+
+# 蒙特卡洛树搜索：决策的划分与 ai.py 相同（行动阶段计划、单次走子/技能、结束回合）
+# 并行方式是根并行：每个进程从同一局面各自建一棵树，结束后按根节点的决策合并访问次数和胜场
+# 子进程只导入规则核心，不需要 pygame
+logger = logging.getLogger(__name__)
+
+
+class Node:
+    __slots__ = ('player', 'parent', 'decision', 'children', 'untried', 'visits', 'wins')
+
+    def __init__(self, player, parent=None, decision=None):
+        self.player = player  # 做出 decision 的一方，wins 从这一方的角度统计
+        self.parent = parent
+        self.decision = decision
+        self.children = []
+        self.untried = None  # 还没展开的决策，第一次到达时生成
+        self.visits = 0
+        self.wins = 0.0
+
+    def select_child(self, exploration):
+        # UCT：平均胜率 + 探索项
+        log_visits = math.log(self.visits)
+        return max(self.children, key=lambda child: child.wins / child.visits
+                   + exploration * math.sqrt(log_visits / child.visits))
+
+
+def playout_result(state):
+    """局面对白方的得分（0~1）：分出胜负时为 0 或 1，否则按评分折算"""
+    if state.game_over:
+        return 1.0 if state.winner == 'white' else 0.0
+    return 1.0 / (1.0 + math.exp(-evaluate(state, 'white') / MCTS_EVAL_SCALE))
+
+
+def playout(state, rnd, depth=MCTS_PLAYOUT_DEPTH):
+    # 随机走若干个决策，有吃子时一半概率优先吃子（用 make 执行，调用方负责撤销）
+    for _ in range(depth):
+        actions = legal_actions(state)
+        if not actions:
+            break
+        captures = [decision for decision in actions if isinstance(decision[0], Move)
+                    and state.board[decision[0].to_row][decision[0].to_col] is not None]
+        decision = rnd.choice(captures) if captures and rnd.random() < 0.5 else rnd.choice(actions)
+        for action in decision:
+            if not state.make(action):
+                break
+    return playout_result(state)
+
+
+def run_tree(state, iterations=None, time_limit=None, seed=None, exploration=MCTS_EXPLORATION):
+    """在一个进程里建一棵树，返回根节点各决策的 [(决策, 访问次数, 胜场)] 和模拟次数
+
+    iterations 和 time_limit 至少给一个，先到者为准。每次迭代在 state 上 make，结束后全部撤销。
+    """
+    rnd = random.Random(seed)
+    deadline = time.perf_counter() + time_limit if time_limit is not None else None
+    root = Node(player=None)
+    base = len(state.undo_stack)
+    count = 0
+    while (iterations is None or count < iterations) and (deadline is None or time.perf_counter() < deadline):
+        node = root
+
+        # 选择：走到还有未展开决策的节点
+        while node.untried is not None and not node.untried and node.children:
+            node = node.select_child(exploration)
+            make_decision(state, node.decision)
+
+        # 展开一个新决策（不合法的决策直接丢弃）
+        if node.untried is None:
+            node.untried = legal_actions(state)
+            rnd.shuffle(node.untried)
+        while node.untried:
+            decision = node.untried.pop()
+            player = state.get_current_player().color
+            if make_decision(state, decision):
+                child = Node(player, node, decision)
+                node.children.append(child)
+                node = child
+                break
+
+        # 模拟，撤销回根局面，再回传
+        white_score = playout(state, rnd)
+        while len(state.undo_stack) > base:
+            state.unmake()
+        while node is not None:
+            node.visits += 1
+            if node.player is not None:
+                node.wins += white_score if node.player == 'white' else 1.0 - white_score
+            node = node.parent
+        count += 1
+
+    return [(child.decision, child.visits, child.wins) for child in root.children], count
+
+
+class MCTSEngine:
+    """根并行的 MCTS，接口与 ai.Searcher 相同（search(state) 返回决策）"""
+
+    def __init__(self, time_limit=AI_TIME_LIMIT, iterations=None, workers=MCTS_WORKERS):
+        self.time_limit = time_limit
+        self.iterations = iterations  # 每个进程的模拟次数上限
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = None  # 进程池在第一次搜索时创建，之后复用
+        self.stats = {}  # 最近一次搜索：每个决策的访问次数/胜场合计
+        self.playouts = 0
+        self.playouts_per_second = 0.0
+
+    def search(self, state):
+        start = time.perf_counter()
+        state = state.clone()
+        if self.workers == 1:
+            results = [run_tree(state, self.iterations, self.time_limit, random.getrandbits(32))]
+        else:
+            if self.executor is None:
+                # 工作进程用 spawn 启动：搜索跑在界面的后台线程里，fork 会把 SDL 和其他线程持有的锁原样复制到子进程
+                self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+            futures = [self.executor.submit(run_tree, state, self.iterations, self.time_limit,
+                                            random.getrandbits(32)) for _ in range(self.workers)]
+            results = [future.result() for future in futures]
+
+        # 合并各棵树根节点的统计
+        self.stats = {}
+        self.playouts = 0
+        for children, count in results:
+            self.playouts += count
+            for decision, visits, wins in children:
+                total = self.stats.setdefault(decision, [0, 0.0])
+                total[0] += visits
+                total[1] += wins
+        elapsed = time.perf_counter() - start
+        self.playouts_per_second = self.playouts / elapsed if elapsed > 0 else 0.0
+        if not self.stats:
+            return None
+        best = max(self.stats, key=lambda decision: self.stats[decision][0])
+        logger.debug(f"MCTS: {best} {self.stats[best]}, {self.playouts} playouts with {self.workers} workers, "
+                     f"{self.playouts_per_second:.0f}/s")
+        return best
+
+    def close(self):
+        """关闭进程池（还没开始的搜索任务取消，正在跑的等它在时限内结束）"""
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
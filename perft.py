@@ -0,0 +1,212 @@
+import argparse
+import json
+import platform
+import sys
+import time
+
+from consts import *
+from rules import GameState, SetTaxMask, SetFarmCounts, EndActionPhase, Move, CastSkill, EndTurn
+from ai import legal_actions, make_decision, unmake_decision
+
+
+# 走法生成的基准测试和正确性检查（类似国际象棋的 perft）
+# 从几个参考局面出发，数出 depth 层以内所有合法决策序列的叶子数（决策的划分与 ai.legal_actions 相同），
+# 再分别测 get_valid_moves、is_blocked、move_piece、cast_skill 每秒能调用多少次。
+# 叶子数与 REFERENCE_COUNTS 不一致说明规则的行为变了；--compare 与之前保存的结果比较速度。
+#   python perft.py --depth 3 --out perft.json
+#   python perft.py --compare perft.json
+
+BENCH_SECONDS = 0.2  # 每个函数至少测这么久
+
+# 参考局面在第 1、2、3 层的叶子数。不是拿本脚本的输出存档：tests/test_perft.py 用照搬最初版本逐方向试探的
+# 走法生成、clone + apply（不用走法表和 make/unmake）独立数出同样的值。
+# initial 第 1 层可以手数：行动阶段只有“能征的全部征税”和“不征税”两个候选计划（看几回合的最优计划与前者相同）
+# 规则或 ai.plan_candidates 的候选计划改变时，以那个测试数出的值为准更新这里
+REFERENCE_COUNTS = {
+    'initial': [2, 62, 1934],
+    'midgame': [2, 96, 4520],
+    'low_food': [33, 715, 2666],
+}
+
+
+def tax_all(state):
+    # 当前玩家的领土全部征税（不管新增的规则如何，保证脚本里的局面固定）
+    color = state.get_current_player().color
+    rs = state.resource_system
+    mask = 0
+    for row, col in rs.territory_cells[color]:
+        if rs.fertility[row][col] >= 10:
+            mask |= 1 << (row * GRID_SIZE + col)
+    return SetTaxMask(mask), SetFarmCounts(()), EndActionPhase()
+
+
+def play(state, script):
+    # 依次执行脚本中的动作（'tax' 表示全部征税并结束行动阶段），不合法时报错
+    for action in script:
+        for step in (tax_all(state) if action == 'tax' else (action,)):
+            if not state.apply(step):
+                raise RuntimeError(f"Reference position script failed at {step!r}")
+    return state
+
+
+# 中局：双方各有鹿角和堡垒，白方吃掉了一个兵，轮到白方的行动阶段
+MIDGAME_SCRIPT = (
+    'tax', Move(6, 4, 4, 4), Move(6, 3, 4, 3), CastSkill(4, 4), EndTurn(),
+    'tax', Move(1, 3, 3, 3), Move(1, 4, 3, 4), CastSkill(0, 0), EndTurn(),
+    'tax', Move(4, 4, 3, 3), CastSkill(7, 7), EndTurn(),
+    'tax', Move(0, 6, 2, 5), CastSkill(3, 4), EndTurn(),
+)
+
+
+def reference_positions(**options):
+    """{名字: 局面}，options 传给 GameState（例如 use_arrays=True）"""
+    initial = GameState(**options)
+
+    midgame = play(GameState(**options), MIDGAME_SCRIPT)
+
+    # 粮草不足：中局里白方不征税就进入走子阶段，只剩 4 点粮草（走得动兵，走不了马，放不了技能）
+    low_food = play(GameState(**options), MIDGAME_SCRIPT + (SetTaxMask(0), EndActionPhase()))
+    low_food.resource_system.food['white'] = 4
+
+    return {'initial': initial, 'midgame': midgame, 'low_food': low_food}
+
+
+def perft(state, depth):
+    """depth 层以内合法决策序列的叶子数（分出胜负的局面算一个叶子）"""
+    if depth == 0 or state.game_over:
+        return 1
+    nodes = 0
+    for decision in legal_actions(state):
+        if make_decision(state, decision):
+            nodes += perft(state, depth - 1)
+            unmake_decision(state, decision)
+    return nodes
+
+
+def _repeat(run):
+    # 反复调用 run()（返回本次计时的秒数和调用次数），直到累计 BENCH_SECONDS，返回每秒调用次数
+    elapsed = calls = 0
+    while elapsed < BENCH_SECONDS:
+        seconds, count = run()
+        if count == 0:
+            return None
+        elapsed += seconds
+        calls += count
+    return calls / elapsed
+
+
+def bench_functions(state):
+    """规则函数在该局面上每秒的调用次数（没有可测的调用时为 None）"""
+    player = state.get_current_player()
+    pieces = [(piece.row, piece.col) for piece in player.pieces]
+    moves = [(row, col, *target) for row, col in pieces for target in state.get_valid_moves(row, col)]
+    squares = [(row, col) for row in range(GRID_SIZE) for col in range(GRID_SIZE)]
+    casters = [pos for pos in pieces if state.board[pos[0]][pos[1]].type in state.skill_system.SKILL_COSTS
+               and pos not in state.antlers and pos not in state.fortresses]
+
+    def valid_moves():
+        start = time.perf_counter()
+        for row, col in pieces:
+            state.get_valid_moves(row, col)
+        return time.perf_counter() - start, len(pieces)
+
+    def blocked():
+        start = time.perf_counter()
+        for pos in pieces:
+            for target in squares:
+                state.is_blocked(pos, target, player.color)
+        return time.perf_counter() - start, len(pieces) * len(squares)
+
+    # 走子和技能会修改局面，每次在副本上执行，只计函数本身的时间
+    def move():
+        elapsed = 0
+        for from_row, from_col, to_row, to_col in moves:
+            copy = state.clone()
+            start = time.perf_counter()
+            copy.move_piece(from_row, from_col, to_row, to_col)
+            elapsed += time.perf_counter() - start
+        return elapsed, len(moves)
+
+    def skill():
+        elapsed = 0
+        for row, col in casters:
+            copy = state.clone()
+            piece = copy.board[row][col]
+            start = time.perf_counter()
+            copy.cast_skill(piece)
+            elapsed += time.perf_counter() - start
+        return elapsed, len(casters)
+
+    return {'get_valid_moves': _repeat(valid_moves), 'is_blocked': _repeat(blocked),
+            'move_piece': _repeat(move), 'cast_skill': _repeat(skill)}
+
+
+def run(depth, **options):
+    results = {}
+    for name, state in reference_positions(**options).items():
+        key = state.zobrist_key()
+        counts = []
+        start = time.perf_counter()
+        for d in range(1, depth + 1):
+            counts.append(perft(state, d))
+        elapsed = time.perf_counter() - start
+        if state.zobrist_key() != key:
+            raise RuntimeError(f"{name}: make/unmake did not restore the position")
+        reference = REFERENCE_COUNTS.get(name, [])[:depth]
+        results[name] = {
+            'counts': counts,
+            'matches_reference': counts[:len(reference)] == reference if reference else None,
+            'perft_seconds': round(elapsed, 3),
+            'nodes_per_second': round(sum(counts) / elapsed) if elapsed > 0 else None,
+            'functions': {function: round(rate) if rate else None
+                          for function, rate in bench_functions(state).items()},
+        }
+    return results
+
+
+def compare(results, baseline):
+    # 打印与之前结果的对比，叶子数不一致返回 False
+    ok = True
+    for name, result in results.items():
+        old = baseline['positions'].get(name)
+        if old is None:
+            continue
+        depth = min(len(result['counts']), len(old['counts']))
+        if result['counts'][:depth] != old['counts'][:depth]:
+            print(f"{name}: counts changed {old['counts'][:depth]} -> {result['counts'][:depth]}")
+            ok = False
+        rates = [('perft', old['nodes_per_second'], result['nodes_per_second'])]
+        rates += [(function, old['functions'].get(function), rate) for function, rate in result['functions'].items()]
+        for label, before, after in rates:
+            if before and after:
+                print(f"{name:10} {label:16} {before:>10} -> {after:>10}  x{after / before:.2f}")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Count legal action sequences and time the rule functions")
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--arrays', action='store_true', help="use the numpy resource system")
+    parser.add_argument('--out', help="save results as JSON")
+    parser.add_argument('--compare', metavar='JSON', help="compare with previously saved results")
+    args = parser.parse_args(argv)
+
+    results = run(args.depth, use_arrays=args.arrays)
+    for name, result in results.items():
+        functions = ', '.join(f"{function} {rate or '-'}/s" for function, rate in result['functions'].items())
+        check = {True: 'ok', False: 'MISMATCH', None: 'no reference'}[result['matches_reference']]
+        print(f"{name}: {result['counts']} ({check}), {result['nodes_per_second']} nodes/s; {functions}")
+
+    ok = all(result['matches_reference'] is not False for result in results.values())
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            ok = compare(results, json.load(f)) and ok
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump({'depth': args.depth, 'arrays': args.arrays,
+                       'python': platform.python_version(), 'positions': results}, f, indent=1)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+from typing import NamedTuple
+
+from consts import *
+from rules import SetTaxMask, SetFarmCounts, EndActionPhase
+
+
+# 行动阶段的征税/屯田规划
+# 每个格子的操作（征不征税、屯田几次）只影响自己的丰饶度，格子之间唯一的联系是粮草：
+# 结算后粮草不能为负。目标函数按格子可加，所以是一个分组背包问题——
+# 逐格做动态规划，状态是粮草余额，只保留帕累托前沿（余额更少的状态价值必须更高）。
+#
+# 目标：结算后的粮草 + 之后 horizon 回合每回合都征税能从这些格子得到的粮草
+#   horizon=0：只看眼前，等价于把能征的格子全部征税、不屯田
+#   horizon 越大，屯田和留着不征越划算
+
+
+class Plan(NamedTuple):
+    tax_mask: int  # 第 row * GRID_SIZE + col 位为 1 表示征税
+    farm_counts: tuple  # ((row, col, times), ...)
+    food: int  # 结算后的粮草
+    value: int  # 目标值
+
+    def actions(self):
+        # 提交这个计划的动作序列
+        return SetTaxMask(self.tax_mask), SetFarmCounts(self.farm_counts), EndActionPhase()
+
+
+def future_income(fertility, horizon):
+    """之后 horizon 回合每回合都征税能得到的粮草（每次征税丰饶度 -10）"""
+    per_turn = fertility // 10
+    turns = min(horizon, per_turn)
+    return turns * per_turn - turns * (turns - 1) // 2
+
+
+def cell_options(fertility, horizon):
+    """一个格子可选的操作 [(粮草变化, 价值, 征税, 屯田次数)]，已去掉被支配的选项，按粮草变化从高到低排列"""
+    options = []
+    for taxed in (True, False):
+        for times in range(FARM_MAX_PER_GRID_PER_TURN + 1):
+            # 结算前的校验不允许丰饶度变为负数；实际结算时先征税（最低到 0）再屯田
+            if fertility - (10 if taxed else 0) + 5 * times < 0:
+                continue
+            food = (fertility // 10 if taxed else 0) - 10 * times
+            after = (max(0, fertility - 10) if taxed else fertility) + 5 * times
+            options.append((food, food + future_income(after, horizon), taxed, times))
+    options.sort(key=lambda option: (-option[0], -option[1]))
+    kept = []
+    for option in options:
+        if not kept or option[1] > kept[-1][1]:
+            kept.append(option)
+    return kept
+
+
+def plan(resource_system, color, horizon=PLAN_HORIZON):
+    """color 一方在当前资源状态下的最优计划（只规划己方领土，结算后粮草和丰饶度都不为负）"""
+    rs = resource_system
+    cells = sorted(rs.territory_cells[color])
+    if horizon == 0:
+        # 只看眼前时不用规划：征税只会增加粮草，屯田只会减少
+        tax_mask = 0
+        food = int(rs.food[color])
+        for row, col in cells:
+            if rs.fertility[row][col] >= 10:
+                tax_mask |= 1 << (row * GRID_SIZE + col)
+                food += int(rs.fertility[row][col]) // 10
+        return Plan(tax_mask, (), food, food)
+
+    options = [cell_options(int(rs.fertility[row][col]), horizon) for row, col in cells]
+
+    # 剩余格子最多能带来的粮草（判断余额还能不能补回来）和最多能花的粮草（余额超过它就没有区别了）
+    count = len(cells)
+    most_income = [0] * (count + 1)
+    most_cost = [0] * (count + 1)
+    for index in range(count - 1, -1, -1):
+        most_income[index] = most_income[index + 1] + options[index][0][0]
+        most_cost[index] = most_cost[index + 1] - options[index][-1][0]
+
+    # 前沿：[(余额, 价值, 选择链)]，余额从高到低、价值严格递增
+    frontier = [(min(int(rs.food[color]), most_cost[0]), 0, None)]
+    for index, cell in enumerate(cells):
+        states = {}
+        for balance, value, chain in frontier:
+            for food, gain, taxed, times in options[index]:
+                after = balance + food
+                if after + most_income[index + 1] < 0:
+                    break  # 选项按粮草变化从高到低排列，后面的更不可能
+                after = min(after, most_cost[index + 1])
+                if after not in states or states[after][0] < value + gain:
+                    states[after] = (value + gain, (chain, cell, taxed, times))
+        frontier = []
+        for balance in sorted(states, reverse=True):
+            value, chain = states[balance]
+            if not frontier or value > frontier[-1][1]:
+                frontier.append((balance, value, chain))
+
+    _, value, chain = frontier[-1]
+    tax_mask = 0
+    farm_counts = []
+    food = int(rs.food[color])
+    while chain is not None:
+        chain, (row, col), taxed, times = chain
+        if taxed:
+            tax_mask |= 1 << (row * GRID_SIZE + col)
+            food += int(rs.fertility[row][col]) // 10
+        if times:
+            farm_counts.append((row, col, times))
+            food -= 10 * times
+    return Plan(tax_mask, tuple(sorted(farm_counts)), food, value + int(rs.food[color]))
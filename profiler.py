@@ -0,0 +1,123 @@
+import contextlib
+import json
+import os
+import time
+from collections import deque
+
+from consts import *
+
+
+# 每帧耗时统计（调试用）：主循环每帧调用 begin_frame/end_frame，各绘制阶段用 wrap/stage 计时
+# 关闭时计时代码只多一次属性判断。统计最近 PROFILER_WINDOW 帧的分位数，
+# 同时保留最近的计时事件，可以导出为 Chrome 的 trace 格式（chrome://tracing 或 ui.perfetto.dev 打开）
+_NO_STAGE = contextlib.nullcontext()
+
+
+class _Stage:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start)
+
+
+class FrameProfiler:
+    def __init__(self, window=PROFILER_WINDOW, trace_events=PROFILER_TRACE_EVENTS):
+        self.enabled = False
+        self.window = window
+        self.frames = deque(maxlen=window)  # 每帧总耗时（纳秒）
+        self.stages = {}  # {阶段名: deque(该阶段每帧的耗时)}，只统计执行了该阶段的帧
+        self.trace = deque(maxlen=trace_events)  # (名字, 开始时间, 耗时)，纳秒
+        self.frame_start = None
+        self.current = {}  # 当前帧各阶段累计耗时
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        self.frame_start = None
+
+    def toggle(self):
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+        return self.enabled
+
+    def reset(self):
+        self.frames.clear()
+        self.stages.clear()
+        self.trace.clear()
+
+    def begin_frame(self):
+        if self.enabled:
+            self.frame_start = time.perf_counter_ns()
+            self.current = {}
+
+    def end_frame(self, keep=True):
+        """结束当前帧；keep=False 时丢弃（例如这一帧什么都没做）"""
+        if self.frame_start is None:
+            return
+        if keep:
+            duration = time.perf_counter_ns() - self.frame_start
+            self.frames.append(duration)
+            self.trace.append(('frame', self.frame_start, duration))
+            for name, elapsed in self.current.items():
+                if name not in self.stages:
+                    self.stages[name] = deque(maxlen=self.window)
+                self.stages[name].append(elapsed)
+        self.frame_start = None
+
+    def record(self, name, start):
+        # 记下一个从 start（perf_counter_ns）到现在的阶段
+        duration = time.perf_counter_ns() - start
+        self.current[name] = self.current.get(name, 0) + duration
+        self.trace.append((name, start, duration))
+
+    def stage(self, name):
+        """with profiler.stage('flip'): ... 给一段代码计时"""
+        return _Stage(self, name) if self.frame_start is not None else _NO_STAGE
+
+    def wrap(self, name, func):
+        """返回计时版本的 func"""
+        def timed(*args, **kwargs):
+            if self.frame_start is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(name, start)
+        return timed
+
+    @staticmethod
+    def percentiles(samples, points=(50, 95, 99)):
+        # 最近邻秩分位数（毫秒）
+        if not samples:
+            return tuple(0.0 for _ in points)
+        ordered = sorted(samples)
+        return tuple(ordered[min(len(ordered) - 1, len(ordered) * p // 100)] / 1e6 for p in points)
+
+    def summary(self):
+        """[(名字, 帧数, p50, p95, p99)]，第一行是整帧，之后按 p95 从高到低"""
+        rows = [(name, len(samples), *self.percentiles(samples)) for name, samples in self.stages.items()]
+        rows.sort(key=lambda row: -row[3])
+        return [('frame', len(self.frames), *self.percentiles(self.frames))] + rows
+
+    def dump_trace(self, path=PROFILER_TRACE_FILE):
+        """把最近的计时事件写成 Chrome trace 格式，返回事件数"""
+        # 整帧的事件在帧结束时才记下，排在各阶段之后，起点要取最早的开始时间
+        origin = min((start for _, start, _ in self.trace), default=0)
+        events = [{'name': name, 'ph': 'X', 'ts': (start - origin) / 1000, 'dur': duration / 1000,
+                   'pid': 0, 'tid': 0} for name, start, duration in self.trace]
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        return len(events)
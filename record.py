@@ -0,0 +1,285 @@
+import json
+import logging
+import os
+import sys
+from typing import NamedTuple
+
+from consts import *
+from rules import GameState, SetTaxMask, SetFarmCounts, EndActionPhase, Move, CastSkill, EndTurn
+
+
+# 二进制对局记录：一个文件是一份对局档案，可以一直追加
+#   文件头：MAGIC、格式版本、JSON 编码的规则参数（不同规则的对局不能混在同一个文件里）
+#   之后每局一帧：varint 帧长度 + 帧内容（varint 元数据长度 + 元数据 JSON、胜者、动作序列）
+# 动作是一个操作码字节加参数，格子用 row * GRID_SIZE + col 的 varint 表示，走子一般只占 3 个字节。
+# 每局整帧一次写入，写到一半中断只会留下一个不完整的末帧，读取时丢弃。
+logger = logging.getLogger(__name__)
+
+MAGIC = b'LREC'
+FORMAT_VERSION = 1
+
+OP_TAX, OP_FARM, OP_END_ACTION, OP_MOVE, OP_SKILL, OP_END_TURN = range(6)
+WINNERS = (None, 'white', 'black')
+
+
+class RuleMismatchError(ValueError):
+    """记录的规则参数与当前的不一致"""
+
+
+class GameRecord(NamedTuple):
+    meta: dict  # 对局信息，例如种子、双方引擎
+    winner: str | None
+    actions: list
+    rules: dict | None = None  # 文件头中的规则参数（read_games 填入）
+
+
+def rule_header():
+    """当前的规则参数，写在文件头里"""
+    return {
+        'grid_size': GRID_SIZE,
+        'init_food': INIT_FOOD,
+        'init_fertility': INIT_FERTILITY,
+        'farm_max_per_grid_per_turn': FARM_MAX_PER_GRID_PER_TURN,
+        'piece_move_max_per_turn': PIECE_MOVE_MAX_PER_TURN,
+        'piece_king_move_max_per_turn': PIECE_KING_MOVE_MAX_PER_TURN,
+        'skill_max_per_turn': SKILL_MAX_PER_TURN,
+        'piece_basic_move_cost': dict(PIECE_BASIC_MOVE_COST),
+        'skill_costs': dict(SkillSystem.SKILL_COSTS),
+    }
+
+
+def write_varint(out, value):
+    while value > 0x7f:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, pos):
+    # 返回 (值, 新位置)，数据不够时抛出 IndexError
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _read_file_varint(f):
+    # 从文件读 varint，文件在开头就结束返回 None，中途结束抛出 EOFError
+    value = shift = 0
+    while True:
+        byte = f.read(1)
+        if not byte:
+            if shift:
+                raise EOFError
+            return None
+        value |= (byte[0] & 0x7f) << shift
+        if byte[0] < 0x80:
+            return value
+        shift += 7
+
+
+def encode_actions(actions, grid_size=GRID_SIZE):
+    out = bytearray()
+    for action in actions:
+        match action:
+            case SetTaxMask(mask):
+                out.append(OP_TAX)
+                write_varint(out, mask)
+            case SetFarmCounts(counts):
+                out.append(OP_FARM)
+                write_varint(out, len(counts))
+                for row, col, times in counts:
+                    write_varint(out, row * grid_size + col)
+                    out.append(times)
+            case EndActionPhase():
+                out.append(OP_END_ACTION)
+            case Move(from_row, from_col, to_row, to_col):
+                out.append(OP_MOVE)
+                write_varint(out, from_row * grid_size + from_col)
+                write_varint(out, to_row * grid_size + to_col)
+            case CastSkill(row, col):
+                out.append(OP_SKILL)
+                write_varint(out, row * grid_size + col)
+            case EndTurn():
+                out.append(OP_END_TURN)
+            case _:
+                raise TypeError(f"Unknown action: {action!r}")
+    return out
+
+
+def decode_actions(data, pos=0, grid_size=GRID_SIZE):
+    actions = []
+    while pos < len(data):
+        op = data[pos]
+        pos += 1
+        if op == OP_TAX:
+            mask, pos = read_varint(data, pos)
+            actions.append(SetTaxMask(mask))
+        elif op == OP_FARM:
+            count, pos = read_varint(data, pos)
+            counts = []
+            for _ in range(count):
+                sq, pos = read_varint(data, pos)
+                counts.append((*divmod(sq, grid_size), data[pos]))
+                pos += 1
+            actions.append(SetFarmCounts(tuple(counts)))
+        elif op == OP_END_ACTION:
+            actions.append(EndActionPhase())
+        elif op == OP_MOVE:
+            from_sq, pos = read_varint(data, pos)
+            to_sq, pos = read_varint(data, pos)
+            actions.append(Move(*divmod(from_sq, grid_size), *divmod(to_sq, grid_size)))
+        elif op == OP_SKILL:
+            sq, pos = read_varint(data, pos)
+            actions.append(CastSkill(*divmod(sq, grid_size)))
+        elif op == OP_END_TURN:
+            actions.append(EndTurn())
+        else:
+            raise ValueError(f"Unknown action code {op} at byte {pos - 1}")
+    return actions
+
+
+def read_header(f):
+    """读取并返回文件头中的规则参数，f 位于文件开头"""
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a game record file")
+    version = f.read(1)
+    if not version or version[0] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported record format version: {version[0] if version else None}")
+    length = _read_file_varint(f)
+    data = f.read(length or 0)
+    if length is None or len(data) != length:
+        raise ValueError("Truncated record header")
+    return json.loads(data)
+
+
+class RecordWriter:
+    """以追加方式写对局记录；文件已存在时要求规则参数与当前一致"""
+
+    def __init__(self, path, header=None):
+        self.header = header or rule_header()
+        self.grid_size = self.header['grid_size']
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, 'rb') as f:
+                existing = read_header(f)
+            if existing != self.header:
+                raise ValueError(f"{path} was recorded with different rule constants")
+            self.file = open(path, 'ab')
+        else:
+            self.file = open(path, 'wb')
+            data = json.dumps(self.header, separators=(',', ':')).encode()
+            out = bytearray(MAGIC)
+            out.append(FORMAT_VERSION)
+            write_varint(out, len(data))
+            self.file.write(out + data)
+        self.games = 0
+
+    def write_game(self, actions, winner=None, meta=None):
+        """追加一局（整帧一次写入）"""
+        meta_data = json.dumps(meta, separators=(',', ':')).encode() if meta else b''
+        payload = bytearray()
+        write_varint(payload, len(meta_data))
+        payload += meta_data
+        payload.append(WINNERS.index(winner))
+        payload += encode_actions(actions, self.grid_size)
+        frame = bytearray()
+        write_varint(frame, len(payload))
+        self.file.write(frame + payload)
+        self.file.flush()
+        self.games += 1
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_games(path):
+    """逐局读取记录文件的生成器，每次只有一局在内存里"""
+    with open(path, 'rb') as f:
+        rules = read_header(f)
+        grid_size = rules['grid_size']
+        while True:
+            try:
+                length = _read_file_varint(f)
+            except EOFError:
+                length = -1
+            if length is None:
+                return
+            payload = f.read(length) if length >= 0 else b''
+            if length < 0 or len(payload) != length:
+                logger.warning(f"Ignoring truncated last game in {path}")
+                return
+            meta_length, pos = read_varint(payload, 0)
+            meta = json.loads(payload[pos:pos + meta_length]) if meta_length else {}
+            pos += meta_length
+            winner = WINNERS[payload[pos]]
+            yield GameRecord(meta, winner, decode_actions(payload, pos + 1, grid_size), rules)
+
+
+def plan_actions(resource_system, color):
+    """把资源系统里 color 一方当前的征税/屯田标记转成 (SetTaxMask, SetFarmCounts)"""
+    mask = 0
+    counts = []
+    for row, col in sorted(resource_system.territory_cells[color]):
+        if resource_system.tax_grid[row][col]:
+            mask |= 1 << (row * GRID_SIZE + col)
+        if resource_system.farm_grid[row][col]:
+            counts.append((row, col, int(resource_system.farm_grid[row][col])))
+    return SetTaxMask(mask), SetFarmCounts(tuple(counts))
+
+
+def rule_mismatch(rules):
+    """记录的规则参数与当前不同的项：{名字: (记录中的值, 当前值)}"""
+    current = rule_header()
+    return {name: (rules.get(name), current.get(name)) for name in current.keys() | rules.keys()
+            if rules.get(name) != current.get(name)}
+
+
+def rule_overrides(rules):
+    """把记录的规则参数转成 selfplay.apply_overrides 的参数（只含与当前不同的项；棋盘大小改不了）"""
+    overrides = {}
+    for name, (recorded, _) in rule_mismatch(rules).items():
+        if name == 'grid_size':
+            raise RuleMismatchError(f"Game was recorded on a {recorded}x{recorded} board, GRID_SIZE is {GRID_SIZE}")
+        overrides[name.upper()] = recorded
+    return overrides
+
+
+def replay(record, state=None):
+    """从初始局面重放一局，返回最终局面
+
+    记录的规则参数与当前不同（例如自对弈时用了 --set）时抛出 RuleMismatchError，
+    先用 selfplay.apply_overrides(rule_overrides(record.rules)) 换成记录时的参数再重放。
+    有不合法的动作时抛出 ValueError。
+    """
+    if record.rules is not None:
+        mismatch = rule_mismatch(record.rules)
+        if mismatch:
+            details = ', '.join(f"{name}: recorded {old!r}, current {new!r}"
+                                for name, (old, new) in sorted(mismatch.items()))
+            raise RuleMismatchError(f"Game was recorded with different rule constants ({details})")
+    state = state or GameState()
+    for index, action in enumerate(record.actions):
+        if not state.apply(action):
+            raise ValueError(f"Action {index} cannot be replayed: {action!r}")
+    return state
+
+
+if __name__ == "__main__":
+    # 统计一个记录文件：python record.py log/games.lrec
+    wins = {'white': 0, 'black': 0, None: 0}
+    games = actions = 0
+    for game in read_games(sys.argv[1]):
+        games += 1
+        actions += len(game.actions)
+        wins[game.winner] += 1
+    print(f"{games} games, {actions} actions; white {wins['white']}, black {wins['black']}, unfinished {wins[None]}")
@@ -0,0 +1,99 @@
+from collections import OrderedDict
+
+import pygame
+
+from consts import *
+
+
+# 分层渲染缓存：每层画在自己的 surface 上，只有该层显示的状态变化时才重画，
+# 合成时只刷新变化过的区域，画面不变时一帧什么都不画
+class RenderLayer:
+    def __init__(self, name, draw, signature, region, opaque=False):
+        self.name = name
+        self.draw = draw  # draw(surface)：把这一层画到 surface 上
+        self.signature = signature  # signature()：该层显示的状态摘要，变化时重画
+        self.region = pygame.Rect(region)  # 重画后需要刷新的屏幕区域
+        self.opaque = opaque  # 不透明层重画前不用清空
+        self.surface = None
+        self.last_signature = None
+        self.valid = False
+
+
+class LayerCompositor:
+    def __init__(self, size):
+        self.size = size
+        self.layers = []  # 从下到上
+
+    def add_layer(self, name, draw, signature, region=None, opaque=False):
+        layer = RenderLayer(name, draw, signature, region or ((0, 0), self.size), opaque)
+        if opaque:
+            layer.surface = pygame.Surface(self.size)
+        else:
+            layer.surface = pygame.Surface(self.size, pygame.SRCALPHA)
+        if pygame.display.get_surface() is not None:
+            layer.surface = layer.surface.convert() if opaque else layer.surface.convert_alpha()
+        self.layers.append(layer)
+        return layer
+
+    def invalidate(self, name=None):
+        # 强制下次合成时重画某一层（不指定则全部）
+        for layer in self.layers:
+            if name is None or layer.name == name:
+                layer.valid = False
+
+    def compose(self, screen):
+        """重画过期的层，把变化区域合成到 screen 上，返回需要刷新的矩形列表"""
+        dirty = []
+        for layer in self.layers:
+            signature = layer.signature()
+            if layer.valid and signature == layer.last_signature:
+                continue
+            if not layer.opaque:
+                layer.surface.fill((0, 0, 0, 0))
+            layer.draw(layer.surface)
+            layer.last_signature = signature
+            layer.valid = True
+            if not any(rect.contains(layer.region) for rect in dirty):
+                dirty = [rect for rect in dirty if not layer.region.contains(rect)]
+                dirty.append(layer.region.copy())
+
+        for rect in dirty:
+            self.restore(screen, rect)
+        return dirty
+
+    def restore(self, screen, rect):
+        # 用各层缓存的内容重新合成屏幕上的一块区域（例如擦掉直接画在屏幕上的调试信息）
+        for layer in self.layers:
+            screen.blit(layer.surface, rect, rect)
+
+
+# 文字 surface 缓存：同样的字体、文字和颜色只渲染一次，超过容量时淘汰最久未用的
+# 返回的 surface 是共享的，调用方只能 blit，不要修改
+class TextCache:
+    def __init__(self, max_size=TEXT_CACHE_SIZE):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def render(self, font, text, color):
+        key = (font, text, color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+        self.misses += 1
+        surface = font.render(text, True, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+            self.evictions += 1
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+
+    def stats(self):
+        return {'size': len(self.surfaces), 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
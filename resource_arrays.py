@@ -0,0 +1,331 @@
+import numpy as np
+
+from consts import *
+import zobrist
+
+
+# 数组版资源系统：状态存成紧凑的整数数组，征税、屯田、丰饶度衰减都是整块数组运算
+# 下面的函数对最后两维（棋盘）做运算，前面可以有任意批次维度，多局游戏的数组堆叠后可一次处理
+
+# 领土编码
+NO_OWNER = 0
+COLOR_CODES = {'white': 1, 'black': 2}
+CODE_COLORS = {code: color for color, code in COLOR_CODES.items()}
+FOOD_INDEX = {'white': 0, 'black': 1}  # food 数组中各方的下标
+
+FERTILITY_DTYPE = np.int16
+TERRITORY_DTYPE = np.int8
+FARM_DTYPE = np.int8
+FOOD_DTYPE = np.int32
+
+
+def _as_code(color_code):
+    # 批次中每局的玩家编码，扩展到棋盘两维以便广播
+    return np.asarray(color_code)[..., None, None]
+
+
+def decay_fertility(fertility, occupied):
+    """有棋子的格子丰饶度 -5，不低于 0（原地修改）"""
+    np.subtract(fertility, 5 * occupied, out=fertility, casting='unsafe')
+    np.maximum(fertility, 0, out=fertility)
+
+
+def preview_operations(fertility, territory, tax_grid, farm_grid, food, color_code):
+    """返回 (操作后粮草, 每格丰饶度变化)"""
+    own = territory == _as_code(color_code)
+    taxed = tax_grid & own
+    farmed = np.where(own, farm_grid, 0).astype(FERTILITY_DTYPE)
+    tax_income = np.where(taxed, fertility // 10, 0).sum(axis=(-2, -1))
+    farm_cost = farmed.sum(axis=(-2, -1)) * 10
+    fertility_changes = farmed * 5 - taxed.astype(FERTILITY_DTYPE) * 10
+    return food + tax_income - farm_cost, fertility_changes
+
+
+def collect_tax(fertility, territory, tax_grid, food, color_code):
+    """征税：标记格子按 fertility // 10 产粮，丰饶度 -10（原地修改 fertility 和 food），返回收入"""
+    taxed = tax_grid & (territory == _as_code(color_code))
+    income = np.where(taxed, fertility // 10, 0).sum(axis=(-2, -1))
+    np.subtract(fertility, np.where(taxed, np.minimum(fertility, 10), 0), out=fertility, casting='unsafe')
+    food += income.astype(FOOD_DTYPE)
+    return income
+
+
+def implement_farming(fertility, territory, farm_grid, food, color_code):
+    """屯田：按行优先顺序扣粮，粮草不够时当前格降为买得起的次数，之后的格子不再屯田
+
+    原地修改 fertility、farm_grid 和 food，返回总花费。
+    """
+    shape = farm_grid.shape
+    own = territory == _as_code(color_code)
+    times = np.where(own, farm_grid, 0).reshape(*shape[:-2], -1).astype(FOOD_DTYPE)
+    cost = times * 10
+    spent_after = np.cumsum(cost, axis=-1)
+    spent_before = spent_after - cost
+    budget = np.asarray(food)[..., None]
+
+    affordable = spent_after <= budget
+    # 第一个买不起的格子：之前的花费还在预算内
+    partial = ~affordable & (spent_before <= budget)
+    partial_times = np.minimum(times, np.maximum(budget - spent_before, 0) // 10)
+    actual = np.where(affordable, times, np.where(partial, partial_times, 0))
+
+    actual = actual.reshape(shape)
+    np.add(fertility, actual * 5, out=fertility, casting='unsafe')
+    farm_grid[...] = np.where(own, actual, farm_grid)
+    total = actual.sum(axis=(-2, -1)) * 10
+    food -= total.astype(FOOD_DTYPE)
+    return total
+
+
+def unpack_mask(mask):
+    """把按格子编号排列的整数位掩码展开成 GRID_SIZE x GRID_SIZE 的布尔数组"""
+    data = np.frombuffer(mask.to_bytes((GRID_SIZE * GRID_SIZE + 7) // 8, 'little'), dtype=np.uint8)
+    bits = np.unpackbits(data, bitorder='little')[:GRID_SIZE * GRID_SIZE]
+    return bits.reshape(GRID_SIZE, GRID_SIZE).astype(bool)
+
+
+def _cell_key(kind, row, col, value):
+    # 一个格子某项状态的 Zobrist 随机数，与 ResourceSystem 使用的相同（无税收/屯田/归属时为 0）
+    keys = zobrist.tables()
+    value = int(value)
+    if kind == 'fertility':
+        return keys.fertility(row, col, value)
+    if not value:
+        return 0
+    if kind == 'territory':
+        return keys.territory[CODE_COLORS[value]][row * GRID_SIZE + col]
+    if kind == 'tax':
+        return keys.tax[row * GRID_SIZE + col]
+    return keys.farm(row, col, value)
+
+
+def _cell_value(kind, value):
+    # 数组中的值转换成 ResourceSystem 中的表示（journal 与列表版通用）
+    if kind == 'territory':
+        return CODE_COLORS.get(int(value))
+    if kind == 'tax':
+        return bool(value)
+    return int(value)
+
+
+class FoodView:
+    """按颜色读写 food 数组，接口与 ResourceSystem.food 字典一致"""
+
+    def __init__(self, array):
+        self.array = array
+
+    def __getitem__(self, color):
+        return int(self.array[FOOD_INDEX[color]])
+
+    def __setitem__(self, color, value):
+        self.array[FOOD_INDEX[color]] = value
+
+    def __iter__(self):
+        return iter(FOOD_INDEX)
+
+    def items(self):
+        return [(color, self[color]) for color in FOOD_INDEX]
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class ArrayResourceSystem:
+    """与 ResourceSystem 接口相同，数据存放在 numpy 数组中"""
+
+    def __init__(self):
+        self.food_array = np.full(len(FOOD_INDEX), INIT_FOOD, dtype=FOOD_DTYPE)
+        self.food = FoodView(self.food_array)
+        self.fertility = np.full((GRID_SIZE, GRID_SIZE), INIT_FERTILITY, dtype=FERTILITY_DTYPE)  # 丰饶度
+        self.territory = np.zeros((GRID_SIZE, GRID_SIZE), dtype=TERRITORY_DTYPE)  # 领土控制（颜色编码）
+        self.tax_grid = np.zeros((GRID_SIZE, GRID_SIZE), dtype=bool)  # 税收标记
+        self.farm_grid = np.zeros((GRID_SIZE, GRID_SIZE), dtype=FARM_DTYPE)  # 屯田次数
+        self.territory_cells = {color: set() for color in COLOR_CODES}  # 与 ResourceSystem 相同的格子集合
+        self.marked_cells = set()
+        self.fertility_version = 0  # 与 ResourceSystem 相同的变化计数
+        self.plan_version = 0
+        self.journal = None  # 与 ResourceSystem 相同的修改记录
+        self.zobrist = self.compute_zobrist()  # 与 ResourceSystem 相同的哈希
+
+    def copy(self):
+        other = ArrayResourceSystem.__new__(ArrayResourceSystem)
+        other.__dict__.update(self.__dict__)
+        for name in ('food_array', 'fertility', 'territory', 'tax_grid', 'farm_grid'):
+            setattr(other, name, getattr(self, name).copy())
+        other.food = FoodView(other.food_array)
+        other.territory_cells = {color: set(cells) for color, cells in self.territory_cells.items()}
+        other.marked_cells = set(self.marked_cells)
+        return other
+
+    def compute_zobrist(self):
+        h = 0
+        for kind, grid in (('fertility', self.fertility), ('territory', self.territory),
+                           ('tax', self.tax_grid), ('farm', self.farm_grid)):
+            for row in range(GRID_SIZE):
+                for col in range(GRID_SIZE):
+                    h ^= _cell_key(kind, row, col, grid[row, col])
+        return h
+
+    def _rehash(self, kind, old, new):
+        # 整块运算之后，只对值变化了的格子更新哈希（并记入 journal）
+        for row, col in np.argwhere(old != new):
+            row, col = int(row), int(col)
+            self.zobrist ^= _cell_key(kind, row, col, old[row, col]) ^ _cell_key(kind, row, col, new[row, col])
+            if self.journal is not None:
+                self.journal.append((kind, row, col, _cell_value(kind, old[row, col])))
+            if kind in ('tax', 'farm'):
+                self._refresh_marked(row, col)
+
+    def _refresh_marked(self, row, col):
+        if self.tax_grid[row, col] or self.farm_grid[row, col]:
+            self.marked_cells.add((row, col))
+        else:
+            self.marked_cells.discard((row, col))
+
+    @staticmethod
+    def stack(systems):
+        """把多局的状态堆叠成批次数组，供上面的批量函数使用"""
+        return {
+            'food': np.stack([s.food_array for s in systems]),
+            'fertility': np.stack([s.fertility for s in systems]),
+            'territory': np.stack([s.territory for s in systems]),
+            'tax_grid': np.stack([s.tax_grid for s in systems]),
+            'farm_grid': np.stack([s.farm_grid for s in systems]),
+        }
+
+    def update_fertility(self, board):
+        # 行动阶段开始前，任何格子上如果有棋子，则丰饶度-5
+        # board 可以是有棋子的格子集合、对象棋盘、布尔数组或按格子编号的位掩码
+        if isinstance(board, (set, frozenset)):
+            # 格子集合：只处理这些格子
+            for row, col in board:
+                self.set_fertility(row, col, max(0, int(self.fertility[row, col]) - 5))
+            self.fertility_version += 1
+            return
+        if isinstance(board, int):
+            occupied = unpack_mask(board)
+        elif isinstance(board, np.ndarray):
+            occupied = board
+        else:
+            occupied = np.fromiter((piece is not None for line in board for piece in line),
+                                   dtype=bool, count=GRID_SIZE * GRID_SIZE).reshape(GRID_SIZE, GRID_SIZE)
+        old = self.fertility.copy()
+        decay_fertility(self.fertility, occupied.astype(FERTILITY_DTYPE))
+        self._rehash('fertility', old, self.fertility)
+        self.fertility_version += 1
+
+    def _food_slot(self, player_color):
+        # 该玩家粮草的 0 维视图，批量函数可以原地修改
+        index = FOOD_INDEX[player_color]
+        return self.food_array[index:index + 1].reshape(())
+
+    def collect_tax(self, player_color):
+        # 征税逻辑：根据标记的税收格子获得粮草
+        self.fertility_version += 1
+        old = self.fertility.copy()
+        income = collect_tax(self.fertility, self.territory, self.tax_grid,
+                             self._food_slot(player_color), COLOR_CODES[player_color])
+        self._rehash('fertility', old, self.fertility)
+        return int(income)
+
+    def implement_farming(self, player_color):
+        # 实施屯田计划
+        self.fertility_version += 1
+        self.plan_version += 1
+        old_fertility, old_farm = self.fertility.copy(), self.farm_grid.copy()
+        total = implement_farming(self.fertility, self.territory, self.farm_grid,
+                                  self._food_slot(player_color), COLOR_CODES[player_color])
+        self._rehash('fertility', old_fertility, self.fertility)
+        self._rehash('farm', old_farm, self.farm_grid)
+        return int(total)
+
+    def update_territory(self, row, col, color):
+        # 更新领土控制
+        code = COLOR_CODES[color] if color else NO_OWNER
+        if self.journal is not None and code != self.territory[row, col]:
+            self.journal.append(('territory', row, col, self.owner(row, col)))
+        self.zobrist ^= (_cell_key('territory', row, col, self.territory[row, col])
+                         ^ _cell_key('territory', row, col, code))
+        old = self.owner(row, col)
+        if old is not None:
+            self.territory_cells[old].discard((row, col))
+        if color:
+            self.territory_cells[color].add((row, col))
+        self.territory[row, col] = code
+
+    def owner(self, row, col):
+        return CODE_COLORS.get(int(self.territory[row, col]))
+
+    def set_fertility(self, row, col, value):
+        if self.journal is not None:
+            self.journal.append(('fertility', row, col, int(self.fertility[row, col])))
+        self.zobrist ^= (_cell_key('fertility', row, col, self.fertility[row, col])
+                         ^ _cell_key('fertility', row, col, value))
+        self.fertility[row, col] = value
+        self.fertility_version += 1
+
+    def set_tax(self, row, col, taxed):
+        if self.journal is not None and bool(self.tax_grid[row, col]) != bool(taxed):
+            self.journal.append(('tax', row, col, bool(self.tax_grid[row, col])))
+        self.zobrist ^= _cell_key('tax', row, col, self.tax_grid[row, col]) ^ _cell_key('tax', row, col, taxed)
+        self.tax_grid[row, col] = taxed
+        self._refresh_marked(row, col)
+        self.plan_version += 1
+
+    def set_farm(self, row, col, times):
+        if self.journal is not None and self.farm_grid[row, col] != times:
+            self.journal.append(('farm', row, col, int(self.farm_grid[row, col])))
+        self.zobrist ^= _cell_key('farm', row, col, self.farm_grid[row, col]) ^ _cell_key('farm', row, col, times)
+        self.farm_grid[row, col] = times
+        self._refresh_marked(row, col)
+        self.plan_version += 1
+
+    def set_tax_mask(self, player_color, mask):
+        own = self.territory == COLOR_CODES[player_color]
+        old = self.tax_grid.copy()
+        self.tax_grid[own] = unpack_mask(mask)[own]
+        self._rehash('tax', old, self.tax_grid)
+        self.plan_version += 1
+
+    def set_farm_counts(self, counts):
+        old = self.farm_grid.copy()
+        self.farm_grid.fill(0)
+        self.plan_version += 1
+        for row, col, times in counts:
+            self.farm_grid[row, col] = times
+        self._rehash('farm', old, self.farm_grid)
+
+    def undo_changes(self, changes):
+        for kind, row, col, old in reversed(changes):
+            if kind == 'fertility':
+                self.set_fertility(row, col, old)
+            elif kind == 'territory':
+                self.update_territory(row, col, old)
+            elif kind == 'tax':
+                self.set_tax(row, col, old)
+            else:
+                self.set_farm(row, col, old)
+        self.plan_version += 1
+
+    def preview_operations(self, player_color):
+        final_food, fertility_changes = preview_operations(
+            self.fertility, self.territory, self.tax_grid, self.farm_grid,
+            self.food[player_color], COLOR_CODES[player_color])
+        return int(final_food), fertility_changes
+
+    def first_negative_cell(self, player_color):
+        _, fertility_changes = self.preview_operations(player_color)
+        negative = (self.territory == COLOR_CODES[player_color]) & (self.fertility + fertility_changes < 0)
+        if not negative.any():
+            return None
+        row, col = np.argwhere(negative)[0]
+        return int(row), int(col)
+
+    def reset_management_grids(self):
+        # 重置管理网格（原地清零）
+        old_tax, old_farm = self.tax_grid.copy(), self.farm_grid.copy()
+        self.tax_grid.fill(False)
+        self.farm_grid.fill(0)
+        self._rehash('tax', old_tax, self.tax_grid)
+        self._rehash('farm', old_farm, self.farm_grid)
+        self.plan_version += 1
@@ -0,0 +1,812 @@
+import logging
+from array import array
+from collections import defaultdict
+from typing import NamedTuple
+
+from consts import *
+import zobrist
+from tables import (square, between, SLIDER_RAYS, LEAPER_TARGETS, PAWN_PUSHES, PAWN_CAPTURES,
+                    PAWN_DIRECTION, PAWN_START_ROW)
+
+
+# 规则核心：不依赖 pygame，不加载字体和图片，可在模拟/分析进程中直接导入
+# 日志处理器由界面入口（game.py）配置，这里只取 logger
+logger = logging.getLogger(__name__)
+
+
+# 事件处理器
+class EventHandler:
+    def __init__(self):
+        self.listeners = defaultdict(list)
+
+    def add_listener(self, event_type, callback):
+        self.listeners[event_type].append(callback)
+
+    def dispatch(self, event_type, data=None):
+        for callback in self.listeners[event_type]:
+            callback(data)
+
+
+# 棋子类（__slots__：没有 __dict__，每个对象约省三分之一内存；子类也要声明 __slots__）
+class Piece:
+    __slots__ = ('id', 'type', 'color', 'row', 'col', 'selected', 'moved_this_turn')
+
+    def __init__(self, piece_id, piece_type, color, row, col):
+        self.id = piece_id  # 棋子唯一标识
+        self.type = piece_type  # 棋子类型
+        self.color = color  # 棋子颜色
+        self.row = row  # 行位置
+        self.col = col  # 列位置
+        self.selected = False  # 是否被选中
+        self.moved_this_turn = 0  # 本回合是否走过（0/1）
+
+    def reset_turn_state(self):
+        # 重置回合状态
+        self.moved_this_turn = 0
+
+    def copy(self, piece_class=None):
+        other = (piece_class or type(self))(self.id, self.type, self.color, self.row, self.col)
+        other.selected = self.selected
+        other.moved_this_turn = self.moved_this_turn
+        return other
+
+
+# 棋子的紧凑快照（结构数组）
+class PackedPieces:
+    """每个字段一列 array，第 i 枚棋子是各列的第 i 项；兵种和颜色存 PieceType/PieceColor 编码
+
+    每枚棋子 7 个字节（一个 Piece 对象约 100 字节），适合大量保存局面（例如回放缓冲区）或 pickle 给其他进程。
+    不保存 selected（界面状态）。
+    """
+    __slots__ = ('ids', 'types', 'colors', 'rows', 'cols', 'moved')
+
+    def __init__(self, pieces=()):
+        self.ids = array('H')
+        self.types = array('b')
+        self.colors = array('b')
+        self.rows = array('b')
+        self.cols = array('b')
+        self.moved = array('b')
+        for piece in pieces:
+            self.ids.append(piece.id)
+            self.types.append(PIECE_TYPE_CODES[piece.type])
+            self.colors.append(PIECE_COLOR_CODES[piece.color])
+            self.rows.append(piece.row)
+            self.cols.append(piece.col)
+            self.moved.append(piece.moved_this_turn)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getstate__(self):
+        return tuple(getattr(self, name).tobytes() for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, data in zip(self.__slots__, state):
+            column = array('H' if name == 'ids' else 'b')
+            column.frombytes(data)
+            setattr(self, name, column)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).itemsize * len(self) for name in self.__slots__)
+
+    def unpack(self, piece_class=Piece):
+        """按打包时的顺序生成棋子对象"""
+        for i in range(len(self.ids)):
+            piece = piece_class(self.ids[i], PIECE_TYPE_NAMES[self.types[i]], PIECE_COLOR_NAMES[self.colors[i]],
+                                self.rows[i], self.cols[i])
+            piece.moved_this_turn = self.moved[i]
+            yield piece
+
+
+# 棋子登记表
+class PieceStore:
+    """按 (颜色, id) 和按格子 O(1) 查找棋子，O(1) 增删，增量维护各方各兵种的数量
+
+    board 就是按格子查找的索引（GameState.board 与它是同一个对象），by_color[颜色] 是 {id: 棋子}，按加入顺序排列，
+    occupied 是有棋子的格子集合（回合结束的丰饶度衰减只处理这些格子）。
+    """
+
+    def __init__(self, colors=('white', 'black')):
+        self.board = [[None for _ in range(GRID_SIZE)] for _ in range(GRID_SIZE)]
+        self.by_color = {color: {} for color in colors}
+        self.type_counts = {color: {} for color in colors}  # {颜色: {兵种: 数量}}
+        self.occupied = set()  # {(row, col)}
+
+    def add(self, piece):
+        self.by_color[piece.color][piece.id] = piece
+        self.board[piece.row][piece.col] = piece
+        self.occupied.add((piece.row, piece.col))
+        counts = self.type_counts[piece.color]
+        counts[piece.type] = counts.get(piece.type, 0) + 1
+
+    def remove(self, piece):
+        del self.by_color[piece.color][piece.id]
+        if self.board[piece.row][piece.col] is piece:
+            self.board[piece.row][piece.col] = None
+            self.occupied.discard((piece.row, piece.col))
+        self.type_counts[piece.color][piece.type] -= 1
+
+    def move(self, piece, row, col):
+        # 目标格原有的棋子要先 remove
+        self.board[piece.row][piece.col] = None
+        self.occupied.discard((piece.row, piece.col))
+        piece.row, piece.col = row, col
+        self.board[row][col] = piece
+        self.occupied.add((row, col))
+
+    def get(self, color, piece_id):
+        return self.by_color[color].get(piece_id)
+
+    def at(self, row, col):
+        return self.board[row][col]
+
+    def pieces(self, color):
+        return self.by_color[color].values()
+
+    def count(self, color, piece_type=None):
+        """某一方的棋子数（指定兵种时只数该兵种）"""
+        if piece_type is None:
+            return len(self.by_color[color])
+        return self.type_counts[color].get(piece_type, 0)
+
+    def pack(self):
+        return PackedPieces(piece for pieces in self.by_color.values() for piece in pieces.values())
+
+    @classmethod
+    def unpack(cls, packed, colors=('white', 'black'), piece_class=Piece):
+        store = cls(colors)
+        for piece in packed.unpack(piece_class):
+            store.add(piece)
+        return store
+
+    # pickle 时只传打包的棋子，读回时重新生成棋子对象。
+    # 棋子对象的身份不保留：引用了棋子的撤销栈不能和它一起 pickle（clone 出来的局面撤销栈为空）
+    def __getstate__(self):
+        return tuple(self.by_color), self.pack()
+
+    def __setstate__(self, state):
+        colors, packed = state
+        self.__init__(colors)
+        for piece in packed.unpack():
+            self.add(piece)
+
+
+def back_rank(size=GRID_SIZE):
+    """底线的兵种排列：后、王在中间，向两边依次是象、马、车，更宽的棋盘上循环排下去（8 格时就是国际象棋的排法）"""
+    queen = (size - 1) // 2
+    rank = [None] * size
+    rank[queen], rank[queen + 1] = 'queen', 'king'
+    wings = ('bishop', 'knight', 'rook')
+    for i, col in enumerate(range(queen - 1, -1, -1)):
+        rank[col] = wings[i % 3]
+    for i, col in enumerate(range(queen + 2, size)):
+        rank[col] = wings[i % 3]
+    return rank
+
+
+# 玩家类
+class Player:
+    def __init__(self, color, piece_count, piece_class=Piece, store=None):
+        self.color = color
+        self.store = store if store is not None else PieceStore()  # 棋子登记在这里（同一局的玩家共用一个）
+        self.piece_count = piece_count
+        self.piece_class = piece_class  # 界面层可传入带绘制方法的子类
+        self.moves_this_turn = 0  # 本回合移动次数
+        self.skills_used_this_turn = 0  # 本回合技能使用次数
+        self.initialize_pieces()
+
+    @property
+    def pieces(self):
+        # 玩家的棋子（登记表的实时视图，遍历时不要增删棋子）
+        return self.store.pieces(self.color)
+
+    def initialize_pieces(self):
+        # 生成初始布局：兵站在兵的起始行，底线在它后面一行，按 back_rank 排列；id 先底线后兵，从左到右
+        P = self.piece_class
+        pawn_row = PAWN_START_ROW[self.color]
+        back_row = pawn_row - PAWN_DIRECTION[self.color]
+        for col, piece_type in enumerate(back_rank()):
+            self.store.add(P(col + 1, piece_type, self.color, back_row, col))
+        for col in range(GRID_SIZE):
+            self.store.add(P(GRID_SIZE + 1 + col, 'pawn', self.color, pawn_row, col))
+
+    def reset_turn_state(self):
+        # 重置回合状态
+        self.moves_this_turn = 0
+        self.skills_used_this_turn = 0  # 重置技能使用次数
+        for piece in self.pieces:
+            piece.reset_turn_state()
+
+
+# 动作类型：模拟/分析代码通过 GameState.apply 提交
+class SetTaxMask(NamedTuple):
+    mask: int  # 第 row * GRID_SIZE + col 位为 1 表示该格征税
+
+class SetFarmCounts(NamedTuple):
+    counts: tuple[tuple[int, int, int], ...]  # ((row, col, times), ...)，未列出的格子为 0
+
+class EndActionPhase(NamedTuple):
+    pass
+
+class Move(NamedTuple):
+    from_row: int
+    from_col: int
+    to_row: int
+    to_col: int
+
+class CastSkill(NamedTuple):
+    row: int
+    col: int
+
+class EndTurn(NamedTuple):
+    pass
+
+
+# 撤销记录：make 执行动作前记下的旧值，unmake 据此恢复
+class UndoEntry(NamedTuple):
+    action: tuple
+    scalars: tuple  # (phase, current_player_idx, game_over, winner, zobrist)
+    food: tuple  # 各方执行前的粮草
+    counters: tuple  # 各方执行前的 (moves_this_turn, skills_used_this_turn)
+    moved: tuple  # ((piece, 旧的 moved_this_turn), ...)
+    captured: Piece | None  # Move：被吃的棋子
+    antler: tuple | None  # Move：目标格原有的鹿角 (pos, color)
+    obstacles: tuple  # CastSkill：执行前该格是否有 (鹿角, 堡垒)
+    resource_changes: list  # 资源系统的格子修改记录
+
+
+# 游戏状态与规则
+class GameState:
+    piece_class = Piece  # 创建棋子时使用的类
+
+    def __init__(self, use_arrays=False):
+        self.use_arrays = use_arrays  # 使用 numpy 数组版资源系统
+        self.event_handler = EventHandler()
+        self.event_handler.add_listener(GameEvent.TURN_END, self.on_turn_end)
+        self.event_handler.add_listener(GameEvent.PHASE_CHANGE, self.on_phase_change)
+
+        # 添加技能相关属性
+        self.pawn_abilities = {}  # 存储兵的鹿角技能效果
+        self.rook_fortresses = {}  # 存储车的堡垒技能效果
+        self.king_cores = {}  # 存储王的核心化领土效果
+
+        self.reset()
+
+    def reset(self):
+        # 重置资源系统、技能系统
+        if self.use_arrays:
+            from resource_arrays import ArrayResourceSystem  # numpy 是可选依赖，只在需要时导入
+            self.resource_system = ArrayResourceSystem()
+        else:
+            self.resource_system = ResourceSystem()
+        self.skill_system = SkillSystem(self.resource_system)
+
+        self.piece_store = PieceStore()
+        self.players = [
+            Player('white', GRID_SIZE, self.piece_class, self.piece_store),
+            Player('black', GRID_SIZE, self.piece_class, self.piece_store),
+        ]  # 顺序影响走子顺序
+        self.board: list[list[Piece|None]] = self.piece_store.board  # 按格子查找棋子，由 piece_store 维护
+        self.current_player_idx = 0  # 当前玩家索引
+        self.game_over = False
+        self.winner = None
+        self.phase = GamePhase.ACTION  # 初始阶段为行动阶段
+        self.board_version = 0  # 棋子或障碍物每次变化 +1，供渲染缓存判断是否需要重画
+
+        # 障碍物系统
+        self.antlers = {}  # 鹿角位置 {(row,col): owner_color}
+        self.fortresses = {}  # 堡垒位置 {(row,col): owner_color}
+        self.core_territories = {}  # 核心领土 {(row,col): owner_color}
+
+        self.initialize_board()
+        self.undo_stack = []  # make 记下的撤销记录
+        self.zobrist = self.compute_zobrist()  # 棋子和障碍物部分的 Zobrist 哈希，随走子/技能增量更新
+
+    # pickle 时棋子只随 piece_store 打包传一次，board 在读回时从登记表取
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['board']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.board = self.piece_store.board
+
+    def clone(self):
+        """独立的规则状态副本（不含界面状态），供搜索/分析在上面试走"""
+        state = GameState.__new__(GameState)
+        state.use_arrays = self.use_arrays
+        state.event_handler = EventHandler()
+        state.event_handler.add_listener(GameEvent.TURN_END, state.on_turn_end)
+        state.event_handler.add_listener(GameEvent.PHASE_CHANGE, state.on_phase_change)
+        state.pawn_abilities = dict(self.pawn_abilities)
+        state.rook_fortresses = dict(self.rook_fortresses)
+        state.king_cores = dict(self.king_cores)
+
+        state.resource_system = self.resource_system.copy()
+        state.skill_system = SkillSystem(state.resource_system)
+        state.players = []
+        state.piece_store = PieceStore(tuple(self.piece_store.by_color))
+        state.board = state.piece_store.board
+        # 副本中的棋子和玩家都用规则核心的类（不带绘制方法），可以直接 pickle 给其他进程
+        for player in self.players:
+            player_copy = Player.__new__(Player)
+            player_copy.__dict__.update(player.__dict__)
+            player_copy.piece_class = Piece
+            player_copy.store = state.piece_store
+            for piece in player.pieces:
+                state.piece_store.add(piece.copy(Piece))
+            state.players.append(player_copy)
+
+        state.current_player_idx = self.current_player_idx
+        state.game_over = self.game_over
+        state.winner = self.winner
+        state.phase = self.phase
+        state.board_version = self.board_version
+        state.antlers = dict(self.antlers)
+        state.fortresses = dict(self.fortresses)
+        state.core_territories = dict(self.core_territories)
+        state.zobrist = self.zobrist
+        state.undo_stack = []  # 副本不能撤销到复制之前
+        return state
+
+    def initialize_board(self):
+        # 初始化领土控制（棋子在创建时已经登记到棋盘上）
+        for player in self.players:
+            for piece in player.pieces:
+                self.resource_system.update_territory(piece.row, piece.col, player.color)
+
+    def get_current_player(self):
+        return self.players[self.current_player_idx]
+
+    @staticmethod
+    def piece_zobrist(piece):
+        # 棋子（含本回合是否走过）在哈希中的部分
+        keys = zobrist.tables()
+        sq = square(piece.row, piece.col)
+        h = keys.piece[piece.color][piece.type][sq]
+        if piece.moved_this_turn:
+            h ^= keys.moved[sq]
+        return h
+
+    def compute_zobrist(self):
+        # 从头计算棋子和障碍物部分的哈希（初始化和校验用）
+        keys = zobrist.tables()
+        h = 0
+        for player in self.players:
+            for piece in player.pieces:
+                h ^= self.piece_zobrist(piece)
+        for (row, col), color in self.antlers.items():
+            h ^= keys.antler[color][square(row, col)]
+        for (row, col), color in self.fortresses.items():
+            h ^= keys.fortress[color][square(row, col)]
+        return h
+
+    def zobrist_key(self):
+        """整个局面的 64 位哈希：棋子、障碍物、资源、粮草、当前玩家、阶段和本回合计数"""
+        h = self.zobrist ^ self.resource_system.zobrist
+        h ^= zobrist.key('turn', self.current_player_idx, self.phase.value)
+        for player in self.players:
+            h ^= zobrist.key('food', player.color, int(self.resource_system.food[player.color]))
+            h ^= zobrist.key('counters', player.color, player.moves_this_turn, player.skills_used_this_turn)
+        return h
+
+    def apply(self, action):
+        """执行一个动作，成功返回 True"""
+        if self.game_over:
+            return False
+        match action:
+            case SetTaxMask(mask):
+                return self.set_tax_mask(mask)
+            case SetFarmCounts(counts):
+                return self.set_farm_counts(counts)
+            case EndActionPhase():
+                return self.end_action_phase()
+            case Move(from_row, from_col, to_row, to_col):
+                return self.try_move(from_row, from_col, to_row, to_col)
+            case CastSkill(row, col):
+                return self.use_skill(row, col)
+            case EndTurn():
+                return self.end_turn()
+        raise TypeError(f"Unknown action: {action!r}")
+
+    def make(self, action):
+        """执行动作并记下撤销记录，成功返回 True（失败时状态不变，不入栈）"""
+        captured = antler = None
+        moved = ()
+        obstacles = ()
+        match action:
+            case Move(from_row, from_col, to_row, to_col):
+                piece = self.board[from_row][from_col]
+                target = self.board[to_row][to_col]
+                if piece is not None:
+                    moved = ((piece, piece.moved_this_turn),)
+                captured = target
+                if (to_row, to_col) in self.antlers:
+                    antler = ((to_row, to_col), self.antlers[(to_row, to_col)])
+            case CastSkill(row, col):
+                obstacles = ((row, col) in self.antlers, (row, col) in self.fortresses)
+            case EndTurn():
+                moved = tuple((piece, piece.moved_this_turn) for player in self.players
+                              for piece in player.pieces if piece.moved_this_turn)
+
+        entry = UndoEntry(
+            action,
+            (self.phase, self.current_player_idx, self.game_over, self.winner, self.zobrist),
+            tuple(self.resource_system.food[player.color] for player in self.players),
+            tuple((player.moves_this_turn, player.skills_used_this_turn) for player in self.players),
+            moved, captured, antler, obstacles, [],
+        )
+        self.resource_system.journal = entry.resource_changes
+        try:
+            ok = self.apply(action)
+        finally:
+            self.resource_system.journal = None
+        if ok:
+            self.undo_stack.append(entry)
+        return ok
+
+    def unmake(self):
+        """撤销最近一次 make，没有可撤销的动作时返回 False"""
+        if not self.undo_stack:
+            return False
+        entry = self.undo_stack.pop()
+        rs = self.resource_system
+        rs.undo_changes(entry.resource_changes)
+
+        match entry.action:
+            case Move(from_row, from_col, to_row, to_col):
+                if entry.antler is not None and entry.antler[0] not in self.antlers:
+                    # 吃掉的鹿角放回去（吃鹿角时棋子不移位）
+                    pos, color = entry.antler
+                    self.antlers[pos] = color
+                piece = self.board[to_row][to_col]
+                if piece is not None and self.board[from_row][from_col] is None:
+                    # 棋子走回原位，被吃的棋子重新登记（登记表中排到最后）
+                    self.piece_store.move(piece, from_row, from_col)
+                    target = entry.captured
+                    if target is not None:
+                        self.piece_store.add(target)
+            case CastSkill(row, col):
+                had_antler, had_fortress = entry.obstacles
+                if not had_antler and (row, col) in self.antlers:
+                    del self.antlers[(row, col)]
+                if not had_fortress and (row, col) in self.fortresses:
+                    del self.fortresses[(row, col)]
+
+        for piece, moved in entry.moved:
+            piece.moved_this_turn = moved
+        for player, food, (moves, skills) in zip(self.players, entry.food, entry.counters):
+            rs.food[player.color] = food
+            player.moves_this_turn = moves
+            player.skills_used_this_turn = skills
+        self.phase, self.current_player_idx, self.game_over, self.winner, self.zobrist = entry.scalars
+        self.board_version += 1
+        return True
+
+    def set_tax_mask(self, mask):
+        # 按位设置征税标记，只对当前玩家的领土生效
+        if self.phase != GamePhase.ACTION:
+            return False
+        self.resource_system.set_tax_mask(self.get_current_player().color, mask)
+        return True
+
+    def set_farm_counts(self, counts):
+        # 整体替换屯田计划
+        if self.phase != GamePhase.ACTION:
+            return False
+        color = self.get_current_player().color
+        for row, col, times in counts:
+            if not 0 <= times <= FARM_MAX_PER_GRID_PER_TURN:
+                logger.info(f"Invalid farming times {times} at ({row}, {col})")
+                return False
+            if self.resource_system.owner(row, col) != color:
+                logger.info(f"Cannot farm outside own territory at ({row}, {col})")
+                return False
+        self.resource_system.set_farm_counts(counts)
+        return True
+
+    def end_action_phase(self):
+        # 结算征税和屯田，进入走子阶段
+        if self.phase != GamePhase.ACTION:
+            return False
+        current = self.get_current_player()
+
+        # 检查操作是否会导致负资源
+        final_food, _ = self.calculate_post_operation_resources(current.color)
+
+        # 检查粮草是否为负
+        if final_food < 0:
+            logger.info("Cannot end turn: Not enough food for farming operations")
+            return False
+
+        # 检查是否有格子的丰饶度为负
+        negative_cell = self.resource_system.first_negative_cell(current.color)
+        if negative_cell is not None:
+            logger.info(f"Cannot end turn: Fertility at {negative_cell} would become negative")
+            return False
+
+        # 执行税收 + 屯田
+        tax = self.resource_system.collect_tax(current.color)
+        farm_cost = self.resource_system.implement_farming(current.color)
+        logger.debug(f"{current.color} 征税 {tax}，屯田花费 {farm_cost}")
+        self.phase = GamePhase.MOVE
+        self.event_handler.dispatch(GameEvent.PHASE_CHANGE)
+        return True
+
+    def end_turn(self):
+        # 轮到下一位玩家
+        if self.phase != GamePhase.MOVE:
+            return False
+        self.current_player_idx = (self.current_player_idx + 1) % len(self.players)
+        self.phase = GamePhase.ACTION
+        self.event_handler.dispatch(GameEvent.PHASE_CHANGE)
+        self.event_handler.dispatch(GameEvent.TURN_END)
+        return True
+
+    def try_move(self, from_row, from_col, to_row, to_col):
+        # 校验后移动当前玩家的棋子
+        if self.phase != GamePhase.MOVE:
+            return False
+        piece = self.board[from_row][from_col]
+        if piece is None or piece.color != self.get_current_player().color:
+            return False
+        if (to_row, to_col) not in self.get_valid_moves(from_row, from_col):
+            return False
+        if not self.move_piece(from_row, from_col, to_row, to_col):
+            return False
+        self.check_game_over()
+        return True
+
+    def use_skill(self, row, col):
+        # 当前玩家对指定格子上的己方棋子释放技能
+        if self.phase != GamePhase.MOVE:
+            return False
+        current_player = self.get_current_player()
+        piece = self.board[row][col]
+        if piece is None or piece.color != current_player.color:
+            return False
+
+        # 检查技能使用次数限制
+        if current_player.skills_used_this_turn >= SKILL_MAX_PER_TURN:
+            logger.info("Maximum skills per turn reached")
+            return False
+
+        # 尝试使用技能
+        if self.cast_skill(piece):
+            current_player.skills_used_this_turn += 1
+            return True
+        return False
+
+    def is_blocked(self, from_pos, to_pos, attacker_color):
+        """检查移动路径是否被障碍物阻挡"""
+        from_row, from_col = from_pos
+        to_row, to_col = to_pos
+
+        # 目标位置堡垒检测
+        if self.fortresses.get(to_pos, attacker_color) != attacker_color:
+            return True
+
+        # 如果是马，可以跳过鹿角（但不能跳过堡垒）
+        piece = self.board[from_row][from_col]
+        if piece and piece.type == 'knight':
+            return False
+
+        # 路径上的敌方鹿角、敌方堡垒阻挡（查预计算的中间格表）
+        for pos in between(from_row, from_col, to_row, to_col):
+            if self.antlers.get(pos, attacker_color) != attacker_color:
+                return True
+            if self.fortresses.get(pos, attacker_color) != attacker_color:
+                return True
+
+        return False
+
+    def move_piece(self, from_row, from_col, to_row, to_col):
+        # 移动棋子
+        piece = self.board[from_row][from_col]
+        current_player = self.get_current_player()
+
+        # 检查是否已超过移动次数限制
+        if current_player.moves_this_turn >= PIECE_MOVE_MAX_PER_TURN:
+            logger.info("Maximum moves per turn reached")
+            return False
+
+        # 检查王是否已超过移动次数限制
+        if piece.type == 'king' and piece.moved_this_turn >= PIECE_KING_MOVE_MAX_PER_TURN:
+            logger.info("King can only move %s per turn" % to_times(PIECE_KING_MOVE_MAX_PER_TURN))
+            return False
+
+        # 检查移动消耗
+        move_cost = PIECE_MOVE_COST(piece.type, piece.moved_this_turn)
+        if self.resource_system.food[current_player.color] < move_cost:
+            logger.info(f"Not enough food to move {piece.type} (cost: {move_cost})")
+            return False
+
+        # 检查目标位置是否有敌方鹿角
+        target_pos = (to_row, to_col)
+        if target_pos in self.antlers and self.antlers[target_pos] != piece.color:
+            # 吃掉鹿角（不移位，只移除鹿角）
+            self.zobrist ^= zobrist.tables().antler[self.antlers[target_pos]][square(to_row, to_col)]
+            del self.antlers[target_pos]
+            logger.debug(f"{piece.color} ate enemy antlers")
+
+            # 扣除移动消耗
+            self.resource_system.food[current_player.color] -= move_cost
+            current_player.moves_this_turn += 1
+            self.board_version += 1
+            return True  # 不移位，但消耗移动次数和粮草
+
+        # 检查目标位置是否有敌方堡垒
+        if target_pos in self.fortresses and self.fortresses[target_pos] != piece.color:
+            logger.info(f"{piece.color} cannot move to enemy fortress")
+            return False  # 无法移动到敌方堡垒
+
+        # 处理目标位置的棋子（吃子）
+        target_piece = self.board[to_row][to_col]
+        if target_piece:
+            self.zobrist ^= self.piece_zobrist(target_piece)
+            self.piece_store.remove(target_piece)
+
+        # 更新领土控制
+        self.resource_system.update_territory(to_row, to_col, piece.color)
+
+        # 扣除移动消耗
+        self.resource_system.food[current_player.color] -= move_cost
+
+        # 执行移动
+        self.zobrist ^= self.piece_zobrist(piece)
+        self.piece_store.move(piece, to_row, to_col)
+        piece.moved_this_turn = 1  # 只标记走过，消耗只区分走没走过
+        self.zobrist ^= self.piece_zobrist(piece)
+        current_player.moves_this_turn += 1
+        self.board_version += 1
+
+        return True
+
+    def get_valid_moves(self, row, col):
+        piece = self.board[row][col]
+        moves = []
+        current_player = self.get_current_player()
+        move_cost = PIECE_MOVE_COST(piece.type, piece.moved_this_turn)
+
+        # 检查是否有足够的粮草移动这个棋子
+        has_enough_food = self.resource_system.food[current_player.color] >= move_cost
+
+        if not has_enough_food:
+            return []  # 粮草不足，无法移动
+
+        # 查预计算的走法表，每条射线只走一遍，同时处理棋子阻挡、障碍物阻挡和敌方堡垒
+        board = self.board
+        antlers = self.antlers
+        fortresses = self.fortresses
+        color = piece.color
+        sq = square(row, col)
+
+        if piece.type == 'pawn':
+            # 兵的特殊移动规则
+            one, two = PAWN_PUSHES[color][sq]
+            # 基本前进（可以走到敌方鹿角上吃掉鹿角）
+            if one and board[one[0]][one[1]] is None and fortresses.get(one, color) == color:
+                moves.append(one)
+                # 如果是初始位置，可以前进两格，中间格不能有敌方鹿角
+                if two and board[two[0]][two[1]] is None and fortresses.get(two, color) == color \
+                        and antlers.get(one, color) == color:
+                    moves.append(two)
+            # 吃子斜进
+            for r, c in PAWN_CAPTURES[color][sq]:
+                target = board[r][c]
+                if target and target.color != color and fortresses.get((r, c), color) == color:
+                    moves.append((r, c))
+
+        elif piece.type in SLIDER_RAYS:
+            # 车、象、后沿射线滑行
+            for ray in SLIDER_RAYS[piece.type][sq]:
+                for pos in ray:
+                    # 敌方堡垒不能进入也不能越过
+                    if fortresses.get(pos, color) != color:
+                        break
+                    target = board[pos[0]][pos[1]]
+                    if target is not None:
+                        if target.color != color:
+                            moves.append(pos)
+                        break
+                    moves.append(pos)
+                    # 敌方鹿角可以吃掉，但不能越过
+                    if antlers.get(pos, color) != color:
+                        break
+
+        else:
+            # 马、王跳到固定目标格（马可以跳过鹿角）
+            for r, c in LEAPER_TARGETS[piece.type][sq]:
+                target = board[r][c]
+                if (target is None or target.color != color) and fortresses.get((r, c), color) == color:
+                    moves.append((r, c))
+
+        return moves
+
+    def cast_skill(self, piece):
+        current_player = self.get_current_player()
+
+        # 检查粮草是否足够
+        if not self.skill_system.can_cast_skill(piece.type, current_player.color):
+            logger.info(f"Not enough food to cast {piece.type} skill")
+            return False
+
+        # 兵技能 - 放置鹿角
+        if piece.type == 'pawn':
+            pos = (piece.row, piece.col)
+            # 检查位置是否已经有障碍物
+            if pos in self.antlers or pos in self.fortresses:
+                logger.info("Cannot place antlers on existing obstacle")
+                return False
+
+            # 扣除粮草并放置鹿角
+            if self.skill_system.cast_skill(piece.type, current_player.color):
+                self.antlers[pos] = current_player.color
+                self.zobrist ^= zobrist.tables().antler[current_player.color][square(*pos)]
+                self.board_version += 1
+                logger.debug(f"{current_player.color} placed antlers at {pos}")
+                return True
+
+        # 车技能 - 放置堡垒
+        elif piece.type == 'rook':
+            pos = (piece.row, piece.col)
+            # 检查位置是否已经有障碍物
+            if pos in self.antlers or pos in self.fortresses:
+                logger.info("Cannot place fortress on existing obstacle")
+                return False
+
+            # 扣除粮草并放置堡垒
+            if self.skill_system.cast_skill(piece.type, current_player.color):
+                self.fortresses[pos] = current_player.color
+                self.zobrist ^= zobrist.tables().fortress[current_player.color][square(*pos)]
+                self.board_version += 1
+                logger.debug(f"{current_player.color} placed fortress at {pos}")
+                return True
+
+        # 其他棋子无技能
+        else:
+            logger.info(f"{piece.type} has no skill")
+            return False
+
+    def on_turn_end(self, data=None):
+        # 回合结束时的处理逻辑
+        # 更新丰饶度
+        self.resource_system.update_fertility(self.piece_store.occupied)
+
+        # 重置玩家和棋子的回合状态（棋子是否走过也在哈希中）
+        for player in self.players:
+            for piece in player.pieces:
+                if piece.moved_this_turn:
+                    self.zobrist ^= self.piece_zobrist(piece)
+                    piece.reset_turn_state()
+                    self.zobrist ^= self.piece_zobrist(piece)
+            player.reset_turn_state()
+
+        # 重置管理网格
+        self.resource_system.reset_management_grids()
+
+    def on_phase_change(self, data=None):
+        # 阶段变化时的处理逻辑
+        if self.phase == GamePhase.ACTION:
+            logger.info("进入行动阶段")
+        elif self.phase == GamePhase.MOVE:
+            logger.info("进入走子阶段")
+
+    def check_game_over(self):
+        # 检查游戏是否结束
+        # 如果一方没有棋子，游戏结束
+        for player in self.players:
+            if self.piece_store.count(player.color) == 0:
+                self.game_over = True
+                # 找到另一方作为获胜者
+                for p in self.players:
+                    if p != player:
+                        self.winner = p.color
+                break
+
+    def calculate_post_operation_resources(self, player_color):
+        """计算操作后的粮草和丰饶度状态"""
+        return self.resource_system.preview_operations(player_color)
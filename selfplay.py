@@ -0,0 +1,179 @@
+import argparse
+import ast
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import consts
+from consts import *
+from rules import GameState, SetTaxMask, SetFarmCounts, EndActionPhase, Move, CastSkill, EndTurn
+from ai import Searcher, legal_actions
+from record import RecordWriter
+
+
+# 自对弈批量运行：多进程跑 N 局无界面对局，每局结束立即写一行 JSON（对局记录、胜者、回合数、每回合的粮草和丰饶度合计）
+# --record 同时把对局追加到二进制记录文件（见 record.py）
+# 调规则参数用：--set INIT_FOOD=40 --set PIECE_BASIC_MOVE_COST.rook=4 --set SKILL_COSTS.pawn=5
+#   python selfplay.py -n 200 --white alphabeta:0.05 --black random --workers 8 --out log/selfplay.jsonl
+
+# 对局记录中动作的简写
+ACTION_CODES = {SetTaxMask: 't', SetFarmCounts: 'f', EndActionPhase: 'a', Move: 'm', CastSkill: 's', EndTurn: 'e'}
+CODE_ACTIONS = {code: action for action, code in ACTION_CODES.items()}
+
+
+def encode_action(action):
+    return [ACTION_CODES[type(action)], *action]
+
+
+def decode_action(data):
+    code, *args = data
+    if code == 'f':
+        return SetFarmCounts(tuple(tuple(count) for count in args[0]))
+    return CODE_ACTIONS[code](*args)
+
+
+def apply_overrides(overrides):
+    """覆盖规则参数（在每个工作进程里调用）
+
+    NAME=值 替换 consts 中的常量（同时替换其他模块 from consts import * 得到的同一个对象），
+    NAME.key=值 修改字典常量的一项；SKILL_COSTS 指 SkillSystem.SKILL_COSTS。
+    只对运行时读取的参数有效，GRID_SIZE 之类在导入时就用掉的参数改了没有意义。
+    """
+    for name, value in overrides.items():
+        base, _, item = name.partition('.')
+        owner = SkillSystem if hasattr(SkillSystem, base) and not hasattr(consts, base) else consts
+        if not hasattr(owner, base):
+            raise KeyError(f"Unknown rule constant: {base}")
+        if item:
+            getattr(owner, base)[item] = value
+        elif owner is SkillSystem:
+            setattr(SkillSystem, base, value)
+        else:
+            original = getattr(consts, base)
+            for module in list(sys.modules.values()):
+                if getattr(module, base, None) is original:
+                    setattr(module, base, value)
+
+
+class RandomAgent:
+    def __init__(self, rnd):
+        self.rnd = rnd
+
+    def search(self, state):
+        actions = legal_actions(state)
+        return self.rnd.choice(actions) if actions else None
+
+
+def make_agent(spec, rnd):
+    """'random'、'greedy'、'alphabeta[:每步秒数]'、'mcts[:每步秒数]'"""
+    name, _, arg = spec.partition(':')
+    if name == 'random':
+        return RandomAgent(rnd)
+    if name == 'greedy':
+        return Searcher(time_limit=float(arg or 10), max_depth=1)
+    if name == 'alphabeta':
+        return Searcher(time_limit=float(arg or 0.1))
+    if name == 'mcts':
+        from mcts import MCTSEngine
+        return MCTSEngine(time_limit=float(arg or 0.1), workers=1)
+    raise ValueError(f"Unknown agent: {spec}")
+
+
+def turn_totals(state):
+    # [白方粮草, 黑方粮草, 白方领土丰饶度合计, 黑方领土丰饶度合计]
+    rs = state.resource_system
+    fertility = {color: sum(int(rs.fertility[row][col]) for row, col in cells)
+                 for color, cells in rs.territory_cells.items()}
+    return [int(rs.food['white']), int(rs.food['black']), fertility['white'], fertility['black']]
+
+
+def play_game(index, white, black, seed, max_plies):
+    """跑一局，返回结果字典"""
+    start = time.perf_counter()
+    rnd = random.Random(seed)
+    random.seed(seed)  # MCTS 的种子取自全局 random
+    state = GameState()
+    agents = {'white': make_agent(white, rnd), 'black': make_agent(black, rnd)}
+    record, totals = [], []
+    plies = 0
+    while not state.game_over and plies < max_plies:
+        decision = agents[state.get_current_player().color].search(state)
+        if decision is None:
+            break
+        for action in decision:
+            if not state.apply(action):
+                raise RuntimeError(f"Agent chose an illegal action in game {index}: {action!r}")
+            record.append(encode_action(action))
+        plies += 1
+        if isinstance(decision[-1], EndTurn):
+            totals.append(turn_totals(state))
+    return {
+        'game': index, 'seed': seed, 'white': white, 'black': black,
+        'winner': state.winner, 'turns': len(totals), 'plies': plies,
+        'seconds': round(time.perf_counter() - start, 3),
+        'totals': totals, 'record': record,
+    }
+
+
+def parse_overrides(items):
+    overrides = {}
+    for item in items:
+        name, _, value = item.partition('=')
+        try:
+            overrides[name] = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            raise SystemExit(f"Bad value for {name}: {value!r}")
+    return overrides
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run headless self-play games in parallel")
+    parser.add_argument('-n', '--games', type=int, default=100)
+    parser.add_argument('--white', default='alphabeta:0.05', help="random, greedy, alphabeta[:sec], mcts[:sec]")
+    parser.add_argument('--black', default='alphabeta:0.05')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--out', default=SELFPLAY_OUT_FILE)
+    parser.add_argument('--max-plies', type=int, default=400, help="decisions per game before it is adjourned")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--record', metavar='PATH', help="also append games to a binary record file")
+    parser.add_argument('--set', action='append', default=[], metavar='NAME=VALUE', help="override a rule constant")
+    args = parser.parse_args(argv)
+    overrides = parse_overrides(args.set)
+    apply_overrides(overrides)  # 本进程也要改，记录文件头里的规则参数才对
+    writer = RecordWriter(args.record) if args.record else None
+
+    start = time.perf_counter()
+    wins = {'white': 0, 'black': 0, None: 0}
+    plies = 0
+    os.makedirs(os.path.dirname(args.out) or '.', exist_ok=True)
+    with open(args.out, 'w', encoding='utf-8') as out, \
+            ProcessPoolExecutor(args.workers, initializer=apply_overrides, initargs=(overrides,)) as pool:
+        futures = [pool.submit(play_game, i, args.white, args.black, args.seed + i, args.max_plies)
+                   for i in range(args.games)]
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            result['overrides'] = overrides
+            out.write(json.dumps(result, separators=(',', ':')) + '\n')
+            out.flush()
+            if writer is not None:
+                writer.write_game([decode_action(action) for action in result['record']], result['winner'],
+                                  {key: result[key] for key in ('game', 'seed', 'white', 'black')})
+            wins[result['winner']] += 1
+            plies += result['plies']
+            elapsed = time.perf_counter() - start
+            print(f"\r{done}/{args.games} games, {done / elapsed:.2f} games/s, {plies / elapsed:.0f} plies/s",
+                  end='', file=sys.stderr)
+
+    if writer is not None:
+        writer.close()
+    elapsed = time.perf_counter() - start
+    print(file=sys.stderr)
+    print(f"{args.games} games in {elapsed:.1f}s: {args.games / elapsed:.2f} games/s, {plies / elapsed:.0f} plies/s; "
+          f"white {wins['white']}, black {wins['black']}, unfinished {wins[None]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+from consts import *
+
+
+# 走法表：启动时按格子编号（row * GRID_SIZE + col）预先算好，生成走法时直接查表
+# 表中的 (row, col) 都引用 POSITIONS 里的同一个元组，大棋盘上射线表的内存只有指针大小
+ROOK_DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+BISHOP_DIRECTIONS = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+QUEEN_DIRECTIONS = ROOK_DIRECTIONS + BISHOP_DIRECTIONS
+KNIGHT_OFFSETS = ((2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2))
+KING_OFFSETS = QUEEN_DIRECTIONS
+
+SQUARE_COUNT = GRID_SIZE * GRID_SIZE
+PAWN_DIRECTION = {'black': 1, 'white': -1}  # 兵的前进方向
+PAWN_START_ROW = {'black': 1, 'white': GRID_SIZE - 2}  # 兵可以前进两格的行
+
+
+def square(row, col):
+    return row * GRID_SIZE + col
+
+
+def square_to_pos(sq):
+    return divmod(sq, GRID_SIZE)
+
+
+POSITIONS = tuple(square_to_pos(sq) for sq in range(SQUARE_COUNT))  # 格子编号 -> (row, col)
+
+
+def _on_board(row, col):
+    return 0 <= row < GRID_SIZE and 0 <= col < GRID_SIZE
+
+
+def _ray(row, col, dr, dc):
+    # 从 (row, col) 出发沿 (dr, dc) 到棋盘边缘的格子，不含起点
+    ray = []
+    r, c = row + dr, col + dc
+    while _on_board(r, c):
+        ray.append(POSITIONS[square(r, c)])
+        r, c = r + dr, c + dc
+    return tuple(ray)
+
+
+def _leaps(row, col, offsets):
+    return tuple(POSITIONS[square(row + dr, col + dc)] for dr, dc in offsets if _on_board(row + dr, col + dc))
+
+
+# 每个方向的射线：RAYS[sq][i] 对应 QUEEN_DIRECTIONS[i]
+RAYS = tuple(
+    tuple(_ray(*square_to_pos(sq), dr, dc) for dr, dc in QUEEN_DIRECTIONS)
+    for sq in range(SQUARE_COUNT)
+)
+ROOK_RAYS = tuple(rays[:4] for rays in RAYS)
+BISHOP_RAYS = tuple(rays[4:] for rays in RAYS)
+QUEEN_RAYS = RAYS
+SLIDER_RAYS = {'rook': ROOK_RAYS, 'bishop': BISHOP_RAYS, 'queen': QUEEN_RAYS}
+
+# 跳跃类棋子的目标格
+KNIGHT_TARGETS = tuple(_leaps(*square_to_pos(sq), KNIGHT_OFFSETS) for sq in range(SQUARE_COUNT))
+KING_TARGETS = tuple(_leaps(*square_to_pos(sq), KING_OFFSETS) for sq in range(SQUARE_COUNT))
+LEAPER_TARGETS = {'knight': KNIGHT_TARGETS, 'king': KING_TARGETS}
+
+# 兵：PAWN_PUSHES[color][sq] = (前进一格, 前进两格)，不存在的为 None
+PAWN_PUSHES = {}
+PAWN_CAPTURES = {}
+for _color, _dir in PAWN_DIRECTION.items():
+    _pushes, _captures = [], []
+    for _sq in range(SQUARE_COUNT):
+        _row, _col = square_to_pos(_sq)
+        _one = (_row + _dir, _col) if _on_board(_row + _dir, _col) else None
+        _two = (_row + 2 * _dir, _col) if _one and _row == PAWN_START_ROW[_color] else None
+        _pushes.append((_one, _two))
+        _captures.append(_leaps(_row, _col, ((_dir, -1), (_dir, 1))))
+    PAWN_PUSHES[_color] = tuple(_pushes)
+    PAWN_CAPTURES[_color] = tuple(_captures)
+
+# 单位方向 -> QUEEN_DIRECTIONS 的下标
+DIRECTION_INDEX = {direction: i for i, direction in enumerate(QUEEN_DIRECTIONS)}
+
+
+def between(from_row, from_col, to_row, to_col):
+    """同一直线/斜线上两格之间的格子（射线表的切片），不在一条线上则为空"""
+    dr, dc = to_row - from_row, to_col - from_col
+    steps = max(abs(dr), abs(dc))
+    if steps == 0 or not (dr == 0 or dc == 0 or abs(dr) == abs(dc)):
+        return ()
+    return RAYS[from_row * GRID_SIZE + from_col][DIRECTION_INDEX[dr // steps, dc // steps]][:steps - 1]
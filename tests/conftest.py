@@ -0,0 +1,24 @@
+import logging
+
+import pytest
+
+import consts
+from selfplay import apply_overrides
+
+
+# 规则核心会写 info 日志，测试里不需要
+logging.disable(logging.INFO)
+
+
+@pytest.fixture
+def override_rules():
+    """返回一个函数，像 selfplay --set 那样覆盖规则参数；测试结束后恢复原值"""
+    originals = {}
+
+    def override(overrides):
+        for name, value in overrides.items():
+            originals.setdefault(name, getattr(consts, name))
+        apply_overrides(overrides)
+
+    yield override
+    apply_overrides(originals)
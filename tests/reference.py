@@ -0,0 +1,100 @@
+"""测试用的参考实现：最初版本 game.py 里逐方向试探的走法生成，以及随机对局用的决策"""
+from consts import *
+from rules import GamePhase, SetTaxMask, SetFarmCounts, EndActionPhase, Move, CastSkill, EndTurn
+
+
+KING_STEPS = [(dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1) if dr or dc]
+KNIGHT_STEPS = [(2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)]
+ROOK_STEPS = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+BISHOP_STEPS = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+SLIDER_STEPS = {'rook': ROOK_STEPS, 'bishop': BISHOP_STEPS, 'queen': ROOK_STEPS + BISHOP_STEPS}
+
+
+def on_board(row, col):
+    return 0 <= row < GRID_SIZE and 0 <= col < GRID_SIZE
+
+
+def path_blocked(state, row, col, to_row, to_col, color):
+    # 目标格是敌方堡垒不能进；马跳过路径，其余棋子路径上不能有敌方鹿角和堡垒
+    if state.fortresses.get((to_row, to_col), color) != color:
+        return True
+    if state.board[row][col].type == 'knight':
+        return False
+    steps = max(abs(to_row - row), abs(to_col - col))
+    dr, dc = (to_row - row) // steps, (to_col - col) // steps
+    for i in range(1, steps):
+        pos = (row + dr * i, col + dc * i)
+        if state.antlers.get(pos, color) != color or state.fortresses.get(pos, color) != color:
+            return True
+    return False
+
+
+def baseline_moves(state, row, col):
+    """(row, col) 上棋子的合法目标格，与 GameState.get_valid_moves 的规则相同"""
+    piece = state.board[row][col]
+    color = piece.color
+    food = state.resource_system.food[state.get_current_player().color]
+    if food < PIECE_MOVE_COST(piece.type, piece.moved_this_turn):
+        return []
+
+    def free_or_enemy(r, c):
+        return state.board[r][c] is None or state.board[r][c].color != color
+
+    moves = []
+    if piece.type == 'pawn':
+        direction = 1 if color == 'black' else -1
+        if on_board(row + direction, col) and state.board[row + direction][col] is None:
+            moves.append((row + direction, col))
+            start = 1 if color == 'black' else GRID_SIZE - 2
+            if row == start and state.board[row + 2 * direction][col] is None:
+                moves.append((row + 2 * direction, col))
+        for dc in (-1, 1):
+            if on_board(row + direction, col + dc):
+                target = state.board[row + direction][col + dc]
+                if target and target.color != color:
+                    moves.append((row + direction, col + dc))
+    elif piece.type in ('knight', 'king'):
+        for dr, dc in KNIGHT_STEPS if piece.type == 'knight' else KING_STEPS:
+            if on_board(row + dr, col + dc) and free_or_enemy(row + dr, col + dc):
+                moves.append((row + dr, col + dc))
+    else:
+        for dr, dc in SLIDER_STEPS[piece.type]:
+            r, c = row + dr, col + dc
+            while on_board(r, c):
+                if state.board[r][c] is not None:
+                    if state.board[r][c].color != color:
+                        moves.append((r, c))
+                    break
+                moves.append((r, c))
+                r, c = r + dr, c + dc
+    return [(r, c) for r, c in moves if not path_blocked(state, row, col, r, c, color)]
+
+
+def random_decision(state, rnd):
+    """随机的一个决策（动作元组），不一定合法：征税/屯田可能让粮草或丰饶度为负，技能可能放不了"""
+    player = state.get_current_player()
+    if state.phase == GamePhase.ACTION:
+        if rnd.random() < 0.5:
+            farms = tuple((rnd.randrange(GRID_SIZE), rnd.randrange(GRID_SIZE), rnd.randint(1, FARM_MAX_PER_GRID_PER_TURN))
+                          for _ in range(rnd.randint(0, 2)))
+            return SetTaxMask(rnd.getrandbits(GRID_SIZE * GRID_SIZE)), SetFarmCounts(farms), EndActionPhase()
+        return SetTaxMask(0), SetFarmCounts(()), EndActionPhase()
+    pieces = list(player.pieces)
+    moves = [Move(piece.row, piece.col, row, col) for piece in pieces
+             for row, col in state.get_valid_moves(piece.row, piece.col)]
+    roll = rnd.random()
+    if moves and roll < 0.8:
+        return (rnd.choice(moves),)
+    if roll < 0.9:
+        piece = rnd.choice(pieces)
+        return (CastSkill(piece.row, piece.col),)
+    return (EndTurn(),)
+
+
+def random_step(state, rnd):
+    """用 apply 执行一个随机决策；行动阶段的计划不合法时改为不征税、不屯田"""
+    if all(state.apply(action) for action in random_decision(state, rnd)):
+        return
+    if state.phase == GamePhase.ACTION:
+        for action in (SetTaxMask(0), SetFarmCounts(()), EndActionPhase()):
+            state.apply(action)
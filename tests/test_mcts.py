@@ -0,0 +1,15 @@
+from rules import GameState
+from ai import legal_actions
+from mcts import MCTSEngine
+
+
+def test_parallel_search_merges_worker_trees():
+    # 工作进程用 spawn 启动，局面要能传过去、模块要能在新进程里导入
+    state = GameState()
+    with MCTSEngine(time_limit=None, iterations=20, workers=2) as engine:
+        decision = engine.search(state)
+        assert engine.executor._mp_context.get_start_method() == 'spawn'
+        assert decision in legal_actions(state)
+        assert engine.playouts == 40
+        assert sum(visits for visits, _ in engine.stats.values()) <= 40
+    assert engine.executor is None
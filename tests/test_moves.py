@@ -0,0 +1,21 @@
+import random
+
+import pytest
+
+from rules import GameState
+from reference import baseline_moves, random_step
+
+
+@pytest.mark.parametrize('seed', range(6))
+def test_table_moves_match_reference(seed):
+    # 随机对局中（含鹿角、堡垒、吃子和粮草不足），查表生成的走法与逐方向试探的结果相同
+    rnd = random.Random(seed)
+    state = GameState()
+    for _ in range(200):
+        if state.game_over:
+            break
+        for player in state.players:
+            for piece in list(player.pieces):
+                expected = baseline_moves(state, piece.row, piece.col)
+                assert sorted(state.get_valid_moves(piece.row, piece.col)) == sorted(expected)
+        random_step(state, rnd)
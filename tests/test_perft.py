@@ -0,0 +1,43 @@
+import pytest
+
+from rules import GamePhase, Move, CastSkill, EndTurn
+from ai import plan_candidates
+import perft
+from reference import baseline_moves
+
+
+def baseline_decisions(state):
+    # 走子阶段：每个走法、每个技能和结束回合各是一个决策；行动阶段沿用 ai 的候选计划
+    if state.phase == GamePhase.ACTION:
+        return plan_candidates(state)
+    decisions = [(Move(piece.row, piece.col, *target),)
+                 for piece in state.get_current_player().pieces for target in baseline_moves(state, piece.row, piece.col)]
+    decisions += [(CastSkill(piece.row, piece.col),) for piece in state.get_current_player().pieces]
+    return decisions + [(EndTurn(),)]
+
+
+def baseline_count(state, depth):
+    # 每个决策在副本上用 apply 执行，不合法的（超次数、粮草不够、格子上已有障碍）不计
+    if depth == 0 or state.game_over:
+        return 1
+    nodes = 0
+    for decision in baseline_decisions(state):
+        child = state.clone()
+        if all(child.apply(action) for action in decision):
+            nodes += baseline_count(child, depth - 1)
+    return nodes
+
+
+@pytest.mark.parametrize('name', sorted(perft.REFERENCE_COUNTS))
+def test_reference_counts(name):
+    state = perft.reference_positions()[name]
+    reference = perft.REFERENCE_COUNTS[name]
+    assert [baseline_count(state, depth) for depth in range(1, len(reference) + 1)] == reference
+
+
+@pytest.mark.parametrize('name', sorted(perft.REFERENCE_COUNTS))
+def test_perft_matches_reference(name):
+    state = perft.reference_positions()[name]
+    key = state.zobrist_key()
+    assert [perft.perft(state, depth) for depth in (1, 2)] == perft.REFERENCE_COUNTS[name][:2]
+    assert state.zobrist_key() == key and not state.undo_stack
@@ -0,0 +1,56 @@
+import itertools
+import random
+
+import pytest
+
+from consts import *
+from rules import GameState
+import planner
+
+
+def brute_force(rs, color, horizon):
+    """枚举己方每个格子的所有操作组合，返回最优目标值"""
+    cells = [(row, col) for row in range(GRID_SIZE) for col in range(GRID_SIZE) if rs.owner(row, col) == color]
+    choices = [(taxed, times) for taxed in (True, False) for times in range(FARM_MAX_PER_GRID_PER_TURN + 1)]
+    best = None
+    for combo in itertools.product(choices, repeat=len(cells)):
+        food, value = rs.food[color], 0
+        for (row, col), (taxed, times) in zip(cells, combo):
+            fertility = rs.fertility[row][col]
+            if fertility - 10 * taxed + 5 * times < 0:
+                break
+            food += (fertility // 10 if taxed else 0) - 10 * times
+            value += planner.future_income((max(0, fertility - 10) if taxed else fertility) + 5 * times, horizon)
+        else:
+            if food >= 0 and (best is None or food + value > best):
+                best = food + value
+    return best
+
+
+def small_board(rnd):
+    # 白方只有随机的几个格子，丰饶度和粮草也是随机的
+    state = GameState()
+    rs = state.resource_system
+    for row in range(GRID_SIZE):
+        for col in range(GRID_SIZE):
+            rs.update_territory(row, col, None)
+    for row, col in rnd.sample([(row, col) for row in range(GRID_SIZE) for col in range(GRID_SIZE)], rnd.randint(0, 4)):
+        rs.update_territory(row, col, 'white')
+        rs.fertility[row][col] = rnd.choice([0, 3, 5, 9, 10, 15, 27, 40, 100, 133])
+    rs.food['white'] = rnd.choice([0, 5, 10, 20, 35])
+    return state
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_plan_is_optimal(seed):
+    rnd = random.Random(seed)
+    for _ in range(30):
+        state = small_board(rnd)
+        rs = state.resource_system
+        horizon = rnd.choice([0, 0, 1, 3, 10, 30])
+        plan = planner.plan(rs, 'white', horizon)
+        assert plan.value == brute_force(rs, 'white', horizon)
+
+        # 规则接受这个计划，结算后的粮草与计划一致
+        assert all(state.apply(action) for action in plan.actions())
+        assert rs.food['white'] == plan.food
@@ -0,0 +1,57 @@
+import json
+
+from profiler import FrameProfiler
+
+
+def run_frame(profiler, keep=True):
+    profiler.begin_frame()
+    with profiler.stage('events'):
+        pass
+    profiler.wrap('draw', lambda value: value * 2)(21)
+    profiler.end_frame(keep)
+
+
+def test_disabled_profiler_records_nothing():
+    profiler = FrameProfiler()
+    assert profiler.wrap('draw', lambda value: value * 2)(21) == 42
+    run_frame(profiler)
+    assert not profiler.frames and not profiler.stages and not profiler.trace
+
+
+def test_stages_are_recorded_per_frame():
+    profiler = FrameProfiler(window=3)
+    profiler.enable()
+    for _ in range(5):
+        run_frame(profiler)
+    run_frame(profiler, keep=False)  # 丢弃的帧不计入统计
+    assert len(profiler.frames) == 3
+    assert {name: len(samples) for name, samples in profiler.stages.items()} == {'events': 3, 'draw': 3}
+    assert [row[0] for row in profiler.summary()][0] == 'frame'
+
+    assert not profiler.toggle()
+    run_frame(profiler)
+    assert len(profiler.frames) == 3
+
+
+def test_percentiles():
+    samples = [i * 1_000_000 for i in range(1, 101)]
+    assert FrameProfiler.percentiles(samples) == (51.0, 96.0, 100.0)
+    assert FrameProfiler.percentiles([]) == (0.0, 0.0, 0.0)
+
+
+def test_summary_sorted_by_p95():
+    profiler = FrameProfiler()
+    profiler.frames.extend([5, 6])
+    profiler.stages = {'fast': [1, 2], 'slow': [3, 4]}
+    assert [row[0] for row in profiler.summary()] == ['frame', 'slow', 'fast']
+
+
+def test_dump_trace(tmp_path):
+    profiler = FrameProfiler()
+    profiler.enable()
+    run_frame(profiler)
+    path = tmp_path / 'trace' / 'trace.json'
+    assert profiler.dump_trace(str(path)) == 3
+    events = json.loads(path.read_text())['traceEvents']
+    assert sorted(event['name'] for event in events) == ['draw', 'events', 'frame']
+    assert all(event['ph'] == 'X' and event['ts'] >= 0 for event in events)
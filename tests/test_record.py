@@ -0,0 +1,66 @@
+import pytest
+
+from rules import SetTaxMask, SetFarmCounts, EndActionPhase, Move, CastSkill, EndTurn
+from record import RecordWriter, RuleMismatchError, read_games, replay, rule_header, rule_overrides
+from selfplay import decode_action, play_game
+
+# 白方第一回合：不征税也不屯田，两个兵各放一次技能
+OPENING = (SetTaxMask(0), SetFarmCounts(()), EndActionPhase(), CastSkill(6, 0), CastSkill(7, 0))
+# 两次技能各花 10 点粮草，之后走兵还要 1 点：初始粮草 20 时最后一步走不了，40 时可以
+NEEDS_40_FOOD = OPENING + (Move(6, 4, 4, 4), EndTurn())
+
+
+def test_actions_round_trip(tmp_path):
+    path = tmp_path / 'games.lrec'
+    result = play_game(0, 'random', 'random', seed=3, max_plies=60)
+    actions = [decode_action(action) for action in result['record']]
+    with RecordWriter(path) as writer:
+        writer.write_game(actions, result['winner'], {'seed': 3})
+        writer.write_game(OPENING)
+
+    games = list(read_games(path))
+    assert [game.actions for game in games] == [actions, list(OPENING)]
+    assert games[0].meta == {'seed': 3} and games[0].winner == result['winner']
+    assert games[0].rules == rule_header()
+    replay(games[0])
+    replay(games[1])
+
+
+def test_truncated_last_game_is_ignored(tmp_path):
+    path = tmp_path / 'games.lrec'
+    with RecordWriter(path) as writer:
+        writer.write_game(OPENING[:3])
+        writer.write_game(OPENING)
+    path.write_bytes(path.read_bytes()[:-2])
+    assert [len(game.actions) for game in read_games(path)] == [3]
+
+
+def test_appending_with_other_rules_is_refused(tmp_path, override_rules):
+    path = tmp_path / 'games.lrec'
+    RecordWriter(path).close()
+    override_rules({'INIT_FOOD': 40})
+    with pytest.raises(ValueError):
+        RecordWriter(path)
+
+
+def test_replay_with_recorded_overrides(tmp_path, override_rules):
+    # 像 selfplay.py --set INIT_FOOD=40 --record 那样记录，再在默认规则下读回
+    path = tmp_path / 'games.lrec'
+    override_rules({'INIT_FOOD': 40})
+    with RecordWriter(path) as writer:
+        writer.write_game(NEEDS_40_FOOD)
+        result = play_game(0, 'random', 'random', seed=5, max_plies=60)
+        writer.write_game([decode_action(action) for action in result['record']], result['winner'])
+    override_rules({'INIT_FOOD': 20})
+
+    first, second = read_games(path)
+    assert first.rules['init_food'] == 40
+    with pytest.raises(RuleMismatchError, match='init_food'):
+        replay(first)
+    with pytest.raises(ValueError, match='Action 5'):
+        replay(first._replace(rules=None))  # 不看文件头硬放会在走兵那一步失败
+
+    # 换成记录时的规则后可以重放
+    override_rules(rule_overrides(first.rules))
+    assert replay(first).resource_system.food['white'] == 40 - 10 - 10 - 1
+    replay(second)
@@ -0,0 +1,60 @@
+import random
+
+import pytest
+
+from consts import *
+from rules import GameState
+from reference import random_decision
+
+
+def full_preview(rs, color):
+    """从头计算征税/屯田预览：(结算后粮草, {己方格子: 丰饶度变化}, 第一个丰饶度会变负的格子)"""
+    food = rs.food[color]
+    changes = {}
+    negative = None
+    for row in range(GRID_SIZE):
+        for col in range(GRID_SIZE):
+            if rs.owner(row, col) != color:
+                continue
+            taxed = bool(rs.tax_grid[row][col])
+            times = int(rs.farm_grid[row][col])
+            fertility = int(rs.fertility[row][col])
+            food += (fertility // 10 if taxed else 0) - 10 * times
+            changes[row, col] = 5 * times - (10 if taxed else 0)
+            if negative is None and fertility + changes[row, col] < 0:
+                negative = (row, col)
+    return food, changes, negative
+
+
+def assert_preview_current(rs):
+    for color in ('white', 'black'):
+        food, changes, negative = full_preview(rs, color)
+        cached_food, cached_changes = rs.preview_operations(color)
+        assert cached_food == food
+        assert {cell: int(cached_changes[cell[0]][cell[1]]) for cell in changes} == changes
+        cell = rs.first_negative_cell(color)
+        assert (None if cell is None else tuple(map(int, cell))) == negative
+
+
+@pytest.mark.parametrize('use_arrays', [False, True], ids=['lists', 'arrays'])
+@pytest.mark.parametrize('seed', range(4))
+def test_plan_preview_cache(seed, use_arrays):
+    # 每个动作之后（包括被拒绝的计划留下的标记），缓存的预览都与从头计算的一致
+    if use_arrays:
+        pytest.importorskip('numpy')
+    rnd = random.Random(seed)
+    state = GameState(use_arrays=use_arrays)
+    for _ in range(200):
+        if state.game_over:
+            break
+        for action in random_decision(state, rnd):
+            state.apply(action)
+            assert_preview_current(state.resource_system)
+        # 直接改单个格子的标记（界面点击走的路径）
+        rs = state.resource_system
+        row, col = rnd.randrange(GRID_SIZE), rnd.randrange(GRID_SIZE)
+        rs.set_tax(row, col, rnd.random() < 0.5)
+        rs.set_farm(row, col, rnd.randint(0, FARM_MAX_PER_GRID_PER_TURN))
+        assert_preview_current(rs)
+        rs.reset_management_grids()
+        assert_preview_current(rs)
@@ -0,0 +1,90 @@
+import random
+
+import pytest
+
+from rules import GameState, SetTaxMask, SetFarmCounts, EndActionPhase, Move
+from reference import random_decision
+
+
+def cells(grid):
+    return [[cell if cell is None or isinstance(cell, str) else int(cell) for cell in line] for line in grid]
+
+
+def snapshot(state):
+    """局面里所有会被 make/unmake 改动的部分"""
+    rs = state.resource_system
+    return (
+        state.zobrist_key(),
+        [[piece and (piece.id, piece.type, piece.color, piece.row, piece.col, piece.moved_this_turn)
+          for piece in line] for line in state.board],
+        [sorted((piece.id, piece.row, piece.col) for piece in player.pieces) for player in state.players],
+        [(player.moves_this_turn, player.skills_used_this_turn) for player in state.players],
+        sorted(state.antlers.items()), sorted(state.fortresses.items()),
+        {color: int(food) for color, food in rs.food.items()},
+        cells(rs.fertility), cells(rs.territory), cells(rs.tax_grid), cells(rs.farm_grid),
+        state.phase, state.current_player_idx, state.game_over, state.winner,
+    )
+
+
+def assert_zobrist_consistent(state):
+    # 撤销后的增量哈希与从头计算的一致
+    assert state.zobrist == state.compute_zobrist()
+    assert state.resource_system.zobrist == state.resource_system.compute_zobrist()
+
+
+@pytest.mark.parametrize('use_arrays', [False, True], ids=['lists', 'arrays'])
+@pytest.mark.parametrize('seed', range(4))
+def test_make_unmake_round_trip(seed, use_arrays):
+    if use_arrays:
+        pytest.importorskip('numpy')
+    rnd = random.Random(seed)
+    state = GameState(use_arrays=use_arrays)
+    history = [snapshot(state)]
+    for _ in range(150):
+        if state.game_over:
+            break
+        for action in random_decision(state, rnd):
+            if state.make(action):
+                history.append(snapshot(state))
+            else:
+                assert snapshot(state) == history[-1]  # 不合法的动作不改变局面
+        # 不时撤销几步，再从中间继续走
+        if rnd.random() < 0.2 and len(history) > 1:
+            for _ in range(rnd.randint(1, min(6, len(history) - 1))):
+                assert state.unmake()
+                history.pop()
+                assert snapshot(state) == history[-1]
+                assert_zobrist_consistent(state)
+
+    while len(history) > 1:
+        assert state.unmake()
+        history.pop()
+        assert snapshot(state) == history[-1]
+    assert not state.unmake()
+    assert snapshot(state) == snapshot(GameState(use_arrays=use_arrays))
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_clone_matches_original(seed):
+    rnd = random.Random(seed)
+    state = GameState()
+    for _ in range(60):
+        if state.game_over:
+            break
+        for action in random_decision(state, rnd):
+            state.apply(action)
+    copy = state.clone()
+    assert snapshot(copy) == snapshot(state)
+    assert_zobrist_consistent(copy)
+    assert not copy.undo_stack
+
+
+def test_moved_flag_is_zero_or_one():
+    state = GameState()
+    for action in (SetTaxMask(0), SetFarmCounts(()), EndActionPhase(), Move(6, 4, 4, 4)):
+        assert state.make(action)
+    piece = state.board[4][4]
+    assert type(piece.moved_this_turn) is int and piece.moved_this_turn == 1
+    assert state.clone().board[4][4].moved_this_turn == 1
+    assert state.unmake()
+    assert state.board[6][4].moved_this_turn == 0
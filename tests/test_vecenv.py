@@ -0,0 +1,58 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from rules import GameState, GamePhase, Move, CastSkill, EndTurn
+from ai import legal_actions
+import vecenv
+
+
+def action_index(decision):
+    """走子阶段的决策在 VecEnv 里的动作编号"""
+    match decision[0]:
+        case Move(from_row, from_col, to_row, to_col):
+            from_sq = from_row * vecenv.GRID_SIZE + from_col
+            return (vecenv.MOVE_OFFSET + from_sq * len(vecenv.MOVE_DELTAS)
+                    + vecenv.MOVE_TYPES[to_row - from_row, to_col - from_col])
+        case CastSkill(row, col):
+            return vecenv.SKILL_OFFSET + row * vecenv.GRID_SIZE + col
+        case EndTurn():
+            return vecenv.ACTION_END_TURN
+
+
+def assert_same_state(env, game, state):
+    encoded = vecenv.encode_state(state)
+    for name in vecenv.STATE_FIELDS:
+        if name != 'steps':
+            assert np.array_equal(encoded[name], getattr(env, name)[game]), name
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_steps_in_lockstep_with_game_state(seed):
+    # 每一步把 VecEnv 选的动作翻译成决策在对应的 GameState 上执行，两边的局面和合法动作必须一致
+    rng = np.random.default_rng(seed)
+    env = vecenv.VecEnv(8, max_steps=120)
+    states = [GameState() for _ in range(env.num_envs)]
+    finished = 0
+    for _ in range(250):
+        mask = env.legal_mask()
+        for game, state in enumerate(states):
+            assert_same_state(env, game, state)
+            if state.phase == GamePhase.MOVE:
+                expected = sorted(action_index(decision) for decision in legal_actions(state))
+                assert np.flatnonzero(mask[game]).tolist() == expected
+
+        actions = vecenv.sample_actions(mask, rng)
+        decisions = [env.decision(game, action) for game, action in enumerate(actions)]
+        _, _, terminated, truncated, info = env.step(actions)
+        for game, decision in enumerate(decisions):
+            state = states[game]
+            assert all(state.apply(action) for action in decision)
+            if terminated[game]:
+                assert state.game_over and state.winner == state.players[info['winner'][game]].color
+            else:
+                assert not state.game_over
+            if terminated[game] or truncated[game]:
+                states[game] = GameState()
+                finished += 1
+    assert finished > 0
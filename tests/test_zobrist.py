@@ -0,0 +1,105 @@
+import random
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from rules import GameState
+import zobrist
+from zobrist import TranspositionTable, EXACT, LOWER
+from reference import random_decision
+
+
+def assert_incremental_keys(state):
+    # 增量维护的哈希与从头计算的一致
+    assert state.zobrist == state.compute_zobrist()
+    assert state.resource_system.zobrist == state.resource_system.compute_zobrist()
+
+
+@pytest.mark.parametrize('use_arrays', [False, True], ids=['lists', 'arrays'])
+@pytest.mark.parametrize('seed', range(4))
+def test_incremental_keys_match_recomputed(seed, use_arrays):
+    if use_arrays:
+        pytest.importorskip('numpy')
+    rnd = random.Random(seed)
+    state = GameState(use_arrays=use_arrays)
+    for _ in range(200):
+        if state.game_over:
+            break
+        for action in random_decision(state, rnd):
+            state.apply(action)
+            assert_incremental_keys(state)
+
+
+@pytest.mark.parametrize('seed', range(2))
+def test_resource_systems_hash_alike(seed):
+    # 列表版和数组版资源系统执行同样的动作，整局哈希相同
+    pytest.importorskip('numpy')
+    rnd = random.Random(seed)
+    lists, arrays = GameState(), GameState(use_arrays=True)
+    for _ in range(200):
+        if lists.game_over:
+            break
+        for action in random_decision(lists, rnd):
+            assert lists.apply(action) == arrays.apply(action)
+            assert lists.zobrist_key() == arrays.zobrist_key()
+
+
+def position(state):
+    # 哈希覆盖的全部内容
+    rs = state.resource_system
+    return (
+        tuple(tuple(piece and (piece.type, piece.color, bool(piece.moved_this_turn)) for piece in line)
+              for line in state.board),
+        tuple(sorted(state.antlers.items())), tuple(sorted(state.fortresses.items())),
+        tuple(int(food) for food in rs.food.values()),
+        tuple(tuple(int(cell) if cell is not None and not isinstance(cell, str) else cell for cell in line)
+              for grid in (rs.fertility, rs.territory, rs.tax_grid, rs.farm_grid) for line in grid),
+        state.phase, state.current_player_idx,
+        tuple((player.moves_this_turn, player.skills_used_this_turn) for player in state.players),
+    )
+
+
+def test_different_positions_have_different_keys():
+    rnd = random.Random(0)
+    state = GameState()
+    keys, positions = set(), set()
+    for _ in range(150):
+        if state.game_over:
+            break
+        for action in random_decision(state, rnd):
+            if state.apply(action):
+                keys.add(state.zobrist_key())
+                positions.add(position(state))
+    assert len(keys) == len(positions) > 50  # 同一局面同一个键，不同局面不同的键
+
+
+def test_transposition_table_replacement():
+    table = TranspositionTable(size_bits=4)
+    table.store(0x15, 3, 10, EXACT, 'a')
+    assert table.probe(0x15) == (3, 10, EXACT, 'a')
+    assert table.probe(0x25) is None  # 同一个槽，不同的局面
+
+    # 本次搜索中浅的结果不覆盖深的；同一局面只补上最佳走法
+    table.store(0x25, 1, 5, LOWER)
+    assert table.probe(0x15) == (3, 10, EXACT, 'a')
+    table.store(0x15, 2, 7, LOWER)
+    assert table.probe(0x15) == (3, 10, EXACT, 'a')
+
+    # 新一次搜索后，旧条目可以被任何深度覆盖
+    table.new_search()
+    table.store(0x25, 1, 5, LOWER, 'b')
+    assert table.probe(0x25) == (1, 5, LOWER, 'b')
+    assert table.probe(0x15) is None
+    assert len(table) == 1
+
+
+def test_tables_built_on_first_use():
+    # 导入规则模块不生成随机数表，第一次计算哈希时才生成，之后一直用同一份
+    code = "import rules, zobrist; print(zobrist.tables.cache_info().currsize)"
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=Path(__file__).parent.parent)
+    assert result.stdout.strip() == '0'
+    GameState()
+    assert zobrist.tables() is zobrist.tables()
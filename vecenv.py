@@ -0,0 +1,439 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from consts import *
+from rules import SetTaxMask, SetFarmCounts, EndActionPhase, Move, CastSkill, EndTurn
+from tables import (square, POSITIONS, SQUARE_COUNT, QUEEN_DIRECTIONS, ROOK_DIRECTIONS, KNIGHT_OFFSETS,
+                    KING_OFFSETS, PAWN_DIRECTION, PAWN_START_ROW)
+from resource_arrays import (COLOR_CODES, NO_OWNER, FERTILITY_DTYPE, TERRITORY_DTYPE, FOOD_DTYPE,
+                             decay_fertility, collect_tax)
+
+
+# 批量训练环境（gym 风格）：K 局同时推进，每局每步一个动作
+# 所有局面存成堆叠的 numpy 数组（第 0 维是局），合法动作掩码、状态转移和观察都是整批的数组运算，
+# 不逐局调用 GameState。规则与 GameState 相同，只是行动阶段的征税/屯田计划收成两个选择（不征税、能征的全部征税，
+# 都不屯田）。某一局结束（吃光对方棋子或走满 VECENV_MAX_STEPS 步）后自动重开。
+#   env = VecEnv(256)
+#   obs, info = env.reset()
+#   obs, reward, terminated, truncated, info = env.step(sample_actions(env.legal_mask(), rng))
+#   python vecenv.py -k 256 --steps 2000  # 随机走子测速度
+
+# 动作编号
+ACTION_END_TURN = 0  # 走子阶段：结束回合
+ACTION_NO_TAX = 1  # 行动阶段：不征税、不屯田
+ACTION_TAX_ALL = 2  # 行动阶段：己方领土上丰饶度 >= 10 的格子全部征税，不屯田
+SKILL_OFFSET = 3  # SKILL_OFFSET + sq：sq 上的己方棋子放技能
+MOVE_OFFSET = SKILL_OFFSET + SQUARE_COUNT  # MOVE_OFFSET + from_sq * len(MOVE_DELTAS) + 走法类型：走子
+
+# 走法类型（与 AlphaZero 的策略编码相同）：沿 8 个方向走 1 ~ GRID_SIZE-1 格，再加 8 种马步。
+# 王和兵的走法都是其中的一种，所以每个 (起点, 走法类型) 只对应一个终点
+MOVE_DELTAS = (tuple((dr * k, dc * k) for dr, dc in QUEEN_DIRECTIONS for k in range(1, GRID_SIZE))
+               + KNIGHT_OFFSETS)
+MOVE_TYPES = {delta: i for i, delta in enumerate(MOVE_DELTAS)}
+ACTION_COUNT = MOVE_OFFSET + SQUARE_COUNT * len(MOVE_DELTAS)
+
+# 阶段编码
+PHASE_ACTION = 0
+PHASE_MOVE = 1
+PHASE_CODES = {GamePhase.ACTION: PHASE_ACTION, GamePhase.MOVE: PHASE_MOVE}
+
+EMPTY = -1  # piece_type 中的空格；按兵种查的表多一项放在最后，空格用 -1 下标正好查到它
+NO_COST = 1 << 30  # 不能走/没有技能
+
+# 每局的状态数组：名字 -> (单局的形状, dtype)。颜色（棋子、领土、鹿角、堡垒）都用 resource_arrays 的编码，
+# 0 为无，白方 1、黑方 2；current 是 players 中的下标（0 白 1 黑），所以当前玩家的颜色编码是 current + 1
+STATE_FIELDS = {
+    'piece_type': ((SQUARE_COUNT,), np.int8),  # PieceType 编码，EMPTY 为空
+    'piece_color': ((SQUARE_COUNT,), np.int8),
+    'moved': ((SQUARE_COUNT,), np.int8),  # 棋子本回合是否走过（0/1）
+    'antlers': ((SQUARE_COUNT,), np.int8),
+    'fortresses': ((SQUARE_COUNT,), np.int8),
+    'fertility': ((GRID_SIZE, GRID_SIZE), FERTILITY_DTYPE),
+    'territory': ((GRID_SIZE, GRID_SIZE), TERRITORY_DTYPE),
+    'food': ((len(COLOR_CODES),), FOOD_DTYPE),
+    'phase': ((), np.int8),
+    'current': ((), np.int8),
+    'moves': ((), np.int8),  # 当前玩家本回合的走子次数
+    'skills': ((), np.int8),  # 当前玩家本回合的技能次数
+    'steps': ((), np.int32),  # 本局已执行的动作数
+}
+
+# 观察张量的各个平面（都从当前玩家的角度：own 是当前玩家，enemy 是对方），形状 (K, 平面数, GRID_SIZE, GRID_SIZE)
+OBS_PLANES = (
+    *(f'own_{name}' for name in PIECE_TYPE_NAMES),
+    *(f'enemy_{name}' for name in PIECE_TYPE_NAMES),
+    'own_antler', 'enemy_antler', 'own_fortress', 'enemy_fortress', 'own_territory', 'enemy_territory',
+    'fertility', 'moved', 'own_food', 'enemy_food', 'phase', 'moves', 'skills',
+)
+OBS_INDEX = {name: i for i, name in enumerate(OBS_PLANES)}
+
+
+# 走法表：MOVE_TARGETS[走法类型, 格子] = 目标格编号，出界为 -1
+_ROWS, _COLS = np.divmod(np.arange(SQUARE_COUNT), GRID_SIZE)
+
+
+def _targets(dr, dc):
+    rows, cols = _ROWS + dr, _COLS + dc
+    on_board = (rows >= 0) & (rows < GRID_SIZE) & (cols >= 0) & (cols < GRID_SIZE)
+    return np.where(on_board, rows * GRID_SIZE + cols, -1)
+
+
+MOVE_TARGETS = np.array([_targets(dr, dc) for dr, dc in MOVE_DELTAS])
+# 车、象、后：RAY_TYPES[方向] 是沿 QUEEN_DIRECTIONS 该方向由近到远的走法类型
+RAY_TYPES = tuple(tuple(MOVE_TYPES[dr * k, dc * k] for k in range(1, GRID_SIZE)) for dr, dc in QUEEN_DIRECTIONS)
+KNIGHT_TYPES = tuple(MOVE_TYPES[offset] for offset in KNIGHT_OFFSETS)
+KING_TYPES = tuple(MOVE_TYPES[offset] for offset in KING_OFFSETS)
+# 兵（按颜色编码）：前进一格、两格、两个斜进吃子的走法类型；两格只在起始行有效
+PAWN_TYPES = {COLOR_CODES[color]: (MOVE_TYPES[d, 0], MOVE_TYPES[2 * d, 0], (MOVE_TYPES[d, -1], MOVE_TYPES[d, 1]))
+              for color, d in PAWN_DIRECTION.items()}
+PAWN_ON_START = {COLOR_CODES[color]: _ROWS == row for color, row in PAWN_START_ROW.items()}
+
+# SLIDES[兵种, 方向]：该兵种能沿 QUEEN_DIRECTIONS 的这个方向滑行（最后一行是空格）
+SLIDES = np.zeros((len(PieceType) + 1, len(QUEEN_DIRECTIONS)), dtype=bool)
+SLIDES[PieceType.ROOK, :len(ROOK_DIRECTIONS)] = True
+SLIDES[PieceType.BISHOP, len(ROOK_DIRECTIONS):] = True
+SLIDES[PieceType.QUEEN, :] = True
+
+# 技能效果：rules.GameState.cast_skill 只对兵（鹿角）和车（堡垒）有效
+SKILL_OBSTACLES = {PieceType.PAWN: 'antlers', PieceType.ROOK: 'fortresses'}
+
+
+def encode_state(state):
+    """把一局 GameState 转成 STATE_FIELDS 的数组（单局，没有批次维度）
+
+    行动阶段里还没提交的征税/屯田标记不保存（本环境的计划动作会整体替换它们）。
+    """
+    arrays = {name: np.zeros(shape, dtype=dtype) for name, (shape, dtype) in STATE_FIELDS.items()}
+    arrays['piece_type'][:] = EMPTY
+    for player in state.players:
+        for piece in player.pieces:
+            sq = square(piece.row, piece.col)
+            arrays['piece_type'][sq] = PIECE_TYPE_CODES[piece.type]
+            arrays['piece_color'][sq] = COLOR_CODES[piece.color]
+            arrays['moved'][sq] = piece.moved_this_turn
+    for name, obstacles in (('antlers', state.antlers), ('fortresses', state.fortresses)):
+        for (row, col), color in obstacles.items():
+            arrays[name][square(row, col)] = COLOR_CODES[color]
+    rs = state.resource_system
+    for row in range(GRID_SIZE):
+        for col in range(GRID_SIZE):
+            arrays['fertility'][row, col] = rs.fertility[row][col]
+            arrays['territory'][row, col] = COLOR_CODES.get(rs.owner(row, col), NO_OWNER)
+    for color, code in COLOR_CODES.items():
+        arrays['food'][code - 1] = rs.food[color]
+    player = state.get_current_player()
+    arrays['phase'][...] = PHASE_CODES[state.phase]
+    arrays['current'][...] = state.current_player_idx
+    arrays['moves'][...] = player.moves_this_turn
+    arrays['skills'][...] = player.skills_used_this_turn
+    return arrays
+
+
+def sample_actions(mask, rng):
+    """每局在合法动作中均匀随机选一个（每局至少有一个合法动作）"""
+    games, actions = np.nonzero(mask)  # 按局排列
+    counts = np.bincount(games, minlength=len(mask))
+    starts = np.cumsum(counts) - counts
+    return actions[starts + (rng.random(len(mask)) * counts).astype(np.int64)]
+
+
+class VecEnv:
+    """num_envs 局同时进行的批量环境，状态是 STATE_FIELDS 中的堆叠数组（self.<名字>，第 0 维是局）
+
+    规则参数（移动消耗、技能消耗等）在创建时读取，之后修改 consts 不影响已有的环境。
+    """
+
+    def __init__(self, num_envs, initial_state=None, max_steps=VECENV_MAX_STEPS):
+        if initial_state is None:
+            from rules import GameState
+            initial_state = GameState()
+        self.num_envs = num_envs
+        self.max_steps = max_steps
+        self.initial = encode_state(initial_state)  # 重开时复制的局面
+        for name, (shape, dtype) in STATE_FIELDS.items():
+            setattr(self, name, np.zeros((num_envs, *shape), dtype=dtype))
+
+        # 按兵种查的消耗表，最后一行对应空格
+        self.move_costs = np.full((len(PieceType) + 1, 2), NO_COST, dtype=np.int64)
+        for piece_type in PieceType:
+            for moved in (0, 1):
+                self.move_costs[piece_type, moved] = PIECE_MOVE_COST(PIECE_TYPE_NAMES[piece_type], moved)
+        self.skill_costs = np.full(len(PieceType) + 1, NO_COST, dtype=np.int64)
+        for piece_type in SKILL_OBSTACLES:
+            cost = SkillSystem.SKILL_COSTS.get(PIECE_TYPE_NAMES[piece_type])
+            if cost is not None:
+                self.skill_costs[piece_type] = cost
+
+        self.games = np.arange(num_envs)
+        self._mask = None  # 当前局面的合法动作掩码（step/reset 后重新计算）
+        self.reset()
+
+    @property
+    def observation_shape(self):
+        return len(OBS_PLANES), GRID_SIZE, GRID_SIZE
+
+    def reset(self, games=None):
+        """把指定的局（默认全部）恢复成初始局面，返回 (观察, info)"""
+        games = self.games if games is None else np.asarray(games)
+        for name in STATE_FIELDS:
+            getattr(self, name)[games] = self.initial[name]
+        self._mask = None
+        return self.observe(games), {}
+
+    def load(self, game, state):
+        """把第 game 局设置成 GameState 的局面"""
+        for name, value in encode_state(state).items():
+            getattr(self, name)[game] = value
+        self._mask = None
+
+    def legal_mask(self):
+        """(num_envs, ACTION_COUNT) 的布尔数组，与 ai.legal_actions 的走子、技能和结束回合一一对应"""
+        if self._mask is None:
+            self._mask = self._legal_mask()
+        return self._mask
+
+    def _legal_mask(self):
+        K = self.num_envs
+        mask = np.zeros((K, ACTION_COUNT), dtype=bool)
+        acting = self.phase == PHASE_ACTION
+        moving = ~acting
+        mask[acting, ACTION_NO_TAX] = True
+        mask[acting, ACTION_TAX_ALL] = True
+        mask[moving, ACTION_END_TURN] = True
+
+        me = (self.current + 1)[:, None]  # 当前玩家的颜色编码
+        food = self.food[self.games, self.current][:, None]
+        piece_type, piece_color = self.piece_type, self.piece_color
+        own = piece_color == me
+        enemy_antler = (self.antlers != NO_OWNER) & (self.antlers != me)
+        enemy_fortress = (self.fortresses != NO_OWNER) & (self.fortresses != me)
+
+        # 技能：格子上没有鹿角和堡垒，粮草够
+        can_cast = (moving & (self.skills < SKILL_MAX_PER_TURN))[:, None]
+        free = (self.antlers == NO_OWNER) & (self.fortresses == NO_OWNER)
+        mask[:, SKILL_OFFSET:MOVE_OFFSET] = can_cast & own & free & (food >= self.skill_costs[piece_type])
+
+        # 走子：moves[局, 走法类型, 起点]，最后按 (起点, 走法类型) 的顺序放进掩码
+        moves = np.zeros((K, len(MOVE_DELTAS), SQUARE_COUNT), dtype=bool)
+        can_move = (moving & (self.moves < PIECE_MOVE_MAX_PER_TURN))[:, None]
+        movable = can_move & own & (food >= self.move_costs[piece_type, self.moved])
+
+        # 车、象、后沿射线滑行：敌方堡垒不能进入也不能越过，遇到棋子停下（敌方可吃），敌方鹿角可以吃掉但不能越过
+        for d, ray in enumerate(RAY_TYPES):
+            sliding = movable & SLIDES[piece_type, d]
+            for move_type in ray:
+                targets = MOVE_TARGETS[move_type]
+                sliding &= targets >= 0
+                if not sliding.any():
+                    break
+                sliding &= ~enemy_fortress[:, targets]
+                occupant = piece_color[:, targets]
+                moves[:, move_type] |= sliding & (occupant != me)
+                sliding &= (occupant == NO_OWNER) & ~enemy_antler[:, targets]
+
+        # 马、王跳到固定目标格（马可以跳过鹿角）
+        for piece_type_code, move_types in ((PieceType.KNIGHT, KNIGHT_TYPES), (PieceType.KING, KING_TYPES)):
+            leaping = movable & (piece_type == piece_type_code)
+            for move_type in move_types:
+                targets = MOVE_TARGETS[move_type]
+                moves[:, move_type] |= (leaping & (targets >= 0) & (piece_color[:, targets] != me)
+                                        & ~enemy_fortress[:, targets])
+
+        # 兵：前进一格/起始行前进两格（中间格不能有敌方鹿角），斜进吃子
+        for code, (one_type, two_type, capture_types) in PAWN_TYPES.items():
+            pawns = movable & (piece_type == PieceType.PAWN) & (me == code)
+            if not pawns.any():
+                continue
+            one, two = MOVE_TARGETS[one_type], MOVE_TARGETS[two_type]
+            one_ok = pawns & (one >= 0) & (piece_color[:, one] == NO_OWNER) & ~enemy_fortress[:, one]
+            moves[:, one_type] |= one_ok
+            moves[:, two_type] |= (one_ok & PAWN_ON_START[code] & (piece_color[:, two] == NO_OWNER)
+                                   & ~enemy_fortress[:, two] & ~enemy_antler[:, one])
+            for move_type in capture_types:
+                targets = MOVE_TARGETS[move_type]
+                occupant = piece_color[:, targets]
+                moves[:, move_type] |= (pawns & (targets >= 0) & (occupant != NO_OWNER) & (occupant != me)
+                                        & ~enemy_fortress[:, targets])
+
+        mask[:, MOVE_OFFSET:] = moves.transpose(0, 2, 1).reshape(K, -1)
+        return mask
+
+    def step(self, actions):
+        """每局执行一个动作，返回 (观察, 回报, terminated, truncated, info)
+
+        回报是执行动作一方的：吃光对方棋子的那一步为 1，其余为 0。结束的局自动重开，
+        返回的是新局的观察，结束时的观察放在 info['final_observation']（按结束的局排列）。
+        info['winner'] 是胜者下标（0 白 1 黑，未结束为 -1）。
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        illegal = ~self.legal_mask()[self.games, actions]
+        if illegal.any():
+            raise ValueError(f"Illegal actions in games {np.flatnonzero(illegal).tolist()}")
+        self._mask = None
+        rewards = np.zeros(self.num_envs, dtype=np.float32)
+        winner = np.full(self.num_envs, -1, dtype=np.int8)
+
+        # 行动阶段：征税（可选）后进入走子阶段
+        taxing = np.flatnonzero(actions == ACTION_TAX_ALL)
+        if len(taxing):
+            self._collect_tax(taxing)
+        self.phase[(actions == ACTION_NO_TAX) | (actions == ACTION_TAX_ALL)] = PHASE_MOVE
+
+        ending = np.flatnonzero(actions == ACTION_END_TURN)
+        if len(ending):
+            self._end_turn(ending)
+
+        casting = np.flatnonzero((actions >= SKILL_OFFSET) & (actions < MOVE_OFFSET))
+        if len(casting):
+            self._cast_skill(casting, actions[casting] - SKILL_OFFSET)
+
+        moving = np.flatnonzero(actions >= MOVE_OFFSET)
+        if len(moving):
+            from_sq, move_type = np.divmod(actions[moving] - MOVE_OFFSET, len(MOVE_DELTAS))
+            to_sq = MOVE_TARGETS[move_type, from_sq]
+            won = self._move(moving, from_sq, to_sq)
+            rewards[won] = 1
+            winner[won] = self.current[won]
+
+        self.steps += 1
+        terminated = winner >= 0
+        truncated = ~terminated & (self.steps >= self.max_steps)
+        observations = self.observe()
+        info = {'winner': winner, 'steps': self.steps.copy()}
+        done = np.flatnonzero(terminated | truncated)
+        if len(done):
+            info['final_observation'] = observations[done]
+            observations[done] = self.reset(done)[0]
+        return observations, rewards, terminated, truncated, info
+
+    def _collect_tax(self, games):
+        # 己方领土上丰饶度 >= 10 的格子全部征税（与 GameState.end_action_phase 的征税相同）
+        players = self.current[games]
+        fertility = self.fertility[games]
+        food = self.food[games, players]
+        collect_tax(fertility, self.territory[games], fertility >= 10, food, players + 1)
+        self.fertility[games] = fertility
+        self.food[games, players] = food
+
+    def _end_turn(self, games):
+        # 与 GameState.on_turn_end 相同：有棋子的格子丰饶度 -5，清空本回合的计数，轮到对方
+        fertility = self.fertility[games]
+        occupied = (self.piece_color[games] != NO_OWNER).reshape(fertility.shape)
+        decay_fertility(fertility, occupied.astype(FERTILITY_DTYPE))
+        self.fertility[games] = fertility
+        self.moved[games] = 0
+        self.moves[games] = 0
+        self.skills[games] = 0
+        self.current[games] = 1 - self.current[games]
+        self.phase[games] = PHASE_ACTION
+
+    def _cast_skill(self, games, squares):
+        players = self.current[games]
+        piece_types = self.piece_type[games, squares]
+        self.food[games, players] -= self.skill_costs[piece_types].astype(FOOD_DTYPE)
+        for piece_type, name in SKILL_OBSTACLES.items():
+            cast = piece_types == piece_type
+            getattr(self, name)[games[cast], squares[cast]] = players[cast] + 1
+        self.skills[games] += 1
+
+    def _move(self, games, from_sq, to_sq):
+        """与 GameState.move_piece 相同，返回吃光了对方棋子的局"""
+        players = self.current[games]
+        codes = players + 1
+        cost = self.move_costs[self.piece_type[games, from_sq], self.moved[games, from_sq]]
+        self.food[games, players] -= cost.astype(FOOD_DTYPE)
+        self.moves[games] += 1
+
+        # 目标格有敌方鹿角：吃掉鹿角，棋子不移位（也不标记棋子走过）
+        antler = self.antlers[games, to_sq]
+        eating = (antler != NO_OWNER) & (antler != codes)
+        self.antlers[games[eating], to_sq[eating]] = NO_OWNER
+
+        going = ~eating
+        games, from_sq, to_sq, codes = games[going], from_sq[going], to_sq[going], codes[going]
+        self.piece_type[games, to_sq] = self.piece_type[games, from_sq]
+        self.piece_color[games, to_sq] = codes
+        self.moved[games, to_sq] = 1  # 与 GameState.move_piece 相同，只标记走过
+        self.piece_type[games, from_sq] = EMPTY
+        self.piece_color[games, from_sq] = NO_OWNER
+        self.moved[games, from_sq] = 0
+        self.territory.reshape(self.num_envs, -1)[games, to_sq] = codes
+
+        # 只有被吃的一方可能没有棋子了
+        enemy_left = (self.piece_color[games] == (3 - codes)[:, None]).any(axis=1)
+        return games[~enemy_left]
+
+    def observe(self, games=None):
+        """观察张量 (局数, len(OBS_PLANES), GRID_SIZE, GRID_SIZE)，float32，数值不做缩放"""
+        games = self.games if games is None else np.asarray(games)
+        players = self.current[games]
+        me = (players + 1)[:, None]
+        enemy = (2 - players)[:, None]
+        obs = np.zeros((len(games), len(OBS_PLANES), SQUARE_COUNT), dtype=np.float32)
+
+        piece_type, piece_color = self.piece_type[games], self.piece_color[games]
+        own, theirs = piece_color == me, piece_color == enemy
+        for piece_type_code, name in enumerate(PIECE_TYPE_NAMES):
+            is_type = piece_type == piece_type_code
+            obs[:, OBS_INDEX[f'own_{name}']] = is_type & own
+            obs[:, OBS_INDEX[f'enemy_{name}']] = is_type & theirs
+        for name, grid in (('antler', self.antlers[games]), ('fortress', self.fortresses[games]),
+                           ('territory', self.territory[games].reshape(len(games), -1))):
+            obs[:, OBS_INDEX[f'own_{name}']] = grid == me
+            obs[:, OBS_INDEX[f'enemy_{name}']] = grid == enemy
+        obs[:, OBS_INDEX['fertility']] = self.fertility[games].reshape(len(games), -1)
+        obs[:, OBS_INDEX['moved']] = self.moved[games]
+        obs[:, OBS_INDEX['own_food']] = self.food[games, players][:, None]
+        obs[:, OBS_INDEX['enemy_food']] = self.food[games, 1 - players][:, None]
+        obs[:, OBS_INDEX['phase']] = self.phase[games][:, None]
+        obs[:, OBS_INDEX['moves']] = self.moves[games][:, None]
+        obs[:, OBS_INDEX['skills']] = self.skills[games][:, None]
+        return obs.reshape(len(games), *self.observation_shape)
+
+    def decision(self, game, action):
+        """第 game 局的动作编号对应的 rules 动作序列（在 step 之前调用，可交给 GameState.apply 或写入对局记录）"""
+        action = int(action)
+        if action == ACTION_END_TURN:
+            return (EndTurn(),)
+        if action in (ACTION_NO_TAX, ACTION_TAX_ALL):
+            mask = 0
+            if action == ACTION_TAX_ALL:
+                own = self.territory[game] == self.current[game] + 1
+                for sq in np.flatnonzero(own & (self.fertility[game] >= 10)):
+                    mask |= 1 << int(sq)
+            return SetTaxMask(mask), SetFarmCounts(()), EndActionPhase()
+        if action < MOVE_OFFSET:
+            return (CastSkill(*POSITIONS[action - SKILL_OFFSET]),)
+        from_sq, move_type = divmod(action - MOVE_OFFSET, len(MOVE_DELTAS))
+        return (Move(*POSITIONS[from_sq], *POSITIONS[MOVE_TARGETS[move_type, from_sq]]),)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Step random agents through a batch of games and report the speed")
+    parser.add_argument('-k', '--envs', type=int, default=256, help="games stepped in lockstep")
+    parser.add_argument('--steps', type=int, default=1000)
+    parser.add_argument('--max-steps', type=int, default=VECENV_MAX_STEPS, help="actions per game before a restart")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    env = VecEnv(args.envs, max_steps=args.max_steps)
+    env.reset()
+    wins = np.zeros(2, dtype=np.int64)
+    unfinished = 0
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        _, _, terminated, truncated, info = env.step(sample_actions(env.legal_mask(), rng))
+        wins += np.bincount(info['winner'][terminated], minlength=2)
+        unfinished += int(truncated.sum())
+    elapsed = time.perf_counter() - start
+    total = args.envs * args.steps
+    print(f"{total} steps in {elapsed:.1f}s: {total / elapsed:.0f} steps/s; "
+          f"white {wins[0]}, black {wins[1]}, unfinished {unfinished}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+import hashlib
+import random
+from array import array
+from functools import cache, lru_cache
+
+
+# Zobrist 哈希：局面的每个组成部分（某格上的某种棋子、某格的丰饶度数值……）对应一个固定的 64 位随机数，
+# 局面的哈希是所有组成部分的异或。状态变化时只需异或掉旧的部分、异或上新的部分。
+# 按格子的组成部分查 ZobristKeys 预先生成的表（tables() 第一次用到时按 GRID_SIZE 建一次，种子固定，不同进程的表相同）；
+# 回合、粮草之类的少量标量部分以及超出表范围的数值用 key() 按内容生成。
+# 除了 tables() 里读取 consts 的棋盘参数，只依赖标准库，consts 中的资源系统也可以导入。
+TABLE_SEED = 0x6c69616e67  # 生成随机数表的种子
+FERTILITY_KEY_VALUES = 256  # 丰饶度 0 ~ 255 查表，更大的值（屯田很多次）用 key()
+
+
+@lru_cache(maxsize=1 << 12)
+def key(*parts):
+    """组成部分对应的 64 位随机数，例如 key('turn', 0, 'action')"""
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=8, person=b'liang-zobrist').digest()
+    return int.from_bytes(digest, 'little')
+
+
+class ZobristKeys:
+    """按棋盘大小预先生成的随机数表，增量更新时按格子编号（row * grid_size + col）直接取
+
+    piece[颜色][兵种][格子]、moved[格子]、antler/fortress/territory[颜色][格子]、tax[格子]；
+    丰饶度和屯田次数的取值多，用 fertility()/farm() 查扁平的表。
+    """
+
+    def __init__(self, grid_size, colors, piece_types, farm_max, fertility_values=FERTILITY_KEY_VALUES):
+        self.grid_size = grid_size
+        self.squares = squares = grid_size * grid_size
+        self.fertility_values = fertility_values
+        self.farm_max = farm_max
+        rnd = random.Random(TABLE_SEED)
+
+        def table(size):
+            keys = array('Q')
+            keys.frombytes(rnd.randbytes(8 * size))
+            return keys
+
+        self.piece = {color: {piece_type: table(squares) for piece_type in piece_types} for color in colors}
+        self.moved = table(squares)
+        self.antler = {color: table(squares) for color in colors}
+        self.fortress = {color: table(squares) for color in colors}
+        self.territory = {color: table(squares) for color in colors}
+        self.tax = table(squares)
+        self.farm_table = table(squares * (farm_max + 1))
+        self.fertility_table = table(squares * fertility_values)
+
+    def fertility(self, row, col, value):
+        if 0 <= value < self.fertility_values:
+            return self.fertility_table[(row * self.grid_size + col) * self.fertility_values + value]
+        return key('fertility', row, col, value)
+
+    def farm(self, row, col, times):
+        if 0 < times <= self.farm_max:
+            return self.farm_table[(row * self.grid_size + col) * (self.farm_max + 1) + times]
+        return key('farm', row, col, times)
+
+
+@cache
+def tables():
+    """当前棋盘的 ZobristKeys，第一次用到时才生成（64x64 的棋盘上约 8 MB，不用哈希的程序不必付出）"""
+    import consts  # consts 也导入本模块，在这里导入避免循环
+    return ZobristKeys(consts.GRID_SIZE, consts.PIECE_COLOR_NAMES, consts.PIECE_TYPE_NAMES,
+                       consts.FARM_MAX_PER_GRID_PER_TURN)
+
+
+# 置换表条目的值类型
+EXACT = 0  # 精确值
+LOWER = 1  # 下界（发生了 beta 截断）
+UPPER = 2  # 上界（没有超过 alpha）
+
+
+class TranspositionTable:
+    """固定容量的置换表，按哈希的低位分槽，每槽一个条目
+
+    替换策略：空槽、同一局面、上一次搜索留下的旧条目直接覆盖；
+    否则只有搜索深度不低于已有条目时才覆盖。
+    """
+
+    def __init__(self, size_bits=16):
+        self.mask = (1 << size_bits) - 1
+        self.entries = [None] * (1 << size_bits)  # (key, depth, value, flag, move, generation)
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.replacements = 0  # 覆盖了另一个局面的条目
+
+    def new_search(self):
+        # 开始新一次搜索，之前的条目在替换时优先级降低
+        self.generation += 1
+
+    def probe(self, zobrist_key):
+        """返回 (depth, value, flag, move)，没有则返回 None"""
+        entry = self.entries[zobrist_key & self.mask]
+        if entry is not None and entry[0] == zobrist_key:
+            self.hits += 1
+            return entry[1:5]
+        self.misses += 1
+        return None
+
+    def store(self, zobrist_key, depth, value, flag, move=None):
+        index = zobrist_key & self.mask
+        entry = self.entries[index]
+        if entry is not None and entry[0] != zobrist_key:
+            if entry[5] == self.generation and depth < entry[1]:
+                return
+            self.replacements += 1
+        elif entry is not None and depth < entry[1] and entry[5] == self.generation:
+            # 同一局面保留更深的结果，但补上最佳走法
+            if move is not None and entry[4] is None:
+                self.entries[index] = entry[:4] + (move, entry[5])
+            return
+        self.entries[index] = (zobrist_key, depth, value, flag, move, self.generation)
+        self.stores += 1
+
+    def clear(self):
+        self.entries = [None] * len(self.entries)
+        self.generation = 0
+
+    def __len__(self):
+        return sum(entry is not None for entry in self.entries)
+
+    def stats(self):
+        return {'size': len(self.entries), 'used': len(self), 'hits': self.hits, 'misses': self.misses,
+                'stores': self.stores, 'replacements': self.replacements}